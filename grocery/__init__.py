@@ -0,0 +1,5 @@
+"""Shared helpers for the grocery shopping scripts."""
+
+from grocery.fuzzy_match import FuzzyMatcher
+
+__all__ = ['FuzzyMatcher']
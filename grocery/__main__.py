@@ -0,0 +1,5 @@
+"""``python -m grocery <command>``; see ``grocery.cli``."""
+
+from grocery.cli import main
+
+main()
@@ -0,0 +1,187 @@
+"""Price many candidate meal plans in one go.
+
+Pricing a different set of meals used to mean editing ``exclude_items`` or
+the ``ingredients`` sheet and rerunning revised_no_walmart.py. Here the
+workbook and history are loaded once, every ingredient is assigned once with
+the shopping-list rules, and the resulting read-only tables are handed to a
+``ProcessPoolExecutor`` (once per worker, via its initializer). Workers then
+price each plan - a list of meal codes - into per-store lists and totals, and
+optionally solve the optimal store set with trip costs.
+
+Usage:
+    python -m grocery.batch plans.json            # {"week 1": ["A", "B"], ...}
+    python -m grocery.batch --plan A,B --plan C,E,F --trip-cost 5
+
+    from grocery.batch import plan_batch
+    results = plan_batch(data, {'week 1': ['A', 'B'], 'week 2': ['C', 'E']})
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from grocery.history import load_history
+from grocery.loader import DEFAULT_WORKBOOK, load
+from grocery.match_cache import load_match_cache, save_match_cache
+from grocery.optimizer import StoreOptimizer
+from grocery.shopping_list import GROCERY_STORES, StoreAssigner, group_by_store, read_ingredients
+
+# Items user already has (same defaults as revised_no_walmart.py)
+EXCLUDE_ITEMS = ['olive oil', 'salt', 'pepper', 'spices', 'garlic', 'ginger', 'sourdough bread']
+
+# Read-only tables, set once per worker process by _init_worker
+_tables = None
+
+
+def build_tables(data, exclude_items=EXCLUDE_ITEMS, stores=GROCERY_STORES, trip_costs=None,
+                 history=None, matcher=None, seasonal=None, on=None):
+    """Everything a worker needs to price any plan, computed once.
+
+    ``history`` / ``matcher`` reuse ones already loaded for ``stores``;
+    ``seasonal`` / ``on`` price for that date (see ``StoreAssigner``).
+    """
+    ingredients = read_ingredients(data, exclude_items)
+    meals = list(dict.fromkeys(ing['code'] for ing in read_ingredients(data)))
+    history = history or load_history(data, stores)
+    names = list(dict.fromkeys(ing['ingredient'] for ing in ingredients))
+
+    assigner = StoreAssigner(history.purchase_db, stores=stores, matcher=matcher, seasonal=seasonal, on=on,
+                             latest=history.latest)
+    match_cache = load_match_cache(data.path, 'shopping_list', assigner.context, names, history.versions)
+    assigner.match_cache = match_cache
+    assignments = assigner.assign_all(ingredients)
+
+    # Per-store prices for the optimizer; rule-pinned ingredients stay pinned
+    prices = {}
+    forced = {}
+    for name in names:
+        store = assigner.forced_store(name)
+        if store:
+            forced[name] = store
+            prices[name] = {store: assignments[name]['price']}
+            continue
+        prices[name] = {}
+        for store in stores:
+            item_key = assigner.match('cheapest', name.lower(), store)
+            if item_key:
+                prices[name][store] = assigner.price(store, item_key)
+    save_match_cache(data.path, 'shopping_list', match_cache)
+
+    return {
+        'ingredients': ingredients,
+        'meals': meals,
+        'assignments': assignments,
+        'prices': prices,
+        'forced': forced,
+        'stores': list(stores),
+        'trip_costs': trip_costs,
+    }
+
+
+def _init_worker(tables):
+    global _tables
+    _tables = tables
+
+
+def price_plan(name, meals, tables=None):
+    """Shopping list, per-store totals and (with trip costs) optimal store set for one plan.
+
+    Raises ValueError for meal codes that are not in the ingredients sheet.
+    """
+    tables = tables if tables is not None else _tables
+    meals = set(meals)
+    unknown = sorted(map(str, meals - set(tables['meals'])))
+    if unknown:
+        raise ValueError(f"Unknown meals in plan {name!r}: {', '.join(unknown)}")
+    rows = [ing for ing in tables['ingredients'] if ing['code'] in meals]
+    by_store, store_totals = group_by_store(rows, tables['assignments'])
+    result = {
+        'plan': name,
+        'meals': sorted(meals),
+        'stores': {store: items for store, items in by_store.items()},
+        'store_totals': dict(store_totals),
+        'total': sum(store_totals.values()),
+        'optimal': None
+    }
+    if tables['trip_costs'] is not None:
+        quantities = {}
+        for ing in rows:
+            quantities[ing['ingredient']] = quantities.get(ing['ingredient'], 0) + 1
+        prices = {n: tables['prices'][n] for n in quantities}
+        forced = {n: s for n, s in tables['forced'].items() if n in quantities}
+        plan = StoreOptimizer(tables['trip_costs'], tables['stores']).solve(prices, forced, quantities)
+        result['optimal'] = {
+            'stores': plan.stores,
+            'assignments': plan.assignments,
+            'item_costs': plan.item_costs,
+            'item_cost': plan.item_cost,
+            'visit_cost': plan.visit_cost,
+            'total': plan.total,
+            'missing': plan.missing
+        }
+    return result
+
+
+def plan_batch(data, plans, exclude_items=EXCLUDE_ITEMS, stores=GROCERY_STORES,
+               trip_costs=None, max_workers=None):
+    """Price ``plans`` (``{name: [meal code, ...]}``) in parallel.
+
+    ``max_workers=0`` prices in this process, which is faster for a handful
+    of plans; otherwise the pool defaults to one worker per CPU.
+    """
+    tables = build_tables(data, exclude_items, stores, trip_costs)
+    names = list(plans)
+    meal_lists = [plans[name] for name in names]
+    if max_workers == 0:
+        return [price_plan(name, meals, tables) for name, meals in zip(names, meal_lists)]
+
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(names) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tables,)) as pool:
+        return list(pool.map(price_plan, names, meal_lists, chunksize=chunksize))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Price many meal plans at once.')
+    parser.add_argument('plans_file', nargs='?', help='JSON file: {"plan name": ["A", "B"], ...}')
+    parser.add_argument('--plan', action='append', default=[], help='comma-separated meal codes (repeatable)')
+    parser.add_argument('--workbook', default=DEFAULT_WORKBOOK)
+    parser.add_argument('--trip-cost', type=float, help='cost per store visit; enables the optimal store set')
+    parser.add_argument('--workers', type=int, help='worker processes (0 = no pool)')
+    args = parser.parse_args(argv)
+
+    plans = {}
+    if args.plans_file:
+        with open(args.plans_file, encoding='utf-8') as f:
+            plans.update(json.load(f))
+    for codes in args.plan:
+        plans[codes] = [code.strip() for code in codes.split(',') if code.strip()]
+    if not plans:
+        parser.error('give a plans file or at least one --plan')
+
+    trip_costs = None
+    if args.trip_cost is not None:
+        trip_costs = {store: args.trip_cost for store in GROCERY_STORES}
+
+    try:
+        results = plan_batch(load(args.workbook), plans, trip_costs=trip_costs, max_workers=args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("=" * 80)
+    print(f"BATCH PLAN PRICING ({len(results)} plans)")
+    print("=" * 80)
+    for result in results:
+        totals = ', '.join(f"{store} ${total:.2f}" for store, total in
+                           sorted(result['store_totals'].items(), key=lambda kv: kv[1], reverse=True))
+        print(f"\n{result['plan']} [Meals {', '.join(result['meals'])}]: ${result['total']:.2f}")
+        print(f"  {totals}")
+        if result['optimal']:
+            optimal = result['optimal']
+            print(f"  Optimal: {', '.join(optimal['stores'])} = ${optimal['item_cost']:.2f}"
+                  f" + ${optimal['visit_cost']:.2f} trips = ${optimal['total']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
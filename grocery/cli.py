@@ -0,0 +1,433 @@
+"""One command line for the grocery scripts: ``python -m grocery <command>``.
+
+The scripts each load the workbook, rebuild the purchase history and filter
+the ingredient list themselves. The commands here share one ``Session``
+that loads each of those on first use. Several commands can run in one
+invocation, so the workbook, history and matcher are loaded only once.
+Heavy modules (openpyxl, NumPy) are imported only by the commands that need
+them, e.g. ``inspect`` on a warm sidecar never touches either.
+
+Commands:
+    inspect         sheets, headers, row counts and purchase locations
+    meals           meals and their ingredients (--costs: at current prices)
+    history         purchases per store and the most recent ones
+                    (--item/--since/--until: query the SQLite purchase store)
+    optimize        cheapest store set for the meals, including trip costs
+    shopping-list   store assignments by rule (what revised_no_walmart.py prints)
+                    (--consolidate: one line per ingredient, pack sizes chosen)
+
+``optimize`` and ``shopping-list`` take ``--on YYYY-MM-DD`` to price the
+trip from each item's seasonal profile (``grocery.seasonal``).
+
+Usage:
+    python -m grocery inspect
+    python -m grocery meals --costs history --recent 5
+    python -m grocery shopping-list --meals A,B optimize --trip-cost 5
+    python -m grocery history --item kale --store H-Mart --since 2025-03-01
+    python -m grocery --db shopping-list      # history lookups as SQLite queries
+    python -m grocery --merged history optimize   # receipts from every workbook
+    python -m grocery shopping-list --on 2026-06-01
+"""
+
+import argparse
+import contextlib
+import sys
+
+from grocery import instrument
+from grocery.loader import DEFAULT_WORKBOOK, parse_date
+
+# Items already at home (revised_no_walmart.py's list)
+EXCLUDE_ITEMS = ['olive oil', 'salt', 'pepper', 'spices', 'garlic', 'ginger', 'sourdough bread']
+
+# Stores listed by ``history`` (complete_analysis.py's list)
+HISTORY_STORES = ['Costco', 'Safeway', 'H-Mart', 'King Sooper\'s ', 'Trader Joe\'s',
+                  'Whole Foods', 'Sprouts', 'Walmart', 'Target']
+
+
+class Session:
+    """Workbook, histories and matchers loaded on first use and shared by commands."""
+
+    def __init__(self, workbook=DEFAULT_WORKBOOK, use_cache=True, use_db=False, merged=False):
+        self.workbook = workbook
+        self.use_cache = use_cache
+        self.use_db = use_db
+        self.merged = merged
+        self._data = None
+        self._store = None
+        self._histories = {}
+        self._matchers = {}
+
+    @property
+    def data(self):
+        if self._data is None:
+            with instrument.phase('load'):
+                if self.merged:
+                    from grocery.merge import SHOPPING_WORKBOOK, load_merged
+                    self._data = load_merged([self.workbook, SHOPPING_WORKBOOK], self.use_cache)
+                else:
+                    from grocery.loader import load
+                    self._data = load(self.workbook, self.use_cache)
+        return self._data
+
+    @property
+    def store(self):
+        """The SQLite purchase store, synced with the workbook."""
+        if self._store is None:
+            from grocery.purchase_store import open_store
+            self._store = open_store(self.data)
+        return self._store
+
+    def history(self, stores):
+        key = tuple(stores)
+        if key not in self._histories:
+            if self.use_db:
+                self._histories[key] = self.store.history(stores)
+                return self._histories[key]
+            from grocery.history import load_history
+            data = self.data
+            with instrument.phase('history'):
+                self._histories[key] = load_history(data, stores, self.use_cache)
+        return self._histories[key]
+
+    def matcher(self, stores):
+        key = tuple(stores)
+        if key not in self._matchers:
+            from grocery.fuzzy_match import FuzzyMatcher
+            self._matchers[key] = FuzzyMatcher.from_json(self.history(stores).purchase_db)
+        return self._matchers[key]
+
+    def ingredients(self, exclude_items=EXCLUDE_ITEMS, meals=None):
+        from grocery.shopping_list import read_ingredients
+        return read_ingredients(self.data, exclude_items, meals)
+
+
+def split_meals(value):
+    return [code.strip() for code in value.split(',') if code.strip()] if value else None
+
+
+def inspect(session, args):
+    data = session.data
+    print("=" * 80)
+    print(f"{data.workbook}: {len(data.sheetnames)} sheets")
+    print("=" * 80)
+    for name in data.sheetnames:
+        if name in data.sheets:
+            rows = data.rows(name)
+            print(f"\n{name}: {len(rows)} rows")
+            print(f"  Headers: {rows[0] if rows else ()}")
+            for row in rows[1:args.rows + 1]:
+                print(f"  {row}")
+        elif data.purchases.headers and name == 'ItemizedPurchase':
+            purchases = data.purchases
+            print(f"\n{name}: {len(purchases) + 1} rows")
+            print(f"  Headers: {purchases.headers}")
+            print(f"  Locations: {sorted(loc for loc in purchases.locations if loc)}")
+        else:
+            print(f"\n{name}: not loaded")
+
+
+def meals(session, args):
+    rows = session.ingredients(exclude_items=(), meals=split_meals(args.meals))
+    by_meal = {}
+    for row in rows:
+        by_meal.setdefault(row['code'], (row['meal'], []))[1].append(row)
+
+    print("=" * 80)
+    print("MEALS AND INGREDIENTS")
+    print("=" * 80)
+    for code in sorted(by_meal):
+        name, ingredients = by_meal[code]
+        print(f"\n{code}. {name}")
+        print("-" * 60)
+        for ing in ingredients:
+            print(f"  - {ing['ingredient']}: {ing['qty_needed']} {ing['unit']} "
+                  f"(from {ing['total_qty']} {ing['unit']} @ ${ing['cost_total']})")
+
+    if args.costs:
+        from grocery.meal_costs import MealCosts
+        from grocery.shopping_list import GROCERY_STORES
+
+        history = session.history(GROCERY_STORES)
+        with instrument.phase('meal costs'):
+            costs = MealCosts.build(session.data, history, session.matcher(GROCERY_STORES))
+        print("\n" + "=" * 80)
+        print("MEAL COSTS AT CURRENT PRICES")
+        print("=" * 80)
+        meal_costs = costs.meal_costs()
+        for code in sorted(by_meal):
+            if code not in meal_costs:
+                continue
+            cost = meal_costs[code]
+            per_serving = costs.cost_per_serving(code)
+            serving_text = f", ${per_serving:.2f}/serving" if per_serving is not None else ""
+            print(f"  {code}. {costs.meal_names[code]}: ${cost:.2f}{serving_text}")
+
+
+def history(session, args):
+    if args.item or args.since or args.until:
+        from grocery.purchase_store import print_purchases
+        print_purchases(session.store, args.item, args.store, args.since, args.until, args.recent)
+        return
+    stores = args.store or HISTORY_STORES
+    counts = {}
+    recent = {}
+    for purchase in session.data.purchases.iter_records(stores):
+        counts[purchase.location] = counts.get(purchase.location, 0) + 1
+        latest = recent.setdefault(purchase.location, [])
+        if len(latest) < args.recent:
+            latest.append(purchase)
+
+    print("=" * 80)
+    print("GROCERY STORE PURCHASE HISTORY")
+    print("=" * 80)
+    for store in stores:
+        if store in counts:
+            print(f"\n{store}: {counts[store]} items")
+            for item in recent[store]:
+                print(f"  {item.date}: {item.item} - ${item.price}")
+
+
+def optimize(session, args):
+    from grocery.batch import build_tables, price_plan
+    from grocery.shopping_list import GROCERY_STORES
+
+    trip_costs = {store: args.trip_cost for store in GROCERY_STORES}
+    with instrument.phase('optimize'):
+        tables = build_tables(session.data, excluded(session, args), GROCERY_STORES, trip_costs,
+                              session.history(GROCERY_STORES), session.matcher(GROCERY_STORES),
+                              seasonal(session, args), args.on)
+        meal_codes = split_meals(args.meals) or {ing['code'] for ing in tables['ingredients']}
+        try:
+            optimal = price_plan('optimize', meal_codes, tables)['optimal']
+        except ValueError as e:
+            sys.exit(f"python -m grocery optimize: error: {e}")
+
+    by_store = {}
+    for name, store in optimal['assignments'].items():
+        by_store.setdefault(store, []).append((name, optimal['item_costs'][name]))
+    print("=" * 80)
+    print(f"OPTIMAL STORE SET (including trip costs), meals {', '.join(sorted(meal_codes))}")
+    print("=" * 80)
+    for store in optimal['stores']:
+        items = by_store.get(store, [])
+        print(f"\n{store} (${sum(cost for _, cost in items):.2f} + ${trip_costs[store]:.2f} trip, "
+              f"{len(items)} ingredients):")
+        for name, cost in items:
+            print(f"  - {name}: ${cost:.2f}")
+    if optimal['missing']:
+        print(f"\nNo price history: {', '.join(optimal['missing'])}")
+    print(f"\nItems ${optimal['item_cost']:.2f} + trips ${optimal['visit_cost']:.2f} = ${optimal['total']:.2f}")
+
+
+def shopping_list(session, args):
+    from grocery.match_cache import load_match_cache, save_match_cache
+    from grocery.shopping_list import GROCERY_STORES, StoreAssigner, group_by_store
+
+    ingredients_needed = session.ingredients(excluded(session, args), split_meals(args.meals))
+    history = session.history(GROCERY_STORES)
+
+    print("=" * 80)
+    print("CONSOLIDATED SHOPPING LIST" if args.consolidate else "UPDATED SHOPPING LIST")
+    print("Prioritizing: Costco for meat/eggs, H-Mart for produce, Safeway for frozen, Walmart for juice")
+    print("=" * 80)
+
+    # Remembered matches from earlier runs mean only new ingredients (or
+    # stores with new receipts) get matched
+    with instrument.phase('assign'):
+        assigner = StoreAssigner(history.purchase_db, stores=GROCERY_STORES, matcher=session.matcher(GROCERY_STORES),
+                                 seasonal=seasonal(session, args), on=args.on, latest=history.latest)
+        match_cache = load_match_cache(session.data.path, 'shopping_list', assigner.context,
+                                       [ing['ingredient'] for ing in ingredients_needed], history.versions)
+        assigner.match_cache = match_cache
+        assignments = assigner.assign_all(ingredients_needed)
+        save_match_cache(session.data.path, 'shopping_list', match_cache)
+
+    by_store, store_totals = group_by_store(ingredients_needed, assignments)
+    meal_names = {ing['code']: ing['meal'] for ing in ingredients_needed}
+
+    # Each store also goes to dashboard/data/results as it is printed
+    if args.consolidate:
+        from grocery.consolidate import PackOptimizer, consolidate, consolidated_list, print_consolidated
+        from grocery.units import UnitConverter
+
+        converter = UnitConverter.from_json()
+        demands = consolidate(ingredients_needed, converter)
+        print(f"{len(ingredients_needed)} recipe rows -> {len(demands)} ingredients")
+        with instrument.phase('consolidate'):
+            packer = PackOptimizer(history.purchase_db, converter, assigner.seasonal, args.on)
+            choices, totals = consolidated_list(demands, assigner, packer)
+        with instrument.phase('output'), result_writer(args, 'shopping_list_consolidated') as results:
+            print_consolidated(choices, totals, store_totals, results, meal_names)
+        return
+    with instrument.phase('output'), result_writer(args, 'shopping_list') as results:
+        for store in sorted(by_store.keys(), key=lambda s: store_totals[s], reverse=True):
+            items = by_store[store]
+            total = store_totals[store]
+            print(f"\n{'=' * 80}")
+            print(f"{store.upper()} (${total:.2f} total, {len(items)} items)")
+            print('=' * 80)
+            for item in items:
+                print(f"  - {item['ingredient']}: {item['qty']} {item['unit']} = ${item['price']:.2f} [Meal {item['meal']}]")
+                print(f"    (Historical: {item['item']})")
+            if results is not None:
+                from grocery.export import shopping_item
+                results.add_store(store, [shopping_item(item['ingredient'], item['qty'], item['unit'], item['price'],
+                                                        item['meal'], meal_names.get(item['meal']), item['item'])
+                                          for item in items], total)
+
+    print(f"\n{'=' * 80}")
+    print(f"GRAND TOTAL: ${sum(store_totals.values()):.2f}")
+    print('=' * 80)
+
+
+def result_writer(args, name):
+    """``ResultWriter`` for ``RESULTS_DIR/<name>``; with ``--no-export``, a context yielding None."""
+    if args.no_export:
+        return contextlib.nullcontext()
+    from grocery.export import RESULTS_DIR, ResultWriter
+    return ResultWriter(RESULTS_DIR / name)
+
+
+def excluded(session, args):
+    """``--exclude``, minus the staples predicted to run out with ``--auto-exclude``."""
+    if not args.auto_exclude:
+        return args.exclude
+    from grocery.shopping_list import GROCERY_STORES
+    from grocery.staples import day_label, staples_to_buy
+    include, exclude, model = staples_to_buy(session.data, session.history(GROCERY_STORES),
+                                             session.matcher(GROCERY_STORES), args.exclude, args.horizon)
+    print(f"Staples running low within {args.horizon} days of {day_label(model.as_of)} (the newest receipt, "
+          f"not today), buying: {', '.join(include) or 'none'}")
+    return exclude
+
+
+def seasonal(session, args):
+    """``SeasonalModel`` for the grocery stores when ``--on`` is given, else None."""
+    if args.on is None:
+        return None
+    from grocery.seasonal import load_seasonal
+    from grocery.shopping_list import GROCERY_STORES
+    with instrument.phase('seasonal'):
+        return load_seasonal(session.data, session.history(GROCERY_STORES), session.use_cache)
+
+
+def _add_plan_options(parser):
+    parser.add_argument('--meals', help='comma-separated meal codes (default: all)')
+    parser.add_argument('--exclude', nargs='*', default=list(EXCLUDE_ITEMS), help='ingredients already at home')
+    parser.add_argument('--auto-exclude', action='store_true',
+                        help='only exclude staples predicted to last past --horizon days (from purchase intervals)')
+    parser.add_argument('--horizon', type=int, default=7, help='days until the next shopping trip')
+    parser.add_argument('--on', type=parse_date,
+                        help='shopping date (YYYY-MM-DD): scale latest prices by each item\'s seasonal profile')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m grocery', description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog='Commands can be chained: python -m grocery meals history --recent 3')
+    parser.add_argument('--workbook', default=DEFAULT_WORKBOOK)
+    parser.add_argument('--no-cache', action='store_true', help='parse the workbook and rebuild history from scratch')
+    parser.add_argument('--db', action='store_true', help='look purchases up in the SQLite purchase store')
+    parser.add_argument('--merged', action='store_true',
+                        help='purchases from every receipt workbook (grocery.merge), not just ItemizedPurchase')
+    commands = parser.add_subparsers(dest='command', metavar='command', required=True)
+
+    sub = commands.add_parser('inspect', help='sheets, headers and row counts')
+    sub.add_argument('--rows', type=int, default=0, help='also print the first N rows of each small sheet')
+    sub.set_defaults(run=inspect)
+
+    sub = commands.add_parser('meals', help='meals and their ingredients')
+    sub.add_argument('--meals', help='comma-separated meal codes (default: all)')
+    sub.add_argument('--costs', action='store_true', help='also price each meal at current prices')
+    sub.set_defaults(run=meals)
+
+    sub = commands.add_parser('history', help='purchases per store')
+    sub.add_argument('--store', action='append', help='store to list (repeatable; default: all grocery stores)')
+    sub.add_argument('--recent', type=int, default=10, help='most recent purchases to show per store')
+    sub.add_argument('--item', help='only purchases whose item name contains this text')
+    sub.add_argument('--since', type=parse_date, help='first date, YYYY-MM-DD')
+    sub.add_argument('--until', type=parse_date, help='last date, YYYY-MM-DD')
+    sub.set_defaults(run=history)
+
+    sub = commands.add_parser('optimize', help='cheapest store set including trip costs')
+    _add_plan_options(sub)
+    sub.add_argument('--trip-cost', type=float, default=5.0, help='cost of one store visit')
+    sub.set_defaults(run=optimize)
+
+    sub = commands.add_parser('shopping-list', help='store assignments by rule')
+    _add_plan_options(sub)
+    sub.add_argument('--no-export', action='store_true', help="don't write dashboard/data/results files")
+    sub.add_argument('--consolidate', action='store_true',
+                     help='merge each ingredient across meals and buy the cheapest mix of pack sizes')
+    sub.set_defaults(run=shopping_list)
+    return parser
+
+
+def _subparsers(parser):
+    """``{command: parser}`` of ``parser``'s subcommands."""
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return action.choices
+    return {}
+
+
+def _takes_value(parser, arg):
+    """True if ``arg`` is an option of ``parser`` whose value is the next argument."""
+    if not arg.startswith('-') or '=' in arg:
+        return False
+    options = {option: action for action in parser._actions for option in action.option_strings}
+    if arg not in options and arg.startswith('--'):
+        # argparse accepts unambiguous prefixes of long options
+        matches = [option for option in options if option.startswith(arg)]
+        arg = matches[0] if len(matches) == 1 else arg
+    action = options.get(arg)
+    return action is not None and action.nargs != 0
+
+
+def split_commands(argv, parser):
+    """``argv`` cut into one argument list per command (global options stay with the first).
+
+    A command name only starts a new command where an argument could go, not
+    as the value of an option: ``history --store history`` is one command.
+    """
+    commands = _subparsers(parser)
+    current = parser
+    chunks = [[]]
+    seen_command = False
+    is_value = False
+    for arg in argv:
+        if is_value:
+            is_value = False
+        elif arg in commands:
+            if seen_command:
+                chunks.append([])
+            seen_command = True
+            current = commands[arg]
+        else:
+            is_value = _takes_value(current, arg)
+        chunks[-1].append(arg)
+    return chunks
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+        if instrument.enabled():
+            instrument.current().label = 'python -m grocery ' + ' '.join(argv)
+    argv = list(argv)
+    parser = build_parser()
+    chunks = split_commands(argv, parser)
+
+    first = parser.parse_args(chunks[0])
+    session = Session(first.workbook, use_cache=not first.no_cache, use_db=first.db, merged=first.merged)
+    runs = [first] + [parser.parse_args(chunk) for chunk in chunks[1:]]
+    for i, args in enumerate(runs):
+        if i:
+            print()
+        with instrument.phase(args.command):
+            args.run(session, args)
+    return session
+
+
+if __name__ == '__main__':
+    main()
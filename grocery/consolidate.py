@@ -0,0 +1,242 @@
+"""Consolidated demand and pack-size choice across meals.
+
+``group_by_store`` adds an ingredient's package price once per recipe row,
+so kale used in three meals is bought, and counted in the store total,
+three times. Here the rows of the selected meals are first merged per
+canonical ingredient (ingredients.json key by name or alias, so 'Egg' and
+'egg' are one ingredient) and the total need is then covered with the cheapest mix of the
+pack sizes seen on receipts at the store:
+
+- the need is summed in grams / millilitres / each when every row converts
+  (``Demand.amount``), and always as a number of sheet packages
+  (``Demand.packages``, the sum of ``Qt / Total``);
+- each distinct ``qty``/``unit`` bought at the store is an offer at its most
+  recent price; with no convertible offers the latest purchase counts as
+  one sheet package, as in ``PurchaseScheduler``; with a ``SeasonalModel``
+  the prices are scaled to the shopping date;
+- ``cheapest_packs`` solves the covering knapsack: pack counts minimizing
+  cost with total size at least the need.
+
+Usage:
+    demands = consolidate(read_ingredients(data, EXCLUDE_ITEMS, ['A', 'B']), converter)
+    packer = PackOptimizer(history.purchase_db, converter)
+    choice = packer.choose(demands[0], 'Costco', 'kirkland organic kale')
+    choice.packs, choice.cost
+
+    python -m grocery.consolidate --meals A,B,C     # = python -m grocery shopping-list --consolidate
+"""
+
+import math
+import sys
+
+import numpy as np
+
+from grocery.meal_costs import package_fraction
+from grocery.price_series import newest_first
+
+PACKAGES = 'package'
+# Knapsack resolution: the need is split into at most this many steps
+MAX_STEPS = 2000
+STEPS_PER_PACK = 20
+
+
+class Demand:
+    """Total need for one canonical ingredient over the selected meals."""
+
+    def __init__(self, key, rows):
+        self.key = key
+        self.rows = rows
+        self.names = list(dict.fromkeys(row['ingredient'] for row in rows))
+        self.name = self.names[0]
+        self.meals = list(dict.fromkeys(row['code'] for row in rows))
+        self.packages = sum(package_fraction(row) for row in rows)
+        self.amount = None        # in ``dim``, when every row converts
+        self.dim = None
+
+    def __repr__(self):
+        amount = f"{self.amount:.1f} {self.dim}" if self.dim else f"{self.packages:.2f} packages"
+        return f"Demand({self.name!r}, {amount}, meals={''.join(map(str, self.meals))})"
+
+    def quantities(self):
+        """Recipe quantities as text, e.g. '1 bunch + 2 bunch'."""
+        return ' + '.join(f"{row['qty_needed']:g} {row['unit']}" if isinstance(row['qty_needed'], (int, float))
+                          else f"{row['qty_needed']} {row['unit']}" for row in self.rows)
+
+
+def consolidate(rows, converter):
+    """``[Demand]`` per canonical ingredient, in order of first appearance."""
+    groups = {}
+    for row in rows:
+        # Exact names and aliases only: 'Lemon Juice' must not become 'lemon'
+        name = str(row['ingredient']).lower().strip()
+        key = converter.aliases.get(name, name)
+        groups.setdefault(key, []).append(row)
+
+    demands = []
+    for key, group in groups.items():
+        demand = Demand(key, group)
+        dims = [converter.to_base(row['qty_needed'], row['unit'], demand.name)[1] for row in group]
+        dim = next((d for d in dims if d is not None), None)
+        if dim is not None:
+            amounts = [converter.convert(row['qty_needed'], row['unit'], dim, demand.name) for row in group]
+            if all(amount is not None for amount in amounts):
+                demand.amount, demand.dim = sum(amounts), dim
+        demands.append(demand)
+    return demands
+
+
+class PackChoice:
+    """Packs bought at one store to cover one ``Demand``."""
+
+    def __init__(self, demand, store, packs, unit, item=None):
+        self.demand = demand
+        self.store = store
+        self.packs = packs        # [(count, size, price, item)]
+        self.unit = unit          # unit of ``size`` (``dim`` or PACKAGES)
+        self.item = item
+        self.cost = sum(count * price for count, _, price, _ in packs)
+        self.covered = sum(count * size for count, size, _, _ in packs)
+        self.needed = demand.amount if unit == demand.dim and unit != PACKAGES else demand.packages
+
+    @property
+    def count(self):
+        return sum(count for count, _, _, _ in self.packs)
+
+    def describe(self):
+        if not self.packs:
+            return 'not in history'
+        return ' + '.join(f"{count} x {_size_text(size, self.unit)} @ ${price:.2f}"
+                          for count, size, price, _ in self.packs)
+
+
+def _size_text(size, unit):
+    if unit == PACKAGES:
+        return 'pack'
+    return f"{size:g} {unit}" if size < 100 else f"{size:.0f} {unit}"
+
+
+def cheapest_packs(sizes, prices, need):
+    """Pack counts covering ``need`` at least cost: ``(counts, cost)``.
+
+    A covering knapsack over ``need`` split into integer steps; sizes are
+    rounded down to whole steps, so the chosen packs always cover ``need``.
+    Returns ``(None, inf)`` when there are no offers.
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    if not len(sizes) or need <= 0:
+        return (np.zeros(len(sizes), dtype=np.int64), 0.0) if len(sizes) else (None, math.inf)
+    step = max(min(need, sizes.min()) / STEPS_PER_PACK, need / MAX_STEPS)
+    steps = int(math.ceil(need / step - 1e-9))
+    pack_steps = np.maximum(1, np.floor(sizes / step + 1e-9)).astype(np.int64)
+
+    # best[q]: cheapest cost covering at least q steps
+    best = np.full(steps + 1, math.inf)
+    choice = np.full(steps + 1, -1, dtype=np.int64)
+    best[0] = 0.0
+    for q in range(1, steps + 1):
+        costs = prices + best[np.maximum(0, q - pack_steps)]
+        k = int(np.argmin(costs))
+        best[q], choice[q] = costs[k], k
+    counts = np.zeros(len(sizes), dtype=np.int64)
+    q = steps
+    while q > 0:
+        k = choice[q]
+        counts[k] += 1
+        q = max(0, q - pack_steps[k])
+    return counts, float(best[steps])
+
+
+class PackOptimizer:
+    """Chooses pack sizes per store from ``purchase_db`` receipts."""
+
+    def __init__(self, purchase_db, converter, seasonal=None, on=None):
+        self.purchase_db = purchase_db
+        self.converter = converter
+        self.seasonal = seasonal
+        self.on = on
+
+    def offers(self, demand, store, item_key):
+        """``([(size, price, item)], unit)``: one offer per distinct pack size, latest price."""
+        purchases = self.purchase_db.get(store, {}).get(item_key) if item_key else None
+        if not purchases:
+            return [], None
+        factor = self.seasonal.factor(store, item_key, self.on) if self.seasonal is not None else 1.0
+        purchases = newest_first(purchases)
+        if demand.dim is not None:
+            by_size = {}
+            for purchase in purchases:
+                size = self.converter.convert(purchase.qty, purchase.unit, demand.dim, demand.name)
+                if size and size > 0:
+                    # Newest first, so the first price per size is the latest
+                    by_size.setdefault(round(size, 3), (size, purchase.price * factor, purchase.item))
+            if by_size:
+                return list(by_size.values()), demand.dim
+        latest = purchases[0]
+        return [(1.0, latest.price * factor, latest.item)], PACKAGES
+
+    def choose(self, demand, store, item_key):
+        """Cheapest ``PackChoice`` at ``store`` from the receipts of ``item_key``."""
+        offers, unit = self.offers(demand, store, item_key)
+        if not offers:
+            return PackChoice(demand, store, [], None)
+        need = demand.amount if unit != PACKAGES else demand.packages
+        counts, _ = cheapest_packs([o[0] for o in offers], [o[1] for o in offers], need)
+        packs = [(int(count), size, price, item) for count, (size, price, item) in zip(counts, offers) if count]
+        return PackChoice(demand, store, packs, unit, offers[0][2])
+
+
+def consolidated_list(demands, assigner, packer):
+    """``({store: [PackChoice]}, {store: total})`` using the assigner's store per ingredient.
+
+    Each canonical ingredient is assigned (and matched) under its first
+    spelling, or the next one in ``demand.names`` if that finds no purchase.
+    """
+    by_store = {}
+    totals = {}
+    for demand in demands:
+        assignment = assigner.assign(demand.name)
+        for name in demand.names[1:]:
+            if assignment.get('price'):
+                break
+            assignment = assigner.assign(name)
+        store = assignment['store']
+        item_key = str(assignment['item']).lower() if assignment.get('price') else None
+        choice = packer.choose(demand, store, item_key)
+        by_store.setdefault(store, []).append(choice)
+        totals[store] = totals.get(store, 0.0) + choice.cost
+    return by_store, totals
+
+
+def print_consolidated(by_store, totals, per_row_totals=None, results=None, meal_names=None):
+    """Print the list by store; with ``results`` (a ``ResultWriter``) also export it."""
+    for store in sorted(by_store, key=lambda s: totals[s], reverse=True):
+        choices = by_store[store]
+        print(f"\n{'=' * 80}")
+        print(f"{store.upper()} (${totals[store]:.2f} total, {len(choices)} ingredients)")
+        print('=' * 80)
+        for choice in choices:
+            demand = choice.demand
+            print(f"  - {demand.name}: {demand.quantities()} [Meals {', '.join(map(str, demand.meals))}]")
+            print(f"    {choice.describe()} = ${choice.cost:.2f}" + (f" ({choice.item})" if choice.item else ''))
+        if results is not None:
+            from grocery.export import shopping_item
+            results.add_store(store, [shopping_item(choice.demand.name, choice.count or None,
+                                                    choice.unit if choice.unit != PACKAGES else 'pack',
+                                                    choice.cost, choice.demand.meals, meal_names, choice.item)
+                                      for choice in choices], totals[store])
+    print(f"\n{'=' * 80}")
+    line = f"GRAND TOTAL: ${sum(totals.values()):.2f}"
+    if per_row_totals is not None:
+        line += f" (${sum(per_row_totals.values()):.2f} pricing every recipe row separately)"
+    print(line)
+    print('=' * 80)
+
+
+def main(argv=None):
+    from grocery.cli import main as cli_main
+    cli_main(['shopping-list', '--consolidate'] + list(argv if argv is not None else sys.argv[1:]))
+
+
+if __name__ == '__main__':
+    main()
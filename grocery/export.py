@@ -0,0 +1,293 @@
+"""Result files for the dashboard and downstream jobs.
+
+The scripts only print their results, so anything that wants the store
+assignments or price comparisons has to re-run the analysis or scrape
+stdout. ``ResultWriter`` writes them as they are produced to:
+
+- ``<prefix>.json`` in the dashboard's shopping-list shape (``stores`` ->
+  ``{name, items, estimatedTotal}``, ``totalItems``, ``totalEstimatedCost``,
+  ``meals``; see ``dashboard/js/shopping-list.js``) plus ``priceComparison``
+  and any other tables. Each store or row is serialized when it is added.
+- ``<prefix>.npz``, one flat table per kind of result stored column by
+  column: numbers as float64 (NaN for blanks), text dictionary-encoded as
+  int32 codes into a values array. ``read_columns`` decodes it.
+- ``<prefix>.<table>.csv`` per table, if asked for.
+
+Files are written under a temporary name and renamed on ``close()``, so a
+reader never sees a half-written result.
+
+Usage:
+    with ResultWriter(RESULTS_DIR / 'shopping_list') as out:
+        out.add_store('Costco', [shopping_item('Kale', 1, 'bunch', 1.48, 'A')], 1.48)
+        out.add_prices('Kale', {'H-Mart': 1.48, 'Walmart': 1.98}, best='H-Mart')
+        out.set('totalEstimatedCost', 1.48)
+
+    read_columns(RESULTS_DIR / 'shopping_list.npz')['assignments']['cost']
+"""
+
+import csv
+import json
+import math
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parents[1] / 'dashboard' / 'data' / 'results'
+EXPORT_VERSION = 1
+
+FORMATS = ('json', 'npz', 'csv')
+DEFAULT_FORMATS = ('json', 'npz')
+
+
+def _json_value(value):
+    """``value`` with NaN as None, datetimes as ISO strings and NumPy scalars unwrapped."""
+    if isinstance(value, dict):
+        return {key: _json_value(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_value(v) for v in value]
+    np = sys.modules.get('numpy')    # a NumPy scalar means NumPy is already imported
+    if np is not None and isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _dumps(value):
+    return json.dumps(_json_value(value))
+
+
+def shopping_item(name, quantity, unit, cost, meal, meal_name=None, item=''):
+    """One ``items`` entry as the dashboard builds it (``item`` is the matched receipt name).
+
+    ``meal`` may also be a list of codes, with ``meal_name`` a ``{code: name}`` dict.
+    """
+    meals = meal if isinstance(meal, list) else [meal]
+    names = meal_name if isinstance(meal_name, dict) else {code: meal_name for code in meals}
+    return {
+        'name': name,
+        'quantity': quantity,
+        'unit': unit or '',
+        'cost': cost,
+        'meals': [{'code': code, 'name': names.get(code) or code} for code in meals],
+        'item': item or ''
+    }
+
+
+class ColumnTable:
+    """Rows buffered column by column for the ``.npz`` file."""
+
+    def __init__(self, columns):
+        self.columns = {column: [] for column in columns}
+
+    def append(self, row):
+        for column, values in self.columns.items():
+            values.append(row.get(column))
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def arrays(self, table):
+        """``{'<table>.<column>': array}``; text columns add ``'<table>.<column>.values'``."""
+        import numpy as np
+
+        arrays = {}
+        for column, values in self.columns.items():
+            name = f'{table}.{column}'
+            if values and all(isinstance(value, bool) for value in values):
+                arrays[name] = np.array(values, dtype=bool)
+            elif all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+                   for value in values):
+                arrays[name] = np.array([math.nan if value is None else value for value in values],
+                                        dtype=np.float64)
+            else:
+                codes = {}
+                arrays[name] = np.array([codes.setdefault('' if value is None else str(value), len(codes))
+                                         for value in values], dtype=np.int32)
+                arrays[name + '.values'] = np.array(list(codes), dtype=str)
+        return arrays
+
+
+def read_columns(path):
+    """``{table: {column: list}}`` from a file written by ``ResultWriter``."""
+    import numpy as np
+
+    tables = {}
+    with np.load(path) as npz:
+        for name in npz.files:
+            if name.endswith('.values'):
+                continue
+            table, column = name.split('.', 1)
+            values = npz[name]
+            if name + '.values' in npz.files:
+                values = npz[name + '.values'][values]
+            tables.setdefault(table, {})[column] = values.tolist()
+    return tables
+
+
+class ResultWriter:
+    """Streams results to ``<prefix>.json``/``.npz``/``.<table>.csv`` (see module docstring)."""
+
+    ASSIGNMENT_COLUMNS = ('store', 'name', 'quantity', 'unit', 'cost', 'meal', 'item')
+    STORE_COLUMNS = ('store', 'items', 'total')
+    PRICE_COLUMNS = ('ingredient', 'store', 'price', 'best')
+
+    def __init__(self, prefix, formats=DEFAULT_FORMATS, generated=None):
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown result formats: {', '.join(sorted(unknown))}")
+        self.prefix = Path(prefix)
+        self.prefix.parent.mkdir(parents=True, exist_ok=True)
+        self.formats = tuple(formats)
+        self.tables = {}
+        self._csv = {}           # table -> (file, csv writer)
+        self._tmp_files = []     # (tmp path, final path)
+        self._meals = {}
+        self._trailing = {}
+        self._sections = []      # JSON keys already written
+        self._section = None     # [key, closing bracket, entries written]
+        self._json = None
+        if 'json' in self.formats:
+            self._json = open(self._tmp(self.prefix.with_name(self.prefix.name + '.json')), 'w', encoding='utf-8')
+            generated = generated or datetime.now().replace(microsecond=0)
+            self._json.write('{' + f'"version": {EXPORT_VERSION}, "generated": {_dumps(generated)}')
+
+    def _tmp(self, path):
+        tmp = path.with_name(path.name + '.tmp')
+        self._tmp_files.append((tmp, path))
+        return tmp
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # JSON sections are written one after another: a section can't be reopened
+    # once another has started
+    def _enter_section(self, key, bracket):
+        if self._json is None:
+            return
+        if self._section and self._section[0] == key:
+            return
+        if key in self._sections:
+            raise ValueError(f"Result section '{key}' was already written")
+        self._leave_section()
+        self._json.write(f', {json.dumps(key)}: {bracket}')
+        self._section = [key, '}' if bracket == '{' else ']', 0]
+        self._sections.append(key)
+
+    def _leave_section(self):
+        if self._section:
+            self._json.write(self._section[1])
+            self._section = None
+
+    def _write_entry(self, key, value):
+        if self._json is None:
+            return
+        prefix = ', ' if self._section[2] else ''
+        self._section[2] += 1
+        if key is not None:
+            prefix += json.dumps(key) + ': '
+        self._json.write(prefix + _dumps(value))
+
+    def add_rows(self, table, rows, columns=None):
+        """Append rows (dicts) to the columnar / CSV ``table`` (``add_table`` also writes JSON)."""
+        rows = list(rows)
+        if not rows:
+            return
+        target = self.tables.get(table)
+        if target is None:
+            target = self.tables[table] = ColumnTable(columns or list(rows[0]))
+        for row in rows:
+            target.append(row)
+        if 'csv' in self.formats:
+            self._write_csv(table, target.columns, rows)
+
+    def _write_csv(self, table, columns, rows):
+        if table not in self._csv:
+            path = self.prefix.with_name(f'{self.prefix.name}.{table}.csv')
+            f = open(self._tmp(path), 'w', newline='', encoding='utf-8')
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            self._csv[table] = (f, writer)
+        writer = self._csv[table][1]
+        writer.writerows([[_json_value(row.get(column)) for column in columns] for row in rows])
+
+    def add_table(self, table, rows, columns=None):
+        """``add_rows`` plus the rows as a JSON list under ``table``."""
+        rows = list(rows)
+        self._enter_section(table, '[')
+        for row in rows:
+            self._write_entry(None, row)
+        self.add_rows(table, rows, columns)
+
+    def add_store(self, store, items, total):
+        """One store of the shopping list (``items`` from ``shopping_item``)."""
+        self._enter_section('stores', '{')
+        self._write_entry(store, {'name': store, 'items': items, 'estimatedTotal': total})
+        self.add_rows('assignments', [
+            {'store': store, 'name': item['name'], 'quantity': item['quantity'], 'unit': item['unit'],
+             'cost': item['cost'], 'meal': ','.join(str(m['code']) for m in item['meals']),
+             'item': item.get('item', '')}
+            for item in items], self.ASSIGNMENT_COLUMNS)
+        self.add_rows('stores', [{'store': store, 'items': len(items), 'total': total}], self.STORE_COLUMNS)
+        for item in items:
+            for meal in item['meals']:
+                self._meals.setdefault(meal['code'], meal['name'])
+        self._trailing['totalItems'] = self._trailing.get('totalItems', 0) + len(items)
+        self._trailing['totalEstimatedCost'] = self._trailing.get('totalEstimatedCost', 0.0) + total
+
+    def add_prices(self, ingredient, prices, best=None):
+        """Latest price per store for one ingredient (``priceComparison`` in the JSON)."""
+        self._enter_section('priceComparison', '[')
+        self._write_entry(None, {'ingredient': ingredient, 'prices': prices, 'cheapestStore': best})
+        self.add_rows('prices', [{'ingredient': ingredient, 'store': store, 'price': price, 'best': store == best}
+                                 for store, price in prices.items()], self.PRICE_COLUMNS)
+
+    def set(self, key, value):
+        """A top-level JSON value, written on ``close()`` (overrides the running totals)."""
+        self._trailing[key] = value
+
+    def close(self):
+        if self._json is not None:
+            self._leave_section()
+            if self._meals and 'meals' not in self._trailing:
+                self._trailing['meals'] = [{'code': code, 'name': name} for code, name in self._meals.items()]
+            for key, value in self._trailing.items():
+                self._json.write(f', {json.dumps(key)}: {_dumps(value)}')
+            self._json.write('}\n')
+            self._json.close()
+        for f, _ in self._csv.values():
+            f.close()
+        if 'npz' in self.formats:
+            import numpy as np
+
+            arrays = {}
+            for table, columns in self.tables.items():
+                arrays.update(columns.arrays(table))
+            path = self.prefix.with_name(self.prefix.name + '.npz')
+            with open(self._tmp(path), 'wb') as f:
+                np.savez_compressed(f, **arrays)
+        for tmp, path in self._tmp_files:
+            os.replace(tmp, path)
+        self._tmp_files = []
+
+    def abort(self):
+        """Drop everything written so far, leaving earlier result files in place."""
+        if self._json is not None:
+            self._json.close()
+        for f, _ in self._csv.values():
+            f.close()
+        for tmp, _ in self._tmp_files:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        self._tmp_files = []
@@ -0,0 +1,359 @@
+"""Scored ingredient -> receipt item matching over a token / trigram index.
+
+The scripts used to match with ``word in item_key`` checks, which let
+"lemon" match "lemongrass", "honey" match "honeycrisp" and "butter" pull in
+croissants for peanut butter, and needed special cases such as egg vs
+eggplant. ``FuzzyMatcher`` instead indexes every receipt item name and every
+``dashboard/data/ingredients.json`` alias once, on the first lookup:
+
+- names are split into word tokens (price annotations after ``@``, numbers,
+  units and store brands dropped) and lightly stemmed ("tomatoes" ->
+  "tomato", "berries" -> "berry"),
+- a character-trigram index over the token vocabulary finds near-miss
+  spellings ("tomatos", "avacado"),
+- a candidate's score is recall x precision: the IDF-weighted share of the
+  ingredient's tokens it contains, times the share of the item name those
+  tokens explain. Words of the item name left unexplained count in full when
+  they name another ingredients.json food ("grape tomatoes" is not grapes,
+  "sardines in olive oil" is not olive oil), not at all when they are
+  ``DESCRIPTORS`` ("fresh red seedless grapes") and ``NOISE_WEIGHT`` each
+  otherwise (brands, varieties, flavours), so extra words can fail a match.
+
+An ingredient is scored under its own name and, when it resolves to an
+ingredients.json entry, under those of the entry's name and aliases that
+contain all of its words or are a different name for it altogether
+('parmigiano reggiano' for 'Parmesan'), but not ones that drop some of its
+words ('Lemon Juice' is not also looked up as 'lemon').
+Items with the same token set are scored once, and results are memoized per
+(ingredient, store), so repeat lookups are dictionary hits.
+
+Usage:
+    matcher = FuzzyMatcher.from_json(purchase_db)
+    matcher.best('Canned Mackerel', 'Costco')         # item key or None
+    matcher.candidates('Chicken', 'Safeway')          # [(score, item_key), ...]
+"""
+
+import json
+import math
+import re
+
+from grocery import instrument
+from grocery.units import INGREDIENTS_JSON
+
+# Bump when tokenizing or scoring changes, so cached matches are dropped
+MATCHER_VERSION = 2
+
+DEFAULT_THRESHOLD = 0.6
+TOKEN_SIMILARITY = 0.7   # trigram Dice needed for two different tokens to count
+NOISE_WEIGHT = 0.3       # precision cost of an unexplained word that is not a food
+ALIAS_THRESHOLD = 0.9
+
+STOPWORDS = {
+    'a', 'an', 'and', 'the', 'of', 'or', 'with', 'in', 'for', 'to', 'by', 'per', 'from',
+    'oz', 'fl', 'lb', 'lbs', 'ct', 'cnt', 'count', 'each', 'ea', 'pk', 'pack', 'bag', 'box',
+    'usa', 'mex', 'mexico', 'china', 'peru', 'ks', 'kirkland', 'signature', 'select', 'sig',
+    'great', 'value', 'brand',
+}
+
+# Item-name words that say nothing about what the product is: free for precision
+DESCRIPTORS = {
+    'fresh', 'organic', 'org', 'natural', 'all', 'whole', 'loose', 'seedless', 'peeled',
+    'frozen', 'dried', 'raw', 'pure', 'baby', 'curly', 'crumbled', 'crumble', 'sliced', 'diced', 'chopped',
+    'large', 'medium', 'small', 'mini', 'jumbo', 'xlarge', 'family', 'est',
+    'red', 'green', 'white', 'yellow', 'brown',
+    'bunch', 'stalk', 'clove', 'root', 'spear', 'floret',
+}
+
+_WORD = re.compile(r'[a-z]+')
+# 'sardines in olive oil', 'tomatoes with basil': the product comes first
+_CONTENTS = re.compile(r'\b(?:in|with)\b')
+
+
+def stem(token):
+    """Crude plural stripping, applied to both sides of a match."""
+    if len(token) <= 3:
+        return token
+    if token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith('oes') or token.endswith(('ches', 'shes', 'xes', 'sses')):
+        return token[:-2]
+    if token.endswith('s') and not token.endswith(('ss', 'us')):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Stemmed content tokens of an item or ingredient name, in order, deduplicated."""
+    text = str(text).lower().split('@', 1)[0]
+    tokens = []
+    for word in _WORD.findall(text):
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        token = stem(word)
+        if token in STOPWORDS:
+            continue
+        if token not in tokens:
+            tokens.append(token)
+    return tuple(tokens)
+
+
+def trigrams(token):
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def entry_aliases(entries):
+    """``{ingredients.json key: [name, alias, ...]}`` for loaded entries."""
+    return {key: [key.replace('_', ' '), entry.get('name', '')] + list(entry.get('aliases', []))
+            for key, entry in entries.items()}
+
+
+def load_aliases(path=INGREDIENTS_JSON):
+    with open(path, encoding='utf-8') as f:
+        return entry_aliases(json.load(f).get('ingredients', {}))
+
+
+class FuzzyMatcher:
+    """Ranks each store's receipt item keys against ingredient names."""
+
+    def __init__(self, purchase_db=None, aliases=None, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._stores = {}        # store -> {token set: [item_key, ...]} in history order
+        self._order = {}         # store -> {token set: first position}
+        self._postings = {}      # store -> {token: [token set, ...]}
+        self._df = {}            # token -> number of item names (all stores) containing it
+        self._documents = 0
+        self._vocab_trigrams = {}  # trigram -> set of tokens
+        self._neighbours = {}    # token -> {similar token: similarity}
+        self._results = {}       # (ingredient, store) -> [(score, item_key), ...]
+        self._queries = {}
+        self._pending = []       # (store, item_keys) not indexed yet
+
+        self.alias_names = aliases or {}
+        self.aliases = {}        # key -> [alias token tuple, ...]
+        self._alias_sets = {}    # alias token set -> key
+        self._foods = {}         # alias token -> keys whose names contain it
+        for key, names in (aliases or {}).items():
+            queries = list(dict.fromkeys(t for t in (tokenize(n) for n in names if n) if t))
+            self.aliases[key] = queries
+            for tokens in queries:
+                self._alias_sets.setdefault(frozenset(tokens), key)
+                self._add_vocabulary(tokens)
+                for token in tokens:
+                    self._foods.setdefault(token, set()).add(key)
+
+        for store, items in (purchase_db or {}).items():
+            self.add_store(store, items)
+
+    @classmethod
+    def from_json(cls, purchase_db=None, path=INGREDIENTS_JSON, threshold=DEFAULT_THRESHOLD):
+        return cls(purchase_db, load_aliases(path), threshold)
+
+    @property
+    def context(self):
+        """What cached matches depend on (see ``MatchCache.bind``)."""
+        return {'matcher': MATCHER_VERSION, 'threshold': self.threshold,
+                'aliases': sorted(self.alias_names.items())}
+
+    def _add_vocabulary(self, tokens):
+        for token in tokens:
+            if token not in self._neighbours:
+                self._neighbours[token] = None
+                for gram in trigrams(token):
+                    self._vocab_trigrams.setdefault(gram, set()).add(token)
+
+    def add_store(self, store, item_keys):
+        """Queue ``item_keys`` (history order) for ``store``; indexed on the next lookup."""
+        self._pending.append((store, list(item_keys)))
+        self._stores.setdefault(store, {})
+        self._results.clear()
+
+    def build(self):
+        """Index queued stores now instead of on the first lookup."""
+        if self._pending:
+            self._index_pending()
+        return self
+
+    def _index_pending(self):
+        pending, self._pending = self._pending, []
+        for store, item_keys in pending:
+            self._index_store(store, item_keys)
+        # New vocabulary changes neighbours and IDF weights
+        self._neighbours = dict.fromkeys(self._neighbours)
+        self._queries.clear()
+
+    def _index_store(self, store, item_keys):
+        groups = self._stores.setdefault(store, {})
+        order = self._order.setdefault(store, {})
+        postings = self._postings.setdefault(store, {})
+        for item_key in item_keys:
+            tokens = frozenset(tokenize(item_key))
+            self._documents += 1
+            for token in tokens:
+                self._df[token] = self._df.get(token, 0) + 1
+            if tokens not in groups:
+                groups[tokens] = []
+                order[tokens] = len(order)
+                for token in tokens:
+                    postings.setdefault(token, []).append(tokens)
+                self._add_vocabulary(tokens)
+            groups[tokens].append(item_key)
+
+    def neighbours(self, token):
+        """``{vocabulary token: similarity}`` for tokens close to ``token``."""
+        found = self._neighbours.get(token)
+        if found is None:
+            counts = {}
+            grams = trigrams(token)
+            for gram in grams:
+                for other in self._vocab_trigrams.get(gram, ()):
+                    counts[other] = counts.get(other, 0) + 1
+            found = {token: 1.0}
+            for other, shared in counts.items():
+                dice = 2 * shared / (len(grams) + len(trigrams(other)))
+                if dice >= TOKEN_SIMILARITY:
+                    found[other] = dice
+            self._neighbours[token] = found
+        return found
+
+    def idf(self, token):
+        return math.log((self._documents + 1) / (self._df.get(token, 0) + 1)) + 1
+
+    def resolve(self, ingredient):
+        """ingredients.json key for an ingredient name, or None."""
+        self.build()
+        tokens = tokenize(ingredient)
+        if not tokens:
+            return None
+        key = self._alias_sets.get(frozenset(tokens))
+        if key is not None:
+            return key
+        best, best_score = None, ALIAS_THRESHOLD
+        for alias_tokens, alias_key in self._alias_sets.items():
+            score = self._score(tokens, alias_tokens)
+            if score >= best_score:
+                best, best_score = alias_key, score
+        return best
+
+    def _covers(self, alias, tokens):
+        """True if ``alias`` has every token of ``tokens`` (or a near spelling), or none."""
+        found = [any(other in self.neighbours(token) for other in alias) for token in tokens]
+        return all(found) or not any(found)
+
+    def _own(self, key, tokens):
+        """Words that can't count against precision for a query: its own and its entry's."""
+        own = set(tokens)
+        for alias in self.aliases.get(key, ()):
+            own.update(alias)
+        return frozenset(own)
+
+    def classify(self, item):
+        """ingredients.json key a receipt item name is a product of, or None.
+
+        Every entry's name and aliases are scored against the item as for
+        ``candidates`` on the product part of the name (before any 'in' /
+        'with': 'sardines in olive oil' is sardines), whose last content word,
+        its head noun, must belong to the entry ('lemon grass' is not lemon).
+        With the head noun pinned, only other food words count against a
+        match, so brand and grade words ('ks cage free grade aa large 24
+        eggs') do not.
+        """
+        self.build()
+        text = str(item).lower().split('@', 1)[0]
+        tokens = tokenize(_CONTENTS.split(text, 1)[0]) or tokenize(text)
+        heads = [token for token in tokens if token not in DESCRIPTORS]
+        if not heads:
+            return None
+        head = heads[-1]
+        best, best_score = None, self.threshold
+        for key, queries in self.aliases.items():
+            own = self._own(key, ())
+            if not any(other in own for other in self.neighbours(head)):
+                continue
+            for query in queries:
+                score = self._score(query, tokens, own, noise=0.0)
+                if score > best_score or (best is None and score >= best_score):
+                    best, best_score = key, score
+        return best
+
+    def queries(self, ingredient):
+        """``([token tuple, ...], own words)``: its name plus the aliases covering it."""
+        name = str(ingredient).lower().strip()
+        if name not in self._queries:
+            tokens = tokenize(name)
+            queries = [tokens]
+            key = self.resolve(name)
+            if key is not None:
+                queries.extend(q for q in self.aliases[key] if q not in queries and self._covers(q, tokens))
+            self._queries[name] = ([q for q in queries if q], self._own(key, tokens))
+        return self._queries[name]
+
+    def _score(self, query, tokens, own=frozenset(), noise=NOISE_WEIGHT):
+        """IDF-weighted recall of ``query`` in ``tokens`` times the share of
+        ``tokens`` it explains (see ``DESCRIPTORS``; words that are not foods
+        count ``noise``)."""
+        total = matched = 0.0
+        used = set()
+        for token in query:
+            weight = self.idf(token)
+            total += weight
+            near = self.neighbours(token)
+            best, best_token = 0.0, None
+            for other in tokens:
+                sim = near.get(other, 0.0)
+                if sim > best:
+                    best, best_token = sim, other
+            if best_token is not None:
+                matched += weight * best
+                used.add(best_token)
+        if not total or not used:
+            return 0.0
+        recall = matched / total
+        unexplained = 0.0
+        for token in tokens:
+            if token in used or token in own or token in DESCRIPTORS:
+                continue
+            food = any(other in self._foods for other in self.neighbours(token))
+            unexplained += 1.0 if food else noise
+        return recall * len(used) / (len(used) + unexplained)
+
+    def candidates(self, ingredient, store, threshold=None):
+        """``[(score, item_key)]`` at ``store`` scoring at least ``threshold``,
+        best first (ties in history order)."""
+        threshold = self.threshold if threshold is None else threshold
+        cache_key = (str(ingredient).lower().strip(), store)
+        ranked = self._results.get(cache_key)
+        if ranked is None:
+            instrument.count('match.lookups')
+            self.build()
+            ranked = self._rank(cache_key[0], store)
+            self._results[cache_key] = ranked
+        return [(score, key) for score, key in ranked if score >= threshold]
+
+    def _rank(self, ingredient, store):
+        postings = self._postings.get(store, {})
+        order = self._order.get(store, {})
+        scores = {}
+        queries, own = self.queries(ingredient)
+        for query in queries:
+            candidates = set()
+            for token in query:
+                for other in self.neighbours(token):
+                    candidates.update(postings.get(other, ()))
+            instrument.count('match.comparisons', len(candidates))
+            for tokens in candidates:
+                score = self._score(query, tokens, own)
+                if score > scores.get(tokens, 0.0):
+                    scores[tokens] = score
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], order[kv[0]]))
+        groups = self._stores[store] if store in self._stores else {}
+        return [(score, key) for tokens, score in ranked for key in groups[tokens]]
+
+    def best(self, ingredient, store, threshold=None):
+        """Best-scoring item key at ``store``, or None below ``threshold``."""
+        found = self.candidates(ingredient, store, threshold)
+        return found[0][1] if found else None
+
+    def keys(self, ingredient, store, threshold=None):
+        """Matching item keys at ``store``, best first."""
+        return [key for _, key in self.candidates(ingredient, store, threshold)]
@@ -0,0 +1,185 @@
+"""Persisted, incrementally updated purchase history.
+
+``purchase_db`` used to be rebuilt from row 2 of ItemizedPurchase on every
+run. ``PurchaseHistory`` keeps it (plus minimum prices) in
+a ``MealCostCalculator.xlsx.history`` sidecar and remembers which rows it has
+already ingested, so after a shopping trip only the new receipt lines are
+applied.
+
+New receipts are entered at the top of the sheet (it is sorted newest first),
+but rows appended at the bottom are handled too. Anything else - rows edited
+or deleted in the middle, a different store list - triggers a full rebuild.
+Rows are recognised by their first/last ``row_key``, so an edit to a row that
+is neither is only picked up by ``rebuild()``.
+
+Usage:
+    from grocery.history import load_history
+    history = load_history(data, ['Costco', 'Safeway'])
+    history.purchase_db['Costco']['kale']
+    history.latest['Costco']['kale'].price
+"""
+
+import os
+import pickle
+import uuid
+
+from grocery import instrument
+from grocery.price_series import PriceSeries
+
+HISTORY_SUFFIX = '.history'
+HISTORY_VERSION = 3
+
+
+class PurchaseHistory:
+    """``{store: {item_key: [Purchase, ...]}}`` with derived price aggregates.
+
+    Purchase lists are kept in sheet order, which is newest first only while
+    the sheet stays sorted, so look up prices in ``latest``: the purchase
+    with the most recent date, read from ``series`` (a ``PriceSeries`` over
+    ``purchase_db``). ``min_price`` holds the lowest price ever
+    paid for each item key. ``versions`` gets a fresh token for every store whose
+    purchases change, so caches derived from one store can tell they are stale.
+    """
+
+    def __init__(self, stores):
+        self.stores = list(stores)
+        self.rebuild_count = 0
+        self._reset()
+
+    def _reset(self):
+        self.purchase_db = {store: {} for store in self.stores}
+        self.versions = {store: uuid.uuid4().hex for store in self.stores}
+        self._series = None
+        self.min_price = {store: {} for store in self.stores}
+        self.row_count = 0
+        self.head = None
+        self.tail = None
+        self.last_date = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_series'] = None
+        return state
+
+    @property
+    def series(self):
+        if self._series is None:
+            self._series = PriceSeries.from_purchase_db(self.purchase_db)
+        return self._series
+
+    @property
+    def latest(self):
+        """``{store: {item_key: Purchase}}`` with the most recent purchase of each item."""
+        return self.series.latest_purchases(self.stores)
+
+    def rebuild(self, columns):
+        """Discard everything and ingest all rows of ``columns``."""
+        self._reset()
+        self.rebuild_count += 1
+        instrument.count('history.rebuilds')
+        self._apply(columns, 0, len(columns), at_top=False)
+        self._mark(columns)
+        return len(columns)
+
+    def update(self, columns):
+        """Apply rows of ``columns`` not ingested yet; returns how many rows were new."""
+        n, m = self.row_count, len(columns)
+        if not n or m < n:
+            return self.rebuild(columns)
+        if columns.row_key(0) == self.head and columns.row_key(n - 1) == self.tail:
+            start, stop, at_top = n, m, False
+        elif columns.row_key(m - n) == self.head and columns.row_key(m - 1) == self.tail:
+            start, stop, at_top = 0, m - n, True
+        else:
+            return self.rebuild(columns)
+        if stop > start:
+            instrument.count('history.rows_applied', stop - start)
+            self._apply(columns, start, stop, at_top)
+            self._mark(columns)
+        return stop - start
+
+    def _mark(self, columns):
+        self.row_count = len(columns)
+        self.head = columns.row_key(0) if len(columns) else None
+        self.tail = columns.row_key(len(columns) - 1) if len(columns) else None
+
+    def _apply(self, columns, start, stop, at_top):
+        new_items = {store: {} for store in self.stores}
+        self._series = None
+        for purchase in columns.iter_records(self.stores, start, stop):
+            item_key = str(purchase.item).lower()
+            new_items[purchase.location].setdefault(item_key, []).append(purchase)
+            self._aggregate(purchase.location, item_key, purchase)
+
+        for store, items in new_items.items():
+            if not items:
+                continue
+            self.versions[store] = uuid.uuid4().hex
+            store_items = self.purchase_db[store]
+            if not at_top:
+                for item_key, purchases in items.items():
+                    store_items.setdefault(item_key, []).extend(purchases)
+                continue
+            # Rows above everything ingested so far: they go first, and so do
+            # their item keys, exactly as a full rebuild would order them
+            merged = {}
+            for item_key, purchases in items.items():
+                merged[item_key] = purchases + store_items.get(item_key, [])
+            for item_key, purchases in store_items.items():
+                if item_key not in merged:
+                    merged[item_key] = purchases
+            self.purchase_db[store] = merged
+
+    def _aggregate(self, store, item_key, purchase):
+        if purchase.date is not None and (self.last_date is None or purchase.date > self.last_date):
+            self.last_date = purchase.date
+        min_price = self.min_price[store].get(item_key)
+        if min_price is None or purchase.price < min_price:
+            self.min_price[store][item_key] = purchase.price
+
+
+def history_path(workbook_path):
+    return workbook_path + HISTORY_SUFFIX
+
+
+def load_history(data, stores, use_cache=True):
+    """Persisted history for ``stores``, brought up to date with ``data``.
+
+    ``data`` is a ``MealData`` from ``grocery.loader.load``. Only rows added
+    since the last run are applied; the sidecar is rewritten when anything
+    changed.
+    """
+    history = None
+    path = history_path(data.path)
+    if use_cache:
+        history = _read_history(path)
+    if history is None or history.stores != list(stores):
+        history = PurchaseHistory(stores)
+
+    row_count = history.row_count
+    applied = history.update(data.purchases)
+    if use_cache and (applied or history.row_count != row_count):
+        _write_history(path, history)
+    return history
+
+
+def _read_history(path):
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(payload, dict) or payload.get('version') != HISTORY_VERSION:
+        return None
+    return payload['history']
+
+
+def _write_history(path, history):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': HISTORY_VERSION, 'history': history}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
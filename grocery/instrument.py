@@ -0,0 +1,257 @@
+"""Per-phase wall time, memory and counters for one run of a script.
+
+Scripts mark their phases with ``phase()``; the loader, history, match cache
+and matcher bump counters (rows parsed and scanned, match comparisons, cache
+hits). Nothing is collected or printed unless instrumentation is switched
+on, either with the ``GROCERY_PROFILE`` environment variable or by running
+the script through ``python -m grocery.instrument``. The report goes to
+stderr when the run ends, so stdout stays the same, and can be appended as
+one JSON line per run to a file for tracking trends.
+
+``GROCERY_PROFILE`` is a comma-separated list of:
+
+- ``1`` / ``time``: phase wall times, peak RSS and counters
+- ``memory``:       tracemalloc peak per phase (slows the run down)
+- ``cprofile``:     cProfile the whole run and print the top functions
+
+and ``GROCERY_PROFILE_JSON`` names the JSON-lines file.
+
+Usage:
+    from grocery import instrument
+    with instrument.phase('load'):
+        data = load('MealCostCalculator.xlsx')
+    instrument.count('rows.scanned', len(rows))
+
+    GROCERY_PROFILE=1 python3 revised_no_walmart.py
+    GROCERY_PROFILE=memory,cprofile GROCERY_PROFILE_JSON=runs.jsonl python3 revised_no_walmart.py
+    python -m grocery.instrument --memory --json runs.jsonl revised_no_walmart.py
+"""
+
+import argparse
+import atexit
+import io
+import json
+import os
+import runpy
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:    # Windows
+    resource = None
+
+ENV_VAR = 'GROCERY_PROFILE'
+ENV_JSON = 'GROCERY_PROFILE_JSON'
+OPTIONS = ('time', 'memory', 'cprofile')
+PROFILE_LINES = 25
+
+
+def peak_rss_mb():
+    """Peak resident set size in MB, or None where ``resource`` is missing (Windows)."""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def parse_options(value):
+    """Options enabled by a ``GROCERY_PROFILE`` value ('' or '0' for none)."""
+    options = set()
+    for option in (value or '').lower().split(','):
+        option = option.strip()
+        if option in ('', '0', 'off', 'false'):
+            continue
+        if option in ('1', 'on', 'true'):
+            option = 'time'
+        if option not in OPTIONS:
+            raise ValueError(f"Unknown {ENV_VAR} option '{option}' (expected {', '.join(OPTIONS)})")
+        options.add(option)
+    if options:
+        options.add('time')
+    return options
+
+
+class Instrumentation:
+    """Phase timings, counters and optional tracemalloc / cProfile for one run."""
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.profiler = None
+        self.json_path = None
+        self.label = None
+        self.phases = {}         # 'outer/inner' -> {'seconds', 'calls', 'peak_mb', 'rss_mb'}
+        self.counters = {}
+        self._stack = []         # [name, start, peak so far]
+        self._started = None
+        self._start = None
+        self._reported = False
+
+    def enable(self, options=('time',), json_path=None, label=None):
+        """Start collecting now; the report is printed when the process exits."""
+        if self.enabled:
+            return self
+        self.enabled = True
+        self.json_path = json_path
+        self.label = label or os.path.basename(sys.argv[0] or 'python')
+        self._started = datetime.now().replace(microsecond=0)
+        self._start = time.perf_counter()
+        if 'memory' in options:
+            self.memory = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        if 'cprofile' in options:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        atexit.register(self.report)
+        return self
+
+    def enable_from_env(self, environ=os.environ):
+        try:
+            options = parse_options(environ.get(ENV_VAR))
+        except ValueError as e:
+            # A typo in the variable shouldn't stop the script itself
+            print(f"Instrumentation off: {e}", file=sys.stderr)
+            return self
+        if options:
+            self.enable(options, environ.get(ENV_JSON) or None)
+        return self
+
+    @contextmanager
+    def phase(self, name):
+        """Time the block as ``name`` (nested phases are reported as ``outer/inner``)."""
+        if not self.enabled:
+            yield
+            return
+        path = '/'.join([entry[0] for entry in self._stack] + [name])
+        if self.memory:
+            # Keep the enclosing phases' peaks before the inner phase resets it
+            peak = tracemalloc.get_traced_memory()[1]
+            for entry in self._stack:
+                entry[2] = max(entry[2], peak)
+            tracemalloc.reset_peak()
+        entry = [name, time.perf_counter(), 0]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - entry[1]
+            self._stack.pop()
+            stats = self.phases.setdefault(path, {'seconds': 0.0, 'calls': 0, 'peak_mb': None, 'rss_mb': None})
+            stats['seconds'] += elapsed
+            stats['calls'] += 1
+            stats['rss_mb'] = peak_rss_mb()
+            if self.memory:
+                peak = max(entry[2], tracemalloc.get_traced_memory()[1])
+                for outer in self._stack:
+                    outer[2] = max(outer[2], peak)
+                stats['peak_mb'] = max(stats['peak_mb'] or 0.0, peak / (1024 * 1024))
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """The run as a JSON-serializable dict."""
+        return {
+            'label': self.label,
+            'started': self._started.isoformat() if self._started else None,
+            'seconds': time.perf_counter() - self._start if self._start is not None else None,
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_traced_mb': tracemalloc.get_traced_memory()[1] / (1024 * 1024) if self.memory else None,
+            'phases': [dict(phase=name, **stats) for name, stats in self.phases.items()],
+            'counters': dict(sorted(self.counters.items()))
+        }
+
+    def report(self, file=None):
+        """Print the summary (stderr by default) and append it to the JSON file, once."""
+        if not self.enabled or self._reported:
+            return None
+        self._reported = True
+        if self.profiler is not None:
+            self.profiler.disable()
+        file = file or sys.stderr
+        summary = self.summary()
+
+        print("\n" + "=" * 80, file=file)
+        rss = f", peak RSS {summary['peak_rss_mb']:.0f} MB" if summary['peak_rss_mb'] is not None else ""
+        print(f"RUN PROFILE: {summary['label']} ({summary['seconds']:.3f}s{rss})", file=file)
+        print("=" * 80, file=file)
+        for stats in summary['phases']:
+            memory = f"  peak {stats['peak_mb']:8.1f} MB" if stats['peak_mb'] is not None else ""
+            rss = f"  RSS {stats['rss_mb']:.0f} MB" if stats['rss_mb'] is not None else ""
+            calls = f"  x{stats['calls']}" if stats['calls'] > 1 else ""
+            print(f"  {stats['phase']:<32} {stats['seconds']:9.4f}s{memory}{rss}{calls}", file=file)
+        if summary['counters']:
+            print("\nCounters:", file=file)
+            for name, value in summary['counters'].items():
+                print(f"  {name:<32} {value:>12,}", file=file)
+        if self.profiler is not None:
+            import pstats
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            print("\n" + out.getvalue().strip(), file=file)
+
+        if self.json_path:
+            try:
+                with open(self.json_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(summary) + '\n')
+            except OSError as e:
+                print(f"Could not write {self.json_path}: {e}", file=file)
+        return summary
+
+
+# One instrumentation per process, switched on by GROCERY_PROFILE
+_current = Instrumentation().enable_from_env()
+
+
+def current():
+    return _current
+
+
+def enabled():
+    return _current.enabled
+
+
+def phase(name):
+    return _current.phase(name)
+
+
+def count(name, n=1):
+    if _current.enabled:
+        _current.count(name, n)
+
+
+def report(file=None):
+    return _current.report(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a script with phase timing and counters.')
+    parser.add_argument('--memory', action='store_true', help='tracemalloc peak per phase')
+    parser.add_argument('--cprofile', action='store_true', help='cProfile the run')
+    parser.add_argument('--json', help='append the run summary as a JSON line to this file')
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    options = {'time'} | {option for option in ('memory', 'cprofile') if getattr(args, option)}
+    # Under ``python -m`` this file is ``__main__``; the script imports grocery.instrument
+    from grocery import instrument
+    run = instrument.current().enable(options, args.json, label=os.path.basename(args.script))
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    try:
+        runpy.run_path(args.script, run_name='__main__')
+    finally:
+        run.report()
+
+
+if __name__ == '__main__':
+    main()
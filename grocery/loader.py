@@ -0,0 +1,337 @@
+"""Cached, columnar loader for MealCostCalculator.xlsx.
+
+Parsing the workbook with openpyxl dominates the run time of every script, so
+the ``ingredients`` / ``totalMealCost`` rows and the ItemizedPurchase columns
+are parsed once and pickled to a sidecar file next to the workbook
+(``MealCostCalculator.xlsx.cache``). The sidecar is keyed on the workbook's
+size/mtime, falling back to a SHA-256 of its contents, so it is only rebuilt
+when the workbook actually changes.
+
+For exports too large to hold at all, ``iter_purchases`` streams filtered
+``Purchase`` records straight from the workbook in read-only mode.
+
+Usage:
+    from grocery.loader import load
+    data = load()
+    for row in data.rows('ingredients', min_row=2): ...
+    for purchase in data.purchases.iter_records(['Costco', 'H-Mart']): ...
+"""
+
+import hashlib
+import math
+import os
+import pickle
+from array import array
+from datetime import datetime, timedelta
+
+from grocery import instrument
+
+DEFAULT_WORKBOOK = 'MealCostCalculator.xlsx'
+CACHE_SUFFIX = '.cache'
+CACHE_VERSION = 2
+
+# Small sheets kept as raw row tuples
+ROW_SHEETS = ['ingredients', 'totalMealCost']
+PURCHASE_SHEET = 'ItemizedPurchase'
+
+# ItemizedPurchase column positions
+COL_DATE = 0
+COL_LOCATION = 2
+COL_ITEM = 7
+COL_QTY = 8
+COL_UNIT = 9
+COL_PRICE = 10
+
+EPOCH = datetime(1970, 1, 1)
+NO_DATE = -(2 ** 62)
+
+
+def parse_date(value):
+    """``date`` from 'YYYY-MM-DD' (an argparse ``type``)."""
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _number(value):
+    """Float value of a numeric cell, NaN for blanks, text and formulas."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return math.nan
+    return float(value)
+
+
+def _cell_value(value):
+    """Undo ``_number``: None for NaN, int for whole numbers (as openpyxl reads them)."""
+    if math.isnan(value):
+        return None
+    return int(value) if value.is_integer() else value
+
+
+def _valid_price(value):
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and value > 0
+
+
+class Purchase:
+    """One ItemizedPurchase line. ``__slots__`` keeps millions of these small."""
+
+    __slots__ = ('row', 'date', 'location', 'item', 'qty', 'unit', 'price')
+
+    def __init__(self, row, date, location, item, qty, unit, price):
+        self.row = row
+        self.date = date
+        self.location = location
+        self.item = item
+        self.qty = qty
+        self.unit = unit
+        self.price = price
+
+    def __repr__(self):
+        return f"Purchase(row={self.row}, location={self.location!r}, item={self.item!r}, price={self.price!r})"
+
+
+class PurchaseColumns:
+    """ItemizedPurchase as parallel typed columns.
+
+    Numeric columns are ``array('d')`` with NaN for missing or non-numeric
+    cells; dates are seconds since 1970 in ``array('q')``. Locations and units
+    repeat heavily, so they are dictionary-encoded as codes into
+    ``locations`` / ``units``.
+    """
+
+    def __init__(self):
+        self.headers = ()
+        self.row = array('l')
+        self.date = array('q')
+        self.location_code = array('l')
+        self.item = []
+        self.qty = array('d')
+        self.unit_code = array('l')
+        self.price = array('d')
+        self.locations = []
+        self.units = []
+        self._location_ids = {}
+        self._unit_ids = {}
+
+    def __len__(self):
+        return len(self.row)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_location_ids'], state['_unit_ids']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._location_ids = {v: i for i, v in enumerate(self.locations)}
+        self._unit_ids = {v: i for i, v in enumerate(self.units)}
+
+    def append(self, row_number, row):
+        """Add one ItemizedPurchase row (a ``values_only`` tuple)."""
+        row = tuple(row) + (None,) * (COL_PRICE + 1 - len(row))
+        date = row[COL_DATE]
+        self.row.append(row_number)
+        if isinstance(date, datetime):
+            self.date.append((date - EPOCH) // timedelta(seconds=1))
+        else:
+            self.date.append(NO_DATE)
+        self.location_code.append(self._code(self._location_ids, self.locations, row[COL_LOCATION]))
+        self.item.append(row[COL_ITEM])
+        self.qty.append(_number(row[COL_QTY]))
+        self.unit_code.append(self._code(self._unit_ids, self.units, row[COL_UNIT]))
+        self.price.append(_number(row[COL_PRICE]))
+
+    @staticmethod
+    def _code(ids, values, value):
+        code = ids.get(value)
+        if code is None:
+            code = ids[value] = len(values)
+            values.append(value)
+        return code
+
+    def date_at(self, i):
+        seconds = self.date[i]
+        return None if seconds == NO_DATE else EPOCH + timedelta(seconds=seconds)
+
+    def location_at(self, i):
+        return self.locations[self.location_code[i]]
+
+    def unit_at(self, i):
+        return self.units[self.unit_code[i]]
+
+    def qty_at(self, i):
+        return _cell_value(self.qty[i])
+
+    def price_at(self, i):
+        return _cell_value(self.price[i])
+
+    def valid_rows(self, stores, start=0, stop=None):
+        """Indices of rows at ``stores`` with an item name and a numeric price > 0."""
+        codes = {self._location_ids[s] for s in stores if s in self._location_ids}
+        location_code, item, price = self.location_code, self.item, self.price
+        stop = len(self) if stop is None else stop
+        instrument.count('rows.scanned', max(0, stop - start))
+        return [i for i in range(start, stop)
+                if location_code[i] in codes and item[i] and price[i] > 0]
+
+    def row_key(self, i):
+        """Hashable identity of a row, used to spot already-ingested rows."""
+        return (self.date[i], self.location_at(i), self.item[i],
+                self.qty_at(i), self.unit_at(i), self.price_at(i))
+
+    def record(self, i):
+        return Purchase(self.row[i], self.date_at(i), self.location_at(i), self.item[i],
+                        self.qty_at(i), self.unit_at(i), self.price_at(i))
+
+    def iter_records(self, stores, start=0, stop=None):
+        """Yield ``Purchase`` records for ``valid_rows(stores)`` one at a time."""
+        for i in self.valid_rows(stores, start, stop):
+            yield self.record(i)
+
+
+class MealData:
+    """Parsed contents of the meal cost workbook.
+
+    ``path`` is the base name of the sidecars derived from this data
+    (``<path>.history``, ...); ``workbook`` is the file it was read from.
+    They differ only for merged data (``grocery.merge.load_merged``).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.workbook = path
+        self.sheetnames = []
+        self.sheets = {}
+        self.purchases = PurchaseColumns()
+
+    def rows(self, sheet, min_row=1):
+        """Raw row tuples of a small sheet, like ``iter_rows(values_only=True)``."""
+        return self.sheets.get(sheet, [])[min_row - 1:]
+
+
+def build_purchase_db(records, stores):
+    """``{store: {item_lower: [Purchase, ...]}}`` from an iterable of records.
+
+    ``records`` is ``PurchaseColumns.iter_records(stores)`` or
+    ``iter_purchases(path, stores)``; records at other stores are ignored.
+    """
+    purchase_db = {store: {} for store in stores}
+    for purchase in records:
+        store_items = purchase_db.get(purchase.location)
+        if store_items is not None:
+            store_items.setdefault(str(purchase.item).lower(), []).append(purchase)
+    return purchase_db
+
+
+def iter_purchases(path=DEFAULT_WORKBOOK, stores=None):
+    """Stream valid ItemizedPurchase rows from the workbook without caching.
+
+    Uses openpyxl read-only mode and filters on the fly (location in
+    ``stores`` when given, an item name, numeric price > 0), so memory stays
+    flat no matter how long the sheet is.
+    """
+    import openpyxl
+
+    stores = set(stores) if stores is not None else None
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        if PURCHASE_SHEET not in wb.sheetnames:
+            return
+        rows = wb[PURCHASE_SHEET].iter_rows(min_row=2, values_only=True)
+        for row_number, row in enumerate(rows, start=2):
+            if len(row) <= COL_PRICE:
+                continue
+            location, item, price = row[COL_LOCATION], row[COL_ITEM], row[COL_PRICE]
+            if (stores is not None and location not in stores) or not item or not _valid_price(price):
+                continue
+            date = row[COL_DATE] if isinstance(row[COL_DATE], datetime) else None
+            qty = row[COL_QTY] if isinstance(row[COL_QTY], (int, float)) else None
+            yield Purchase(row_number, date, location, item, qty, row[COL_UNIT], price)
+    finally:
+        wb.close()
+
+
+def sidecar_path(path):
+    return path + CACHE_SUFFIX
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_workbook(path):
+    """Read the workbook with openpyxl (read-only) into a ``MealData``."""
+    import openpyxl
+
+    data = MealData(path)
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        data.sheetnames = list(wb.sheetnames)
+        for name in ROW_SHEETS:
+            if name in wb.sheetnames:
+                data.sheets[name] = list(wb[name].iter_rows(values_only=True))
+        if PURCHASE_SHEET in wb.sheetnames:
+            rows = wb[PURCHASE_SHEET].iter_rows(values_only=True)
+            data.purchases.headers = next(rows, ())
+            for row_number, row in enumerate(rows, start=2):
+                data.purchases.append(row_number, row)
+    finally:
+        wb.close()
+    instrument.count('workbook.rows_parsed', len(data.purchases))
+    return data
+
+
+def load(path=DEFAULT_WORKBOOK, use_cache=True):
+    """Load the workbook, reusing the sidecar cache when it is still current."""
+    if not use_cache:
+        return parse_workbook(path)
+
+    stat = os.stat(path)
+    cache_file = sidecar_path(path)
+    cached = _read_sidecar(cache_file)
+    if cached is not None:
+        if (cached['size'], cached['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            instrument.count('workbook.cache_hits')
+            return cached['data']
+        sha256 = file_sha256(path)
+        if cached['sha256'] == sha256:
+            # Touched but unchanged: refresh the fast-path key only
+            _write_sidecar(cache_file, stat, sha256, cached['data'])
+            instrument.count('workbook.cache_hits')
+            return cached['data']
+    else:
+        sha256 = file_sha256(path)
+
+    data = parse_workbook(path)
+    _write_sidecar(cache_file, stat, sha256, data)
+    return data
+
+
+def _read_sidecar(cache_file):
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != CACHE_VERSION:
+        return None
+    return cached
+
+
+def _write_sidecar(cache_file, stat, sha256, data):
+    payload = {
+        'version': CACHE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+        'data': data
+    }
+    tmp_file = cache_file + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # A read-only checkout just means no cache
+        pass
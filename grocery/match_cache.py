@@ -0,0 +1,141 @@
+"""Persistent memo of ingredient -> purchase history matches.
+
+The same ingredient names are matched against the same receipts run after
+run. ``MatchCache`` remembers each ``(rule, ingredient, store) -> item key``
+answer in a ``MealCostCalculator.xlsx.<name>.matches`` sidecar (one per
+script, since each has its own rules), evicting the least recently used
+entries beyond ``max_entries``.
+
+Entries are invalidated when:
+- the matching rules change (manual store lists, meat/produce lists, ...):
+  the whole cache is dropped,
+- an ingredient leaves the ingredient list: its entries are dropped,
+- a store's purchase history changes (``PurchaseHistory.versions``): that
+  store's entries are treated as misses and recomputed.
+
+Usage:
+    cache = load_match_cache(data.path, 'shopping_list', context, ingredient_names, history.versions)
+    item_key = cache.lookup('manual', ing_lower, 'Costco', lambda: ...)
+    save_match_cache(data.path, 'shopping_list', cache)
+
+The latest purchase for a cached item key is ``history.latest[store][item_key]``.
+"""
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+from grocery import instrument
+
+MATCHES_SUFFIX = '.matches'
+MATCHES_VERSION = 1
+DEFAULT_MAX_ENTRIES = 4096
+
+
+def fingerprint(context):
+    """Stable hash of the matching rules (lists/dicts of strings)."""
+    return hashlib.sha256(repr(context).encode('utf-8')).hexdigest()
+
+
+class MatchCache:
+    """LRU map of ``(rule, ingredient, store)`` to a matched item key (or None)."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.context = None
+        self.entries = OrderedDict()  # key -> (store_version, value)
+        self.store_versions = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['hits'] = state['misses'] = 0
+        state['dirty'] = False
+        return state
+
+    def __len__(self):
+        return len(self.entries)
+
+    def bind(self, context, ingredients, store_versions):
+        """Apply invalidation for the current rules, ingredient list and history."""
+        context = fingerprint(context)
+        if context != self.context:
+            self.entries.clear()
+            self.context = context
+            self.dirty = True
+        ingredients = {name.lower() for name in ingredients}
+        stale = [key for key in self.entries if key[1] not in ingredients]
+        for key in stale:
+            del self.entries[key]
+        self.dirty = self.dirty or bool(stale)
+        self.store_versions = dict(store_versions)
+
+    def get(self, rule, ingredient, store):
+        """``(True, value)`` on a fresh hit, ``(False, None)`` otherwise."""
+        key = (rule, ingredient, store)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != self.store_versions.get(store):
+            self.misses += 1
+            instrument.count('match_cache.misses')
+            return False, None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        instrument.count('match_cache.hits')
+        return True, entry[1]
+
+    def put(self, rule, ingredient, store, value):
+        key = (rule, ingredient, store)
+        self.entries[key] = (self.store_versions.get(store), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.dirty = True
+
+    def lookup(self, rule, ingredient, store, compute):
+        """Cached value, or ``compute()`` stored under the key."""
+        hit, value = self.get(rule, ingredient, store)
+        if not hit:
+            value = compute()
+            self.put(rule, ingredient, store, value)
+        return value
+
+
+def matches_path(workbook_path, name):
+    return f'{workbook_path}.{name}{MATCHES_SUFFIX}'
+
+
+def load_match_cache(workbook_path, name, context, ingredients, store_versions,
+                     max_entries=DEFAULT_MAX_ENTRIES):
+    """Persisted cache ``name`` for ``workbook_path``, bound to the current state."""
+    cache = None
+    try:
+        with open(matches_path(workbook_path, name), 'rb') as f:
+            payload = pickle.load(f)
+        if isinstance(payload, dict) and payload.get('version') == MATCHES_VERSION:
+            cache = payload['cache']
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        pass
+    if cache is None:
+        cache = MatchCache(max_entries)
+    cache.max_entries = max_entries
+    cache.bind(context, ingredients, store_versions)
+    return cache
+
+
+def save_match_cache(workbook_path, name, cache):
+    """Write the cache back if anything changed."""
+    if not cache.dirty:
+        return
+    path = matches_path(workbook_path, name)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': MATCHES_VERSION, 'cache': cache}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        cache.dirty = False
+    except OSError:
+        pass
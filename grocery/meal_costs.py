@@ -0,0 +1,215 @@
+"""Per-meal cost rollups at current prices, with incremental what-if queries.
+
+``totalMealCost`` only sums the CostQt formulas of the ``ingredients`` sheet,
+i.e. whatever package price was typed in when the recipe was added.
+``MealCosts`` reprices every recipe row from purchase history: a row uses
+``Qt / Total`` of a package (the sheet's CostQt formula) and the package
+costs the latest price at the cheapest store that carries the ingredient,
+falling back to the sheet's CostTot when no store does. Only stores whose
+match scores within ``CHEAPEST_MARGIN`` of the best store's match compete
+on price, as in ``StoreAssigner``, so a cheap near-miss elsewhere doesn't
+undercut the real item.
+
+Row, meal and ingredient costs are NumPy vectors computed once. A what-if
+("plan A+C with kale swapped for spinach, no Walmart") only reprices the
+ingredients it touches and adds the difference to the meals using them.
+
+Usage:
+    costs = MealCosts.build(data, history)
+    costs.meal_costs()                                   # {code: cost}
+    costs.what_if(['A', 'C'], substitutions={'Kale': 'Spinach'},
+                  exclude_stores=['Walmart'])
+"""
+
+import math
+
+import numpy as np
+
+from grocery.fuzzy_match import FuzzyMatcher
+from grocery.shopping_list import CHEAPEST_MARGIN, GROCERY_STORES, read_ingredients
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return math.nan
+    return float(value)
+
+
+def package_fraction(row):
+    """Share of a package one recipe row uses (``Qt / Total``, 1 when unknown)."""
+    needed, total = _number(row['qty_needed']), _number(row['total_qty'])
+    if math.isnan(needed) or math.isnan(total) or total <= 0:
+        return 1.0
+    return needed / total
+
+
+def read_servings(data):
+    """``{meal code: servings}`` from the totalMealCost sheet."""
+    servings = {}
+    for row in data.rows('totalMealCost', min_row=2):
+        if row and row[0] and len(row) > 3 and isinstance(row[3], (int, float)):
+            servings[row[0]] = row[3]
+    return servings
+
+
+class MealCosts:
+    """Recipe rows priced against an ingredients x stores package-price matrix."""
+
+    def __init__(self, rows, prices, stores, servings=None, price_lookup=None):
+        """``prices`` is ``{ingredient: {store: package price}}``; ``price_lookup(name)``
+        returns the same for ingredients outside ``rows`` (substitutes)."""
+        self.rows = list(rows)
+        self.stores = list(stores)
+        self.servings = servings or {}
+        self.price_lookup = price_lookup
+        self.meals = list(dict.fromkeys(row['code'] for row in self.rows))
+        self.meal_names = {row['code']: row['meal'] for row in self.rows}
+        self.ingredients = list(dict.fromkeys(row['ingredient'] for row in self.rows))
+        self._meal_index = {code: i for i, code in enumerate(self.meals)}
+        self._ingredient_index = {name: i for i, name in enumerate(self.ingredients)}
+        self._store_index = {store: j for j, store in enumerate(self.stores)}
+
+        self.row_meal = np.array([self._meal_index[row['code']] for row in self.rows], dtype=np.intp)
+        self.row_ingredient = np.array([self._ingredient_index[row['ingredient']] for row in self.rows],
+                                       dtype=np.intp)
+        self.fraction = np.array([package_fraction(row) for row in self.rows])
+        self.sheet_price = np.array([_number(row['cost_total']) for row in self.rows])
+
+        self.prices = np.full((len(self.ingredients), len(self.stores)), np.nan)
+        for name, by_store in prices.items():
+            i = self._ingredient_index.get(name)
+            if i is not None:
+                self.prices[i] = self._price_row(by_store)
+
+        self.best_store, self.best_price = self._cheapest(self.prices)
+        self.row_cost = self._row_costs(self.best_price[self.row_ingredient], self.sheet_price)
+        self.meal_cost = np.bincount(self.row_meal, self.row_cost, minlength=len(self.meals))
+        self.ingredient_cost = np.bincount(self.row_ingredient, self.row_cost,
+                                           minlength=len(self.ingredients))
+
+    @classmethod
+    def build(cls, data, history, matcher=None, stores=GROCERY_STORES, exclude_items=()):
+        """Price ``data``'s recipes with the latest (by date) matched purchase per store."""
+        matcher = matcher or FuzzyMatcher.from_json(history.purchase_db)
+
+        def price_lookup(name):
+            matches = {}
+            for store in stores:
+                candidates = matcher.candidates(name, store)
+                if candidates:
+                    matches[store] = candidates[0]
+            if not matches:
+                return {}
+            best_score = max(score for score, _ in matches.values())
+            return {store: history.latest[store][item_key].price for store, (score, item_key) in matches.items()
+                    if score >= best_score - CHEAPEST_MARGIN}
+
+        rows = read_ingredients(data, exclude_items)
+        names = dict.fromkeys(row['ingredient'] for row in rows)
+        prices = {name: price_lookup(name) for name in names}
+        return cls(rows, prices, stores, read_servings(data), price_lookup)
+
+    def _price_row(self, by_store):
+        row = np.full(len(self.stores), np.nan)
+        for store, price in by_store.items():
+            j = self._store_index.get(store)
+            if j is not None:
+                row[j] = price
+        return row
+
+    @staticmethod
+    def _cheapest(prices):
+        """``(store column or -1, price or NaN)`` per row of a price matrix."""
+        filled = np.where(np.isnan(prices), np.inf, prices)
+        if not prices.shape[1]:
+            return np.full(len(prices), -1), np.full(len(prices), np.nan)
+        best = filled.argmin(axis=1)
+        price = filled[np.arange(len(prices)), best]
+        missing = np.isinf(price)
+        best[missing] = -1
+        price[missing] = np.nan
+        return best, price
+
+    def _row_costs(self, package_price, fallback, rows=slice(None)):
+        price = np.where(np.isnan(package_price), fallback, package_price)
+        return np.where(np.isnan(price), 0.0, price) * self.fraction[rows]
+
+    def meal_costs(self):
+        return {code: float(self.meal_cost[i]) for i, code in enumerate(self.meals)}
+
+    def cost_per_serving(self, code):
+        servings = self.servings.get(code)
+        cost = float(self.meal_cost[self._meal_index[code]])
+        return cost / servings if servings else None
+
+    def ingredient_costs(self):
+        """``{ingredient: cost across all meals}``."""
+        return {name: float(self.ingredient_cost[i]) for i, name in enumerate(self.ingredients)}
+
+    def store_of(self, ingredient):
+        j = self.best_store[self._ingredient_index[ingredient]]
+        return self.stores[j] if j >= 0 else None
+
+    def plan_cost(self, plan):
+        """Cost of a list of meal codes (a code may repeat)."""
+        return float(sum(self.meal_cost[self._meal_index[code]] for code in plan))
+
+    def what_if(self, plan=None, substitutions=None, exclude_stores=()):
+        """Cost of ``plan`` (default: every meal) with ingredients swapped and stores dropped.
+
+        ``substitutions`` maps an ingredient to its replacement (priced with
+        ``price_lookup`` unless it is already a recipe ingredient). Only the
+        ingredients whose price changes are repriced. Returns
+        ``{'total', 'meals': {code: cost}, 'changed': {code: delta},
+        'stores': {ingredient: store or None}}`` where ``stores`` lists the
+        repriced ingredients.
+        """
+        plan = list(self.meals) if plan is None else list(plan)
+        substitutions = substitutions or {}
+        excluded = [self._store_index[s] for s in exclude_stores if s in self._store_index]
+
+        # Ingredients whose price moves: swapped ones, and ones bought at a dropped store
+        affected = {self._ingredient_index[name] for name in substitutions if name in self._ingredient_index}
+        if excluded:
+            affected.update(np.flatnonzero(np.isin(self.best_store, excluded)).tolist())
+
+        meal_cost = self.meal_cost.copy()
+        stores = {}
+        if affected:
+            affected = sorted(affected)
+            prices = np.empty((len(affected), len(self.stores)))
+            for k, i in enumerate(affected):
+                name = self.ingredients[i]
+                prices[k] = self._substitute_prices(substitutions[name]) if name in substitutions else self.prices[i]
+            prices[:, excluded] = np.nan
+            best_store, best_price = self._cheapest(prices)
+
+            new_price = np.full(len(self.ingredients), np.nan)
+            new_price[affected] = best_price
+            rows = np.flatnonzero(np.isin(self.row_ingredient, affected))
+            # A swapped-in ingredient with no history costs nothing rather than the old sheet price
+            swapped = np.array([self.ingredients[i] in substitutions for i in self.row_ingredient[rows]], dtype=bool)
+            fallback = np.where(swapped, np.nan, self.sheet_price[rows])
+            delta = (self._row_costs(new_price[self.row_ingredient[rows]], fallback, rows)
+                     - self.row_cost[rows])
+            meal_cost += np.bincount(self.row_meal[rows], delta, minlength=len(self.meals))
+            for k, i in enumerate(affected):
+                stores[self.ingredients[i]] = self.stores[best_store[k]] if best_store[k] >= 0 else None
+
+        meals = {code: float(meal_cost[self._meal_index[code]]) for code in dict.fromkeys(plan)}
+        changed = {code: cost - float(self.meal_cost[self._meal_index[code]]) for code, cost in meals.items()
+                   if abs(cost - self.meal_cost[self._meal_index[code]]) > 1e-9}
+        return {
+            'total': float(sum(meals[code] for code in plan)),
+            'meals': meals,
+            'changed': changed,
+            'stores': stores
+        }
+
+    def _substitute_prices(self, name):
+        i = self._ingredient_index.get(name)
+        if i is not None:
+            return self.prices[i]
+        if self.price_lookup is None:
+            return np.full(len(self.stores), np.nan)
+        return self._price_row(self.price_lookup(name))
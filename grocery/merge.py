@@ -0,0 +1,342 @@
+"""One purchase table from every receipt workbook.
+
+The scripts only read ``ItemizedPurchase`` from MealCostCalculator.xlsx,
+while the dashboard (``processShoppingData`` in ``dashboard/js/excel-reader.js``)
+reads the year-named ``*Itemized*`` sheets and legacy ``Trip N`` sheets of
+Best_actualShoppingData.xlsx. ``merge_workbooks`` reads all of those sheets
+concurrently (one thread per sheet, each with its own read-only workbook),
+maps their differing headers (``Item`` / ``ItemName`` / ``Name``, ``PriceRaw``
+/ ``Price``, ...) onto the ItemizedPurchase layout and drops receipt lines
+that appear in more than one source.
+
+Two lines are the same purchase when date, store, item name and price (to
+the cent) agree. A line bought twice on one receipt shows up twice in every
+source that has it, so each source contributes only the copies beyond the
+most any earlier source already had.
+
+The result is a ``PurchaseColumns`` sorted newest first like ItemizedPurchase,
+so ``load_history``, ``PriceSeries`` and the rest work on it unchanged, and
+``python -m grocery --merged <command>`` runs any command on it. The
+merged table is cached in a sidecar next to the primary workbook, keyed on
+the size/mtime of every input.
+
+Usage:
+    from grocery.merge import load_merged
+    data = load_merged()                      # MealData over all receipts
+    history = load_history(data, ['Costco', 'Safeway'])
+
+    python -m grocery.merge                   # per-source row / duplicate counts
+"""
+
+import argparse
+import os
+import pickle
+import re
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from grocery.loader import (COL_DATE, COL_ITEM, COL_LOCATION, COL_PRICE, COL_QTY, COL_UNIT,
+                            DEFAULT_WORKBOOK, PURCHASE_SHEET, PurchaseColumns, load)
+
+SHOPPING_WORKBOOK = 'Best_actualShoppingData.xlsx'
+DEFAULT_SOURCES = [DEFAULT_WORKBOOK, SHOPPING_WORKBOOK]
+MERGED_SUFFIX = '.merged'
+MERGED_VERSION = 1
+
+# Sheet names the dashboard reads
+ITEMIZED_SHEET = re.compile(r'\d{4}.*Itemized', re.IGNORECASE)
+TRIP_SHEET = re.compile(r'Trip\s*(\d+)', re.IGNORECASE)
+
+# Field -> header spellings across sheets, most preferred first
+FIELD_HEADERS = {
+    'date': ['date'],
+    'location': ['location', 'store', 'source'],
+    'item': ['item', 'itemname', 'name', 'ingredient', 'product'],
+    'qty': ['qty', 'quantity', 'qty (oz/lb/cups/etc)'],
+    'unit': ['qty_units'],
+    'price': ['priceraw', 'price', 'cost', 'total', 'amount'],
+    'category': ['cat', 'category'],
+    'subcategory': ['subcat', 'subcat1'],
+}
+
+_QTY = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([a-zA-Z][a-zA-Z ]*)?\s*$')
+
+
+def normalize_header(header):
+    return ' '.join(str(header).replace('\xa0', ' ').split()).lower() if header is not None else ''
+
+
+def column_map(headers):
+    """``{field: column index}`` for the fields a header row has."""
+    positions = {}
+    for i, header in enumerate(headers):
+        positions.setdefault(normalize_header(header), i)
+    columns = {}
+    for field, names in FIELD_HEADERS.items():
+        for name in names:
+            if name in positions:
+                columns[field] = positions[name]
+                break
+    return columns
+
+
+def parse_price(value):
+    """Float price from a number or an accounting string (' $  9.99 '), else None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.replace('\xa0', '').replace('$', '').replace(',', '').strip()
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    return None
+
+
+def parse_qty(value, unit):
+    """``(qty, unit)``; text such as '17.25 oz' is split when there is no unit column."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value, unit
+    if isinstance(value, str):
+        match = _QTY.match(value)
+        if match:
+            number = float(match.group(1))
+            qty = int(number) if number.is_integer() else number
+            return qty, unit if unit else (match.group(2) or '').strip() or None
+    return None, unit
+
+
+def sheet_kind(name):
+    """'itemized', 'trip' or None for sheets that hold no purchases."""
+    if name == PURCHASE_SHEET or ITEMIZED_SHEET.search(name):
+        return 'itemized'
+    if TRIP_SHEET.search(name):
+        return 'trip'
+    return None
+
+
+def list_sources(paths):
+    """``[(path, sheet, kind)]`` for every purchase sheet in ``paths``."""
+    import openpyxl
+
+    sources = []
+    for path in paths:
+        wb = openpyxl.load_workbook(path, read_only=True)
+        try:
+            for name in wb.sheetnames:
+                kind = sheet_kind(name)
+                if kind:
+                    sources.append((path, name, kind))
+        finally:
+            wb.close()
+    return sources
+
+
+def read_sheet(path, sheet, kind):
+    """Normalized rows ``(date, location, item, qty, unit, price, category, subcategory)``.
+
+    Only rows with an item name and a numeric price are returned. Trip
+    sheets carry their date in a ``Date`` cell somewhere on the sheet, which
+    is applied to every row (the last one wins, as in the dashboard).
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = wb[sheet].iter_rows(values_only=True)
+        columns = column_map(next(rows, ()))
+        if 'item' not in columns or 'price' not in columns:
+            return []
+
+        def cell(row, field):
+            i = columns.get(field)
+            return row[i] if i is not None and i < len(row) else None
+
+        result = []
+        trip_date = None
+        for row in rows:
+            date = cell(row, 'date')
+            if kind == 'trip' and isinstance(date, datetime):
+                trip_date = date
+            item = cell(row, 'item')
+            if isinstance(item, str):
+                item = item.strip()
+            price = parse_price(cell(row, 'price'))
+            if not item or price is None:
+                continue
+            qty, unit = parse_qty(cell(row, 'qty'), cell(row, 'unit'))
+            location = cell(row, 'location')
+            result.append([date if isinstance(date, datetime) else None,
+                           location.strip() if isinstance(location, str) else location,
+                           item, qty, unit, price, cell(row, 'category'), cell(row, 'subcategory')])
+        if kind == 'trip':
+            for values in result:
+                values[0] = values[0] or trip_date
+        return [tuple(values) for values in result]
+    finally:
+        wb.close()
+
+
+def purchase_key(row):
+    """Identity of a receipt line across sources."""
+    date, location, item, _, _, price = row[:6]
+    return (date.date() if date else None,
+            str(location or '').lower(),
+            ' '.join(str(item).lower().split()),
+            round(price * 100))
+
+
+class MergedPurchases:
+    """Deduplicated purchases from several sheets plus where each row came from."""
+
+    def __init__(self):
+        self.columns = PurchaseColumns()
+        self.sources = []              # 'workbook.xlsx:Sheet' labels
+        self.source_code = array('l')  # per row, index into sources
+        self.category = []
+        self.subcategory = []
+        self.rows_read = {}            # source label -> rows read
+        self.duplicates = {}           # source label -> rows dropped as duplicates
+
+    def __len__(self):
+        return len(self.columns)
+
+    def source_at(self, i):
+        return self.sources[self.source_code[i]]
+
+    def summary(self):
+        """``[(source, rows read, duplicates dropped)]``."""
+        return [(source, self.rows_read[source], self.duplicates[source]) for source in self.sources]
+
+
+def merge_rows(sheets):
+    """Build a ``MergedPurchases`` from ``[(source label, rows)]`` in priority order."""
+    merged = MergedPurchases()
+    kept_counts = {}
+    keep = []
+    for code, (label, rows) in enumerate(sheets):
+        merged.sources.append(label)
+        merged.rows_read[label] = len(rows)
+        seen = {}
+        dropped = 0
+        for row in rows:
+            key = purchase_key(row)
+            seen[key] = seen.get(key, 0) + 1
+            if seen[key] > kept_counts.get(key, 0):
+                keep.append((code, row))
+            else:
+                dropped += 1
+        for key, count in seen.items():
+            if count > kept_counts.get(key, 0):
+                kept_counts[key] = count
+        merged.duplicates[label] = dropped
+
+    # Newest first like ItemizedPurchase; undated rows last, ties in source order
+    keep.sort(key=lambda entry: entry[1][0] or datetime.min, reverse=True)
+    columns = merged.columns
+    columns.headers = ('Date', 'Time', 'Location', 'Online', 'InStore', 'OrderTransID_ReceiptID',
+                       'ItemID', 'Item', 'Qty', 'Qty_units', 'PriceRaw')
+    layout = [None] * (COL_PRICE + 1)
+    for row_number, (code, row) in enumerate(keep, start=2):
+        date, location, item, qty, unit, price, category, subcategory = row
+        layout[COL_DATE], layout[COL_LOCATION], layout[COL_ITEM] = date, location, item
+        layout[COL_QTY], layout[COL_UNIT], layout[COL_PRICE] = qty, unit, price
+        columns.append(row_number, layout)
+        merged.source_code.append(code)
+        merged.category.append(category)
+        merged.subcategory.append(subcategory)
+    return merged
+
+
+def merge_workbooks(paths=DEFAULT_SOURCES, max_workers=None):
+    """Read every purchase sheet of ``paths`` concurrently and merge them.
+
+    Earlier paths (and earlier sheets within a workbook) take priority when
+    the same purchase appears more than once.
+    """
+    sources = list_sources([path for path in paths if os.path.exists(path)])
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(lambda source: read_sheet(*source), sources))
+    labels = [f"{os.path.basename(path)}:{sheet}" for path, sheet, _ in sources]
+    return merge_rows(list(zip(labels, results)))
+
+
+def merged_path(path=DEFAULT_WORKBOOK):
+    """Base name of the merged data's sidecars (cache, history, matches), e.g.
+    'MealCostCalculator.xlsx.merged'. It is not a workbook; no file has that name."""
+    return path + MERGED_SUFFIX
+
+
+def load_merged(paths=DEFAULT_SOURCES, use_cache=True, max_workers=None):
+    """``MealData`` with the meal sheets of ``paths[0]`` and purchases from all of ``paths``.
+
+    ``data.path`` is ``merged_path(paths[0])`` so history and match-cache
+    sidecars of the merged table don't overwrite the single-workbook ones;
+    it only names sidecars, the workbook itself is ``data.workbook``. The
+    ``MergedPurchases`` (row sources, categories) is ``data.merged``.
+    """
+    existing = [path for path in paths if os.path.exists(path)]
+    key = [(os.path.abspath(path), os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in existing]
+    cache_file = merged_path(paths[0]) + '.cache'
+
+    merged = None
+    if use_cache:
+        merged = _read_merged(cache_file, key)
+    if merged is None:
+        merged = merge_workbooks(existing, max_workers)
+        if use_cache:
+            _write_merged(cache_file, key, merged)
+
+    data = load(paths[0], use_cache)
+    data.workbook = paths[0]
+    data.path = merged_path(paths[0])
+    data.purchases = merged.columns
+    data.merged = merged
+    return data
+
+
+def _read_merged(cache_file, key):
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != MERGED_VERSION or cached.get('key') != key:
+        return None
+    return cached['merged']
+
+
+def _write_merged(cache_file, key, merged):
+    tmp = cache_file + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version': MERGED_VERSION, 'key': key, 'merged': merged}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Merge all receipt workbooks into one purchase table.')
+    parser.add_argument('paths', nargs='*', default=DEFAULT_SOURCES, help='workbooks, highest priority first')
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args(argv)
+
+    data = load_merged(args.paths, use_cache=not args.no_cache)
+    merged = data.merged
+    print("=" * 80)
+    print(f"MERGED PURCHASES ({len(merged):,} rows)")
+    print("=" * 80)
+    for source, read, dropped in merged.summary():
+        print(f"  {source}: {read:,} rows, {dropped:,} duplicates dropped")
+    dates = [data.purchases.date_at(i) for i in (0, len(merged) - 1)] if len(merged) else []
+    if dates and all(dates):
+        print(f"\nCovers {dates[1]:%Y-%m-%d} to {dates[0]:%Y-%m-%d}")
+
+
+if __name__ == '__main__':
+    main()
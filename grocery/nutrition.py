@@ -0,0 +1,286 @@
+"""Nutrition per dollar for every ingredient and meal at every store.
+
+``dashboard/data/ingredients.json`` has USDA nutrients per 100 g for each
+ingredient, and ``MealCosts`` has each ingredient's latest package price per
+store, but nothing joined them. ``NutritionValue`` converts each recipe row
+and each package to grams (``UnitConverter``), then computes cost per gram
+of protein, per 100 kcal, per gram of fiber, and so on. Everything is NumPy
+arrays:
+
+- ``cost_per[i, s, n]``: dollars per nutrient unit buying ingredient ``i`` at store ``s``
+- ``meal_nutrients[m, n]`` and ``meal_cost[m, s]``, the latter buying every
+  ingredient at ``s`` where it carries it and at the cheapest store otherwise.
+
+Grams come from the recipe's ``Qt``/``Unit`` or, failing that, from the
+package (``Total``) times the share used. Ingredients with neither, or with
+no ingredients.json entry, contribute cost but no nutrients (see
+``coverage``).
+
+Per-ingredient results are kept in a ``MealCostCalculator.xlsx.nutrition``
+sidecar keyed on the ingredient's prices, package size and ingredients.json
+entry. Only ingredients where one of those changed are recomputed.
+
+Usage:
+    value = NutritionValue.build(MealCosts.build(data, history), data.path)
+    value.ingredient_ranking('protein')      # [(ingredient, store, $ per g protein)]
+    value.meal_ranking('calories')           # [(code, store, $ per 100 kcal)]
+
+    python -m grocery.nutrition --nutrient protein
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import pickle
+
+import numpy as np
+
+from grocery.units import GRAMS, INGREDIENTS_JSON, UnitConverter
+
+NUTRITION_SUFFIX = '.nutrition'
+NUTRITION_VERSION = 1
+
+# Nutrients reported by default, and the amount their cost is quoted per
+DEFAULT_NUTRIENTS = ['calories', 'protein', 'fiber', 'carbs', 'fat', 'iron', 'calcium', 'potassium']
+PER_AMOUNT = {'calories': 100}
+NUTRIENT_UNITS = {'calories': 'kcal', 'protein': 'g', 'fiber': 'g', 'carbs': 'g', 'fat': 'g', 'sugar': 'g',
+                  'saturatedFat': 'g', 'omega3': 'mg', 'vitaminA': 'mcg', 'vitaminD': 'mcg', 'vitaminK': 'mcg',
+                  'vitaminB12': 'mcg', 'folate': 'mcg', 'selenium': 'mcg'}
+
+
+def nutrient_label(nutrient):
+    unit = NUTRIENT_UNITS.get(nutrient, 'mg')
+    if nutrient == 'calories':
+        return f"{PER_AMOUNT[nutrient]} {unit}"
+    per = PER_AMOUNT.get(nutrient, 1)
+    return f"{per} {unit} {nutrient}" if per != 1 else f"{unit} {nutrient}"
+
+
+def load_entries(path=INGREDIENTS_JSON):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('ingredients', {})
+
+
+def _fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class NutritionValue:
+    """Cost per nutrient for the ingredients and meals of a ``MealCosts``."""
+
+    def __init__(self, meal_costs, entries, converter=None, nutrients=DEFAULT_NUTRIENTS, cache=None):
+        """``entries`` are ingredients.json entries; ``cache`` maps ingredient ->
+        ``(fingerprint, package nutrients, cost per)`` from an earlier build."""
+        costs = meal_costs
+        self.costs = costs
+        self.stores = costs.stores
+        self.ingredients = costs.ingredients
+        self.nutrients = list(nutrients)
+        self.converter = converter or UnitConverter(entries)
+        self.scale = np.array([PER_AMOUNT.get(n, 1) for n in self.nutrients], dtype=float)
+
+        # Nutrients per 100 g, NaN where the ingredient has no entry or value
+        self.keys = [self.converter.resolve(name) for name in self.ingredients]
+        self.per_100g = np.full((len(self.ingredients), len(self.nutrients)), np.nan)
+        for i, key in enumerate(self.keys):
+            nutrition = entries.get(key, {}).get('nutrition', {}) if key else {}
+            for n, nutrient in enumerate(self.nutrients):
+                value = nutrition.get(nutrient)
+                if isinstance(value, (int, float)):
+                    self.per_100g[i, n] = value
+
+        self.row_grams, self.package_grams = self._grams()
+
+        # Per-ingredient results, reusing cached rows whose inputs are unchanged
+        self.package_nutrients = np.full_like(self.per_100g, np.nan)
+        self.cost_per = np.full((len(self.ingredients), len(self.stores), len(self.nutrients)), np.nan)
+        self.fingerprints = [
+            _fingerprint(self.nutrients, self.stores, costs.prices[i].tolist(), self.package_grams[i],
+                         entries.get(key) if key else None)
+            for i, key in enumerate(self.keys)]
+        cache = cache or {}
+        stale = []
+        for i, name in enumerate(self.ingredients):
+            cached = cache.get(name)
+            if cached and cached[0] == self.fingerprints[i]:
+                self.package_nutrients[i], self.cost_per[i] = cached[1], cached[2]
+            else:
+                stale.append(i)
+        self.recomputed = len(stale)
+        if stale:
+            self._compute(np.array(stale, dtype=np.intp))
+
+        self._meal_rollups()
+
+    def _grams(self):
+        """Grams per recipe row and per package (NaN where unknown)."""
+        costs = self.costs
+        row_grams = np.full(len(costs.rows), np.nan)
+        package_grams = np.full(len(self.ingredients), np.nan)
+        for r, row in enumerate(costs.rows):
+            name = row['ingredient']
+            used = self.converter.convert(row['qty_needed'], row['unit'], GRAMS, name)
+            package = self.converter.convert(row['total_qty'], row['unit'], GRAMS, name)
+            i = costs.row_ingredient[r]
+            if package and math.isnan(package_grams[i]):
+                package_grams[i] = package
+            if used:
+                row_grams[r] = used
+            elif package:
+                row_grams[r] = package * costs.fraction[r]
+        # Rows with grams but no package size: the package is what the share implies
+        for r in range(len(costs.rows)):
+            i = costs.row_ingredient[r]
+            if math.isnan(package_grams[i]) and not math.isnan(row_grams[r]) and costs.fraction[r] > 0:
+                package_grams[i] = row_grams[r] / costs.fraction[r]
+        for r in range(len(costs.rows)):
+            i = costs.row_ingredient[r]
+            if math.isnan(row_grams[r]) and not math.isnan(package_grams[i]):
+                row_grams[r] = package_grams[i] * costs.fraction[r]
+        return row_grams, package_grams
+
+    def _compute(self, rows):
+        self.package_nutrients[rows] = self.package_grams[rows, None] / 100 * self.per_100g[rows]
+        prices = self.costs.prices[rows][:, :, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cost_per = prices / self.package_nutrients[rows][:, None, :] * self.scale
+        self.cost_per[rows] = np.where(np.isfinite(cost_per) & (cost_per > 0), cost_per, np.nan)
+
+    def _meal_rollups(self):
+        costs = self.costs
+        n_meals = len(costs.meals)
+        row_nutrients = self.row_grams[:, None] / 100 * self.per_100g[costs.row_ingredient]
+        self.meal_nutrients = np.zeros((n_meals, len(self.nutrients)))
+        np.add.at(self.meal_nutrients, costs.row_meal, np.nan_to_num(row_nutrients))
+
+        # A store's meal cost: its own price where it has one, else the cheapest
+        fallback = np.where(np.isnan(costs.best_price), np.nan, costs.best_price)[costs.row_ingredient]
+        fallback = np.where(np.isnan(fallback), costs.sheet_price, fallback)
+        store_prices = costs.prices[costs.row_ingredient]
+        package_price = np.where(np.isnan(store_prices), fallback[:, None], store_prices)
+        row_cost = np.nan_to_num(package_price) * costs.fraction[:, None]
+        self.meal_cost = np.zeros((n_meals, len(self.stores)))
+        np.add.at(self.meal_cost, costs.row_meal, row_cost)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per = self.meal_cost[:, :, None] / self.meal_nutrients[:, None, :] * self.scale
+        self.meal_cost_per = np.where(np.isfinite(per) & (per > 0), per, np.nan)
+
+    @classmethod
+    def build(cls, meal_costs, workbook_path=None, entries=None, nutrients=DEFAULT_NUTRIENTS, use_cache=True):
+        """Compute (reusing the ``.nutrition`` sidecar of ``workbook_path``) and save."""
+        entries = entries if entries is not None else load_entries()
+        path = nutrition_path(workbook_path) if workbook_path and use_cache else None
+        value = cls(meal_costs, entries, nutrients=nutrients, cache=_read_cache(path) if path else None)
+        if path and value.recomputed:
+            _write_cache(path, value.cache_entries())
+        return value
+
+    def cache_entries(self):
+        return {name: (self.fingerprints[i], self.package_nutrients[i], self.cost_per[i])
+                for i, name in enumerate(self.ingredients)}
+
+    def coverage(self):
+        """Ingredient names without nutrients (no ingredients.json match or no grams)."""
+        missing = np.isnan(self.package_nutrients).all(axis=1)
+        return [name for name, miss in zip(self.ingredients, missing) if miss]
+
+    def ingredient_ranking(self, nutrient):
+        """``[(ingredient, store, cost per nutrient)]``, cheapest source first."""
+        n = self.nutrients.index(nutrient)
+        found = [(self.ingredients[i], self.stores[s], float(self.cost_per[i, s, n]))
+                 for i, s in zip(*np.nonzero(~np.isnan(self.cost_per[:, :, n])))]
+        return sorted(found, key=lambda item: item[2])
+
+    def meal_ranking(self, nutrient):
+        """``[(meal code, store, cost per nutrient)]``, cheapest first."""
+        n = self.nutrients.index(nutrient)
+        meals = self.costs.meals
+        found = [(meals[m], self.stores[s], float(self.meal_cost_per[m, s, n]))
+                 for m, s in zip(*np.nonzero(~np.isnan(self.meal_cost_per[:, :, n])))]
+        return sorted(found, key=lambda item: item[2])
+
+    def best_store(self, ingredient, nutrient):
+        """``(store, cost per nutrient)`` of the cheapest source, or None."""
+        i, n = self.ingredients.index(ingredient), self.nutrients.index(nutrient)
+        row = self.cost_per[i, :, n]
+        if np.isnan(row).all():
+            return None
+        s = int(np.nanargmin(row))
+        return self.stores[s], float(row[s])
+
+
+def nutrition_path(workbook_path):
+    return workbook_path + NUTRITION_SUFFIX
+
+
+def _read_cache(path):
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(payload, dict) or payload.get('version') != NUTRITION_VERSION:
+        return None
+    return payload['entries']
+
+
+def _write_cache(path, entries):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': NUTRITION_VERSION, 'entries': entries}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def main(argv=None):
+    from grocery.history import load_history
+    from grocery.loader import DEFAULT_WORKBOOK, load
+    from grocery.meal_costs import MealCosts
+    from grocery.shopping_list import GROCERY_STORES
+
+    parser = argparse.ArgumentParser(description='Cost per nutrient for ingredients and meals.')
+    parser.add_argument('--nutrient', action='append', help=f'nutrient to rank by (default: {", ".join(DEFAULT_NUTRIENTS[:3])})')
+    parser.add_argument('--top', type=int, default=10, help='ingredients to list per nutrient')
+    parser.add_argument('--workbook', default=DEFAULT_WORKBOOK)
+    args = parser.parse_args(argv)
+
+    data = load(args.workbook)
+    costs = MealCosts.build(data, load_history(data, GROCERY_STORES))
+    nutrients = list(dict.fromkeys(DEFAULT_NUTRIENTS + (args.nutrient or [])))
+    value = NutritionValue.build(costs, data.path, nutrients=nutrients)
+
+    for nutrient in args.nutrient or DEFAULT_NUTRIENTS[:3]:
+        label = nutrient_label(nutrient)
+        print("=" * 80)
+        print(f"COST PER {label.upper()}")
+        print("=" * 80)
+        seen = set()
+        shown = 0
+        for name, store, cost in value.ingredient_ranking(nutrient):
+            if name.lower() in seen:
+                continue
+            seen.add(name.lower())
+            print(f"  {name:<28} {store:<10} ${cost:.4f} per {label}")
+            shown += 1
+            if shown >= args.top:
+                break
+        print("\n  Meals (cheapest store):")
+        best = {}
+        for code, store, cost in value.meal_ranking(nutrient):
+            best.setdefault(code, (store, cost))
+        for code, (store, cost) in best.items():
+            print(f"  {code}. {costs.meal_names[code]:<34} {store:<10} ${cost:.4f} per {label}")
+        print()
+    missing = value.coverage()
+    if missing:
+        print(f"No nutrition data: {', '.join(missing)}")
+    print(f"({value.recomputed} of {len(value.ingredients)} ingredients recomputed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Exact cost-minimizing store assignment with per-store trip costs.
+
+Picking the cheapest store per ingredient ignores that every extra store is
+another trip. This solves the real problem - choose the set of stores to
+visit and assign every ingredient to one of them, minimizing item prices plus
+visit costs - as an uncapacitated facility-location problem with
+branch-and-bound over store bitmasks. There are only a handful of stores, so a
+plan solves in well under a millisecond and ``solve_many`` can price hundreds
+of weekly plans in one batch.
+
+Usage:
+    optimizer = StoreOptimizer({'Costco': 5, 'Safeway': 3, 'H-Mart': 5})
+    plan = optimizer.solve(
+        {'kale': {'H-Mart': 1.48, 'Safeway': 2.49}, 'eggs': {'Costco': 9.39}},
+        forced={'eggs': 'Costco'}
+    )
+    plan.stores, plan.assignments, plan.total
+"""
+
+import math
+
+
+class StorePlan:
+    """Result of one optimization."""
+
+    def __init__(self, stores, assignments, item_costs, visit_costs, missing):
+        self.stores = stores              # stores to visit, in optimizer order
+        self.assignments = assignments    # ingredient -> store
+        self.item_costs = item_costs      # ingredient -> price * quantity
+        self.item_cost = sum(item_costs.values())
+        self.visit_cost = sum(visit_costs.values())
+        self.total = self.item_cost + self.visit_cost
+        self.missing = missing            # ingredients no store has a price for
+
+    def by_store(self):
+        """``{store: [ingredient, ...]}`` for the chosen stores."""
+        grouped = {store: [] for store in self.stores}
+        for ingredient, store in self.assignments.items():
+            grouped[store].append(ingredient)
+        return grouped
+
+    def __repr__(self):
+        return f"StorePlan(stores={self.stores}, total={self.total:.2f})"
+
+
+class StoreOptimizer:
+    """Solves store-set selection for a fixed set of stores and visit costs."""
+
+    def __init__(self, visit_costs=None, stores=None):
+        visit_costs = dict(visit_costs or {})
+        self.stores = list(stores if stores is not None else visit_costs)
+        self.visit_costs = {store: visit_costs.get(store, 0.0) for store in self.stores}
+
+    def _store_list(self, prices, forced):
+        """Configured stores plus any others seen in ``prices`` / ``forced`` (visit cost 0)."""
+        stores = list(self.stores)
+        seen = set(stores)
+        extra = [store for store_prices in prices.values() for store in store_prices]
+        for store in extra + list(forced.values()):
+            if store not in seen:
+                seen.add(store)
+                stores.append(store)
+        return stores
+
+    def solve(self, prices, forced=None, quantities=None):
+        """Optimal plan for ``prices`` (``{ingredient: {store: price}}``).
+
+        ``forced`` pins ingredients to a store (which must then be visited;
+        a store with no price for it counts as $0, like the scripts' "not in
+        history" lines). ``quantities`` multiplies an ingredient's price,
+        e.g. how many recipe rows need it.
+        """
+        forced = forced or {}
+        quantities = quantities or {}
+        stores = self._store_list(prices, forced)
+        bits = {store: 1 << i for i, store in enumerate(stores)}
+        visit = [self.visit_costs.get(store, 0.0) for store in stores]
+
+        forced_mask = 0
+        fixed_costs = {}
+        for ingredient, store in forced.items():
+            forced_mask |= bits[store]
+            price = prices.get(ingredient, {}).get(store, 0)
+            fixed_costs[ingredient] = price * quantities.get(ingredient, 1)
+
+        # Free ingredients: (ingredient, [(cost, bit), ...] cheapest first)
+        options = []
+        missing = []
+        for ingredient, store_prices in prices.items():
+            if ingredient in forced:
+                continue
+            qty = quantities.get(ingredient, 1)
+            choices = sorted((price * qty, bits[store]) for store, price in store_prices.items())
+            if choices:
+                options.append((ingredient, choices))
+            else:
+                missing.append(ingredient)
+
+        def cost(mask):
+            """Item cost with stores in ``mask`` available, ``inf`` if something is uncovered."""
+            total = 0.0
+            for _, choices in options:
+                for price, bit in choices:
+                    if mask & bit:
+                        total += price
+                        break
+                else:
+                    return math.inf
+            return total
+
+        def visits(mask):
+            return sum(v for i, v in enumerate(visit) if mask >> i & 1)
+
+        all_mask = (1 << len(stores)) - 1
+        best_mask = self._greedy(all_mask, forced_mask, cost, visits)
+        best_total = cost(best_mask) + visits(best_mask)
+
+        # Branch on stores one at a time: open (must visit) or closed. The
+        # bound assumes every undecided store is available for free.
+        order = sorted(range(len(stores)), key=lambda i: visit[i], reverse=True)
+
+        def search(depth, open_mask, closed_mask):
+            nonlocal best_mask, best_total
+            available = all_mask & ~closed_mask
+            bound = cost(available) + visits(open_mask)
+            if bound >= best_total:
+                return
+            if depth == len(order):
+                best_mask, best_total = open_mask, bound
+                return
+            bit = 1 << order[depth]
+            if open_mask & bit:
+                search(depth + 1, open_mask, closed_mask)
+                return
+            search(depth + 1, open_mask, closed_mask | bit)
+            search(depth + 1, open_mask | bit, closed_mask)
+
+        search(0, forced_mask, 0)
+        return self._plan(best_mask, bits, stores, options, fixed_costs, forced, missing)
+
+    def solve_many(self, plans, forced=None, quantities=None):
+        """Solve a batch of price tables that share stores and visit costs."""
+        return [self.solve(prices, forced, quantities) for prices in plans]
+
+    @staticmethod
+    def _greedy(all_mask, forced_mask, cost, visits):
+        """Upper bound: start with every store, keep closing the one that saves most."""
+        mask = all_mask
+        total = cost(mask) + visits(mask)
+        while True:
+            best = None
+            bit = 1
+            while bit <= mask:
+                if mask & bit and not forced_mask & bit:
+                    candidate = cost(mask & ~bit) + visits(mask & ~bit)
+                    if candidate < total and (best is None or candidate < best[0]):
+                        best = (candidate, mask & ~bit)
+                bit <<= 1
+            if best is None:
+                return mask
+            total, mask = best
+
+    def _plan(self, mask, bits, stores, options, fixed_costs, forced, missing):
+        assignments = dict(forced)
+        item_costs = dict(fixed_costs)
+        by_bit = {bit: store for store, bit in bits.items()}
+        used = 0
+        for store in forced.values():
+            used |= bits[store]
+        for ingredient, choices in options:
+            for price, bit in choices:
+                if mask & bit:
+                    assignments[ingredient] = by_bit[bit]
+                    item_costs[ingredient] = price
+                    used |= bit
+                    break
+        # Only stores something is bought at are visited
+        chosen = [store for store in stores if used & bits[store]]
+        visit_costs = {store: self.visit_costs.get(store, 0.0) for store in chosen}
+        return StorePlan(chosen, assignments, item_costs, visit_costs, missing)
@@ -0,0 +1,166 @@
+"""Dense ingredients x stores price matrix built with NumPy.
+
+Every matched purchase line for every (ingredient, store) pair is flattened
+into one set of arrays, and latest / min / median / per-unit prices come out
+of a single sort instead of nested Python loops. Cheapest store, savings and
+coverage are then plain array operations over the matrix.
+
+Cells with no history are NaN. With a ``UnitConverter`` and the recipe
+quantities, ``unit_price`` holds the latest price per gram / millilitre /
+each and ``need_cost`` what the needed amount costs at that rate.
+
+Usage:
+    matrix = PriceMatrix.build(names, stores, purchase_db, match_items)
+    matrix.latest[i, s], matrix.cheapest_store(), matrix.coverage()
+"""
+
+import numpy as np
+
+from grocery.price_series import latest_purchase
+from grocery.units import unit_price
+
+
+class PriceMatrix:
+    """Price statistics per ingredient (rows) and store (columns)."""
+
+    def __init__(self, ingredients, stores):
+        self.ingredients = list(ingredients)
+        self.stores = list(stores)
+        shape = (len(self.ingredients), len(self.stores))
+        self.latest = np.full(shape, np.nan)       # most recent purchase of the first matched item
+        self.latest_item = np.full(shape, None, dtype=object)
+        self.min = np.full(shape, np.nan)          # lowest price over all matched lines
+        self.median = np.full(shape, np.nan)       # median over all matched lines
+        self.unit_price = np.full(shape, np.nan)   # latest price per base unit
+        self.unit_dim = np.full(shape, None, dtype=object)  # 'g', 'ml' or 'each'
+        self.need_cost = np.full(shape, np.nan)    # needed amount x unit_price
+        self.count = np.zeros(shape, dtype=np.int64)
+        self._rows = {name: i for i, name in enumerate(self.ingredients)}
+        self._cols = {store: j for j, store in enumerate(self.stores)}
+
+    @classmethod
+    def build(cls, ingredients, stores, purchase_db, match_items, converter=None, needs=None):
+        """Build from ``purchase_db`` and ``match_items(ingredient, store) -> [item_key, ...]``.
+
+        Item keys come best match first; the first one's most recent
+        purchase supplies ``latest``. ``needs`` maps an
+        ingredient to its recipe ``[(qty, unit), ...]``; with ``converter``
+        those are priced into ``need_cost``.
+        """
+        matrix = cls(ingredients, stores)
+        n_stores = len(matrix.stores)
+        cells, prices = [], []
+        for i, ingredient in enumerate(matrix.ingredients):
+            for j, store in enumerate(matrix.stores):
+                keys = match_items(ingredient, store)
+                if not keys:
+                    continue
+                latest = latest_purchase(purchase_db[store][keys[0]])
+                matrix.latest[i, j] = latest.price
+                matrix.latest_item[i, j] = latest.item
+                dim, per_base = unit_price(latest)
+                if dim is not None:
+                    matrix.unit_price[i, j] = per_base
+                    matrix.unit_dim[i, j] = dim
+                    if converter is not None and needs:
+                        matrix.need_cost[i, j] = _need_cost(converter, ingredient, needs.get(ingredient), dim, per_base)
+                cell = i * n_stores + j
+                for key in keys:
+                    for purchase in purchase_db[store][key]:
+                        cells.append(cell)
+                        prices.append(purchase.price)
+        matrix._aggregate(np.asarray(cells, dtype=np.int64), np.asarray(prices, dtype=float))
+        return matrix
+
+    def _aggregate(self, cells, prices):
+        """Fill ``min``/``median``/``count`` from flat (cell, price) arrays."""
+        if not len(cells):
+            return
+        order = np.lexsort((prices, cells))
+        cells, prices = cells[order], prices[order]
+        unique, starts, counts = np.unique(cells, return_index=True, return_counts=True)
+        lower = prices[starts + (counts - 1) // 2]
+        upper = prices[starts + counts // 2]
+        self.min.flat[unique] = prices[starts]
+        self.median.flat[unique] = (lower + upper) / 2
+        self.count.flat[unique] = counts
+
+    def recipe_costs(self, rows=None):
+        """Cost to compare stores on: ``need_cost`` for ingredients where every
+        carrying store has it, otherwise package price x ``rows`` (how many
+        recipe rows use the ingredient)."""
+        rows = np.ones(len(self.ingredients)) if rows is None else np.asarray(rows, dtype=float)
+        comparable = (np.isnan(self.need_cost) == np.isnan(self.latest)).all(axis=1)
+        return np.where(comparable[:, None], self.need_cost, self.latest * rows[:, None])
+
+    def row(self, ingredient):
+        return self._rows[ingredient]
+
+    def col(self, store):
+        return self._cols[store]
+
+    def covered(self):
+        """Boolean matrix: store has history for the ingredient."""
+        return ~np.isnan(self.latest)
+
+    def coverage(self):
+        """Fraction of ingredients each store has a price for."""
+        if not self.ingredients:
+            return np.zeros(len(self.stores))
+        return self.covered().mean(axis=0)
+
+    def cheapest_store(self, prices=None):
+        """Column index of the cheapest store per ingredient, -1 if none has it.
+
+        ``prices`` is any of the matrices (``latest`` by default, or ``min``,
+        ``median``, ``unit_price``). Ties go to the first store in ``stores``
+        order.
+        """
+        prices = self.latest if prices is None else prices
+        filled = np.where(np.isnan(prices), np.inf, prices)
+        best = filled.argmin(axis=1) if self.stores else np.zeros(len(self.ingredients), dtype=np.int64)
+        best[np.isnan(prices).all(axis=1)] = -1
+        return best
+
+    def cheapest_price(self, prices=None):
+        """Lowest price per ingredient (0 where no store has it)."""
+        prices = self.latest if prices is None else prices
+        best = np.where(np.isnan(prices), np.inf, prices).min(axis=1, initial=np.inf)
+        return np.where(np.isinf(best), 0.0, best)
+
+    def savings(self, baseline=None, prices=None):
+        """Per-ingredient saving of the cheapest store over ``baseline``.
+
+        ``baseline`` is a store name; by default the most expensive store
+        that carries the ingredient. Ingredients the baseline lacks save 0.
+        """
+        prices = self.latest if prices is None else prices
+        if baseline is None:
+            reference = np.where(np.isnan(prices), -np.inf, prices).max(axis=1, initial=-np.inf)
+        else:
+            reference = prices[:, self.col(baseline)]
+        saving = reference - self.cheapest_price(prices)
+        return np.where(np.isfinite(saving), saving, 0.0)
+
+    def store_totals(self, quantities=None, prices=None):
+        """Cost per store of buying each ingredient at its cheapest store."""
+        prices = self.latest if prices is None else prices
+        qty = np.ones(len(self.ingredients)) if quantities is None else np.asarray(quantities, dtype=float)
+        best = self.cheapest_store(prices)
+        covered = best >= 0
+        totals = np.zeros(len(self.stores))
+        np.add.at(totals, best[covered], self.cheapest_price(prices)[covered] * qty[covered])
+        return totals
+
+
+def _need_cost(converter, ingredient, needed, dim, per_base):
+    """Price of the recipe quantities ``needed`` at ``per_base`` per ``dim``."""
+    if not needed:
+        return np.nan
+    total = 0.0
+    for qty, unit in needed:
+        amount = converter.convert(qty, unit, dim, ingredient)
+        if amount is None:
+            return np.nan
+        total += amount * per_base
+    return total
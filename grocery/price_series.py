@@ -0,0 +1,282 @@
+"""Per-(store, item) price time series sorted by date.
+
+The scripts treat ``purchases[0]`` as the most recent price, which only holds
+while ItemizedPurchase stays sorted newest first, and there was no way to ask
+what an item cost at some point or how its price moved. ``PriceSeries`` keeps
+each item's purchase dates and prices in date order in compact arrays, so
+latest price, price at a date and rolling-window stats are bisect lookups
+instead of rescans of the sheet.
+
+Dates are seconds since 1970 as in ``PurchaseColumns``; undated rows sort
+before everything else. Purchases on the same date keep sheet order, the row
+nearer the top counting as the later one.
+
+``PriceSeries.from_purchase_db`` serves the same lookups over a
+``purchase_db``, building each item's series on first use and keeping its
+``Purchase`` records; ``PurchaseHistory.latest`` and ``StoreAssigner`` read
+the latest purchase from it.
+
+Usage:
+    series = PriceSeries.from_columns(data.purchases, ['Costco', 'H-Mart'])
+    series.latest('Costco', 'ks peanut butter')            # (datetime, price)
+    series.price_at('Costco', 'ks peanut butter', datetime(2025, 6, 1))
+    series.rolling('Costco', 'ks peanut butter', days=90)  # {'count', 'min', 'mean', 'median'}
+
+    series = PriceSeries.from_purchase_db(history.purchase_db)
+    series.latest_purchase('Costco', 'ks peanut butter')   # Purchase
+
+    python -m grocery.price_series Costco "ks peanut butter" --days 90
+"""
+
+import argparse
+import statistics
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from datetime import date, datetime, timedelta
+
+from grocery.loader import EPOCH, NO_DATE, load
+
+DAY = 24 * 60 * 60
+
+
+def to_seconds(when):
+    """Seconds since 1970 for a ``datetime``/``date`` (or seconds passed through)."""
+    if isinstance(when, datetime):
+        return (when - EPOCH) // timedelta(seconds=1)
+    if isinstance(when, date):
+        return (datetime(when.year, when.month, when.day) - EPOCH) // timedelta(seconds=1)
+    return int(when)
+
+
+def to_datetime(seconds):
+    return None if seconds == NO_DATE else EPOCH + timedelta(seconds=seconds)
+
+
+def date_order(dates):
+    """Indices of ``dates`` (in sheet order) oldest first; on the same date the row nearer the top is newer."""
+    return sorted(range(len(dates)), key=lambda i: (dates[i], -i))
+
+
+class ItemSeries:
+    """Dates (``array('q')``) and prices (``array('d')``) of one item, oldest first.
+
+    ``purchases`` holds the matching ``Purchase`` records when the series
+    was built from them.
+    """
+
+    __slots__ = ('dates', 'prices', 'purchases')
+
+    def __init__(self, dates=(), prices=(), purchases=None):
+        self.dates = array('q', dates)
+        self.prices = array('d', prices)
+        self.purchases = purchases
+
+    @classmethod
+    def from_purchases(cls, purchases):
+        """Series of ``Purchase`` records listed in sheet order."""
+        dates = [NO_DATE if p.date is None else to_seconds(p.date) for p in purchases]
+        order = date_order(dates)
+        return cls((dates[i] for i in order), (purchases[i].price for i in order),
+                   [purchases[i] for i in order])
+
+    def __len__(self):
+        return len(self.dates)
+
+    def latest(self):
+        """``(seconds, price)`` of the most recent purchase."""
+        return self.dates[-1], self.prices[-1]
+
+    def latest_purchase(self):
+        return self.purchases[-1]
+
+    def newest_first(self):
+        """The ``Purchase`` records, newest first."""
+        return self.purchases[::-1]
+
+    def index_at(self, when):
+        """Index of the last purchase on or before ``when`` (seconds), -1 if none."""
+        return bisect_right(self.dates, when) - 1
+
+    def window(self, start, end):
+        """Prices of purchases with ``start < date <= end`` (seconds)."""
+        return self.prices[bisect_right(self.dates, start):bisect_right(self.dates, end)]
+
+    def dated(self):
+        """Index of the first dated purchase."""
+        return bisect_left(self.dates, NO_DATE + 1)
+
+
+def window_stats(prices):
+    if not prices:
+        return None
+    return {
+        'count': len(prices),
+        'min': min(prices),
+        'mean': sum(prices) / len(prices),
+        'median': statistics.median(prices)
+    }
+
+
+def latest_purchase(purchases):
+    """The most recent of ``purchases`` (in sheet order) by date."""
+    return ItemSeries.from_purchases(purchases).latest_purchase()
+
+
+def newest_first(purchases):
+    """``purchases`` (in sheet order) by date, newest first."""
+    return ItemSeries.from_purchases(purchases).newest_first()
+
+
+class LatestPurchases(Mapping):
+    """``{item_key: Purchase}`` of one store, read from a ``PriceSeries``."""
+
+    def __init__(self, price_series, store):
+        self._series = price_series
+        self._store = store
+
+    def __getitem__(self, item_key):
+        purchase = self._series.latest_purchase(self._store, item_key)
+        if purchase is None:
+            raise KeyError(item_key)
+        return purchase
+
+    def __iter__(self):
+        return iter(self._series.items(self._store))
+
+    def __len__(self):
+        return len(self._series.items(self._store))
+
+
+class PriceSeries:
+    """``{store: {item_key: ItemSeries}}`` built in one pass over ``PurchaseColumns``.
+
+    Item keys are lowercased item names, as in ``purchase_db``.
+    """
+
+    def __init__(self, purchase_db=None):
+        self.series = {}
+        self.purchase_db = purchase_db
+
+    @classmethod
+    def from_columns(cls, columns, stores):
+        rows = {}
+        for i in columns.valid_rows(stores):
+            key = (columns.location_at(i), str(columns.item[i]).lower())
+            rows.setdefault(key, []).append(i)
+
+        price_series = cls()
+        dates, prices = columns.date, columns.price
+        for (store, item_key), indices in rows.items():
+            order = [indices[k] for k in date_order([dates[i] for i in indices])]
+            price_series.series.setdefault(store, {})[item_key] = ItemSeries(
+                (dates[i] for i in order), (prices[i] for i in order))
+        for store in stores:
+            price_series.series.setdefault(store, {})
+        return price_series
+
+    @classmethod
+    def from_purchase_db(cls, purchase_db):
+        """Series over ``{store: {item_key: [Purchase, ...]}}``, each built when first looked up."""
+        return cls(purchase_db)
+
+    def get(self, store, item_key):
+        """``ItemSeries`` for an item, or None if it was never bought there."""
+        items = self.series.get(store, {})
+        series = items.get(item_key)
+        if series is None and self.purchase_db is not None:
+            purchases = self.purchase_db.get(store, {}).get(item_key)
+            if purchases:
+                series = self.series.setdefault(store, {})[item_key] = ItemSeries.from_purchases(purchases)
+        return series
+
+    def items(self, store):
+        if self.purchase_db is not None:
+            return list(self.purchase_db.get(store, {}))
+        return list(self.series.get(store, {}))
+
+    def latest(self, store, item_key):
+        """``(datetime, price)`` of the most recent purchase by date, or None."""
+        series = self.get(store, item_key)
+        if not series:
+            return None
+        seconds, price = series.latest()
+        return to_datetime(seconds), price
+
+    def latest_purchase(self, store, item_key):
+        """The most recent ``Purchase`` by date (series built from a ``purchase_db`` only), or None."""
+        series = self.get(store, item_key)
+        return series.latest_purchase() if series else None
+
+    def latest_purchases(self, stores):
+        """``{store: {item_key: Purchase}}`` views of the latest purchase of each item."""
+        return {store: LatestPurchases(self, store) for store in stores}
+
+    def price_at(self, store, item_key, when):
+        """Price of the last purchase on or before ``when``, or None."""
+        series = self.get(store, item_key)
+        if not series:
+            return None
+        i = series.index_at(to_seconds(when))
+        if i < series.dated():
+            return None
+        return series.prices[i]
+
+    def rolling(self, store, item_key, days, at=None):
+        """Stats over the ``days`` up to ``at`` (default: the latest purchase date).
+
+        Returns ``{'count', 'min', 'mean', 'median'}`` or None if there were
+        no dated purchases in the window.
+        """
+        series = self.get(store, item_key)
+        if not series or series.dated() == len(series):
+            return None
+        end = series.dates[-1] if at is None else to_seconds(at)
+        return window_stats(series.window(max(end - days * DAY, NO_DATE), end))
+
+    def rolling_series(self, store, item_key, days):
+        """``[(datetime, stats)]`` with the rolling window ending at each purchase date."""
+        series = self.get(store, item_key)
+        if not series:
+            return []
+        dates, prices = series.dates, series.prices
+        result = []
+        start = series.dated()
+        lo = start
+        for hi in range(start, len(series)):
+            if hi + 1 < len(series) and dates[hi + 1] == dates[hi]:
+                continue  # one point per date, after all of that day's purchases
+            while dates[lo] <= dates[hi] - days * DAY:
+                lo += 1
+            result.append((to_datetime(dates[hi]), window_stats(prices[lo:hi + 1])))
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Price history of one item at one store.')
+    parser.add_argument('store')
+    parser.add_argument('item', help='item name as on the receipt (case-insensitive)')
+    parser.add_argument('--days', type=int, default=90, help='rolling window length')
+    parser.add_argument('--workbook', default='MealCostCalculator.xlsx')
+    args = parser.parse_args(argv)
+
+    data = load(args.workbook)
+    series = PriceSeries.from_columns(data.purchases, [args.store])
+    item_key = args.item.lower()
+    points = series.rolling_series(args.store, item_key, args.days)
+    if not points:
+        print(f"No dated purchases of '{args.item}' at {args.store}")
+        return
+
+    print("=" * 80)
+    print(f"{args.store.upper()}: {args.item} ({args.days}-day rolling window)")
+    print("=" * 80)
+    for when, stats in points:
+        print(f"  {when:%Y-%m-%d}  min ${stats['min']:.2f}  mean ${stats['mean']:.2f}"
+              f"  median ${stats['median']:.2f}  ({stats['count']} purchases)")
+    when, price = series.latest(args.store, item_key)
+    print(f"\nLatest: ${price:.2f} on {when:%Y-%m-%d}")
+
+
+if __name__ == '__main__':
+    main()
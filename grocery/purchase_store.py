@@ -0,0 +1,344 @@
+"""Indexed SQLite copy of ItemizedPurchase for ad-hoc history queries.
+
+Answering "what did H-Mart charge for kale last spring?" used to mean another
+script walking every ItemizedPurchase row. ``PurchaseStore`` keeps the valid
+receipt lines (an item name and a price > 0) of every location in a
+``MealCostCalculator.xlsx.sqlite`` database, indexed on (location, item key),
+date and price, so such questions are indexed queries and the data outlives
+the process.
+
+The database is synced from a loaded workbook the same way
+``PurchaseHistory`` is: rows entered at the top or appended at the bottom
+are inserted, and anything else rebuilds the table.
+
+``history(stores)`` presents the database through the ``purchase_db`` /
+``latest`` / ``versions`` interface of ``PurchaseHistory``. Each
+``purchase_db[store][item_key]`` is then a query instead of a dict lookup,
+so ``StoreAssigner``, ``FuzzyMatcher``, ``MealCosts`` and
+``batch.build_tables`` run on it unchanged (``python -m grocery --db ...``).
+
+Usage:
+    store = open_store(data)
+    store.purchases('kale', store='H-Mart', since='2025-03-01', until='2025-05-31')
+    store.price_summary('kale', since='2025-03-01')
+    history = store.history(['Costco', 'Safeway'])
+    history.latest['Costco']['kale'].price
+
+    python -m grocery.purchase_store kale --store H-Mart --since 2025-03-01 --until 2025-05-31
+"""
+
+import argparse
+import json
+import sqlite3
+import uuid
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+from grocery import instrument
+from grocery.loader import EPOCH, NO_DATE, Purchase, parse_date
+
+STORE_SUFFIX = '.sqlite'
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS versions (location TEXT PRIMARY KEY, token TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS purchases (
+    row INTEGER NOT NULL,
+    date INTEGER,
+    location TEXT NOT NULL,
+    item TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    qty REAL,
+    unit TEXT,
+    price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS purchases_location_item ON purchases (location, item_key, row);
+CREATE INDEX IF NOT EXISTS purchases_date ON purchases (date);
+CREATE INDEX IF NOT EXISTS purchases_price ON purchases (price);
+"""
+
+_COLUMNS = 'row, date, location, item, qty, unit, price'
+
+
+def _seconds(value, end=False):
+    """Epoch seconds of a date, datetime or 'YYYY-MM-DD' string (``end``: through that day)."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+        if end:
+            value += timedelta(days=1) - timedelta(seconds=1)
+    elif end and value == datetime(value.year, value.month, value.day):
+        value += timedelta(days=1) - timedelta(seconds=1)
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+def _record(row):
+    number, seconds, location, item, qty, unit, price = row
+    purchase_date = None if seconds is None else EPOCH + timedelta(seconds=seconds)
+    if isinstance(qty, float) and qty.is_integer():
+        qty = int(qty)
+    if price.is_integer():
+        price = int(price)
+    return Purchase(number, purchase_date, location, item, qty, unit, price)
+
+
+class PurchaseStore:
+    """Receipt lines of every location in one SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+        if self._meta('schema') != str(SCHEMA_VERSION):
+            with self.connection:
+                self.connection.execute('DELETE FROM purchases')
+                self.connection.execute('DELETE FROM meta')
+                self._set_meta('schema', SCHEMA_VERSION)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _meta(self, key):
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    @staticmethod
+    def _row_key(columns, i):
+        return json.dumps(columns.row_key(i))
+
+    # Sync
+
+    def sync(self, columns):
+        """Bring the table up to date with ``PurchaseColumns``; returns the rows inserted."""
+        n = int(self._meta('row_count') or 0)
+        m = len(columns)
+        head, tail = self._meta('head'), self._meta('tail')
+        with self.connection:
+            if n and m >= n and self._row_key(columns, 0) == head and self._row_key(columns, n - 1) == tail:
+                inserted = self._insert(columns, n, m)
+            elif n and m >= n and self._row_key(columns, m - n) == head and self._row_key(columns, m - 1) == tail:
+                # New receipts entered at the top push every existing row down
+                self.connection.execute('UPDATE purchases SET row = row + ?', (m - n,))
+                inserted = self._insert(columns, 0, m - n)
+            else:
+                self.connection.execute('DELETE FROM purchases')
+                self.connection.execute('DELETE FROM versions')
+                instrument.count('purchase_store.rebuilds')
+                inserted = self._insert(columns, 0, m)
+            self._set_meta('row_count', m)
+            self._set_meta('head', self._row_key(columns, 0) if m else '')
+            self._set_meta('tail', self._row_key(columns, m - 1) if m else '')
+        return inserted
+
+    def _insert(self, columns, start, stop):
+        rows = []
+        locations = [location for location in columns.locations if isinstance(location, str) and location]
+        for i in columns.valid_rows(locations, start, stop):
+            seconds = columns.date[i]
+            item = str(columns.item[i])
+            rows.append((columns.row[i], None if seconds == NO_DATE else seconds, columns.location_at(i),
+                         item, item.lower(), columns.qty_at(i), columns.unit_at(i), columns.price[i]))
+        self.connection.executemany('INSERT INTO purchases (row, date, location, item, item_key, qty, unit, price) '
+                                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        for location in {row[2] for row in rows}:
+            self.connection.execute('INSERT OR REPLACE INTO versions (location, token) VALUES (?, ?)',
+                                    (location, uuid.uuid4().hex))
+        instrument.count('purchase_store.rows_inserted', len(rows))
+        return len(rows)
+
+    # Queries
+
+    def _select(self, where, params, order='row', limit=None):
+        sql = f'SELECT {_COLUMNS} FROM purchases WHERE {where} ORDER BY {order}'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        instrument.count('purchase_store.queries')
+        return [_record(row) for row in self.connection.execute(sql, params)]
+
+    def locations(self):
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT location FROM purchases ORDER BY location')]
+
+    def versions(self):
+        return dict(self.connection.execute('SELECT location, token FROM versions'))
+
+    def count(self, store=None):
+        if store is None:
+            return self.connection.execute('SELECT COUNT(*) FROM purchases').fetchone()[0]
+        return self.connection.execute('SELECT COUNT(*) FROM purchases WHERE location = ?', (store,)).fetchone()[0]
+
+    def item_keys(self, store):
+        """Item keys at ``store`` in the order they first appear in the sheet."""
+        return [row[0] for row in self.connection.execute(
+            'SELECT item_key FROM purchases WHERE location = ? GROUP BY item_key ORDER BY MIN(row)', (store,))]
+
+    def item_purchases(self, store, item_key):
+        """Every purchase of ``item_key`` at ``store``, in sheet order (newest first)."""
+        return self._select('location = ? AND item_key = ?', (store, item_key))
+
+    def latest(self, store, item_key):
+        """The purchase with the most recent date (highest in the sheet on ties), or None."""
+        found = self._select('location = ? AND item_key = ?', (store, item_key),
+                             order='date IS NULL, date DESC, row', limit=1)
+        return found[0] if found else None
+
+    def min_price(self, store, item_key):
+        row = self.connection.execute('SELECT MIN(price) FROM purchases WHERE location = ? AND item_key = ?',
+                                      (store, item_key)).fetchone()
+        return row[0]
+
+    def purchases(self, item=None, store=None, since=None, until=None, min_price=None, max_price=None,
+                  limit=None):
+        """Purchases whose item name contains ``item``, newest first.
+
+        ``since`` / ``until`` are dates, datetimes or 'YYYY-MM-DD' strings
+        (``until`` includes the whole day); ``store`` may be a name or a list.
+        """
+        where, params = [], []
+        if item:
+            where.append("item_key LIKE ? ESCAPE '\\'")
+            escaped = item.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f'%{escaped}%')
+        if store:
+            stores = [store] if isinstance(store, str) else list(store)
+            where.append(f"location IN ({', '.join('?' * len(stores))})")
+            params.extend(stores)
+        if since is not None:
+            where.append('date >= ?')
+            params.append(_seconds(since))
+        if until is not None:
+            where.append('date <= ?')
+            params.append(_seconds(until, end=True))
+        if min_price is not None:
+            where.append('price >= ?')
+            params.append(min_price)
+        if max_price is not None:
+            where.append('price <= ?')
+            params.append(max_price)
+        return self._select(' AND '.join(where) or '1', params, order='date IS NULL, date DESC, row', limit=limit)
+
+    def price_summary(self, item, store=None, since=None, until=None):
+        """``{store: {'count', 'min', 'max', 'mean', 'latest'}}`` for matching purchases."""
+        summary = {}
+        for purchase in self.purchases(item, store, since, until):
+            stats = summary.get(purchase.location)
+            if stats is None:
+                summary[purchase.location] = {'count': 1, 'min': purchase.price, 'max': purchase.price,
+                                              'mean': purchase.price, 'latest': purchase}
+                continue
+            stats['count'] += 1
+            stats['min'] = min(stats['min'], purchase.price)
+            stats['max'] = max(stats['max'], purchase.price)
+            stats['mean'] += (purchase.price - stats['mean']) / stats['count']
+        return summary
+
+    def history(self, stores):
+        """A ``PurchaseHistory``-shaped view of ``stores`` backed by queries."""
+        return StoreHistory(self, stores)
+
+
+class StoreItems(Mapping):
+    """``{item_key: [Purchase, ...]}`` of one store; values are fetched per lookup."""
+
+    def __init__(self, store_db, store, fetch):
+        self._db = store_db
+        self._store = store
+        self._fetch = fetch
+        self._keys = None
+
+    def _item_keys(self):
+        if self._keys is None:
+            self._keys = self._db.item_keys(self._store)
+        return self._keys
+
+    def __getitem__(self, item_key):
+        value = self._fetch(self._store, item_key)
+        if not value:
+            raise KeyError(item_key)
+        return value
+
+    def __iter__(self):
+        return iter(self._item_keys())
+
+    def __len__(self):
+        return len(self._item_keys())
+
+
+class StoreHistory:
+    """``purchase_db``, ``latest``, ``min_price`` and ``versions`` over a ``PurchaseStore``."""
+
+    def __init__(self, store_db, stores):
+        self.stores = list(stores)
+        self.store_db = store_db
+        self.purchase_db = {store: StoreItems(store_db, store, store_db.item_purchases) for store in self.stores}
+        self.latest = {store: StoreItems(store_db, store, store_db.latest) for store in self.stores}
+        self.min_price = {store: StoreItems(store_db, store, store_db.min_price) for store in self.stores}
+        versions = store_db.versions()
+        self.versions = {store: versions.get(store) for store in self.stores}
+        self.row_count = sum(store_db.count(store) for store in self.stores)
+
+
+def store_path(workbook_path):
+    return workbook_path + STORE_SUFFIX
+
+
+def open_store(data, path=None):
+    """The SQLite store next to ``data``'s workbook, synced with its purchases."""
+    store_db = PurchaseStore(path or store_path(data.path))
+    with instrument.phase('purchase_store'):
+        store_db.sync(data.purchases)
+    return store_db
+
+
+def main(argv=None):
+    from grocery.loader import DEFAULT_WORKBOOK, load
+
+    parser = argparse.ArgumentParser(description='Query purchase history from the SQLite store.')
+    parser.add_argument('item', nargs='?', help='text the item name contains')
+    parser.add_argument('--store', action='append', help='location (repeatable; default: all)')
+    parser.add_argument('--since', type=parse_date, help='first date, YYYY-MM-DD')
+    parser.add_argument('--until', type=parse_date, help='last date, YYYY-MM-DD')
+    parser.add_argument('--limit', type=int, default=50, help='purchases to list')
+    parser.add_argument('--workbook', default=DEFAULT_WORKBOOK)
+    parser.add_argument('--db', help=f'database file (default: <workbook>{STORE_SUFFIX})')
+    args = parser.parse_args(argv)
+
+    with open_store(load(args.workbook), args.db) as store_db:
+        print_purchases(store_db, args.item, args.store, args.since, args.until, args.limit)
+
+
+def print_purchases(store_db, item=None, stores=None, since=None, until=None, limit=50):
+    found = store_db.purchases(item, stores, since, until, limit=limit)
+    title = f"PURCHASES MATCHING '{item}'" if item else 'PURCHASES'
+    print("=" * 80)
+    print(title)
+    print("=" * 80)
+    if not found:
+        print("  No purchases match")
+        return
+    for purchase in found:
+        when = purchase.date.date() if purchase.date else 'no date'
+        amount = f"{purchase.qty} {purchase.unit or ''}".strip()
+        qty = f" ({amount})" if purchase.qty is not None else ''
+        print(f"  {when}  {purchase.location:<14} {purchase.item}{qty} - ${purchase.price}")
+    if item:
+        print("\nBy store:")
+        for location, stats in store_db.price_summary(item, stores, since, until).items():
+            print(f"  {location:<14} {stats['count']:>4} purchases  min ${stats['min']:.2f}  "
+                  f"mean ${stats['mean']:.2f}  max ${stats['max']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+"""Multi-week purchase schedule that trades bulk savings against spoilage.
+
+Buying a Costco pack for three weeks of meals is cheaper than three small
+packs, unless the kale goes off after a few days. Given the meals planned for
+each week, ``PurchaseScheduler`` decides per ingredient in which weeks to buy,
+at which store and how many packs, minimizing spend plus a penalty on what
+spoils.
+
+Each ingredient is a small dynamic program over weeks: a purchase in week
+``t`` can cover the demand of weeks ``t..j`` as long as ``j - t`` is within
+the ingredient's shelf life (by the perishability lists, else its
+ingredients.json category, else shelf stable), so the best cost up to week
+``j`` is the best over where its last purchase started. That is O(weeks x shelf life x stores)
+per ingredient, so plans of many months solve instantly. Trip costs couple
+the ingredients; with ``trip_costs`` the scheduler then drops store-weeks
+one at a time (re-solving only the ingredients bought there) while that
+lowers the total.
+
+Quantities are in sheet packages: one unit is the ``Total`` of the recipe's
+row in the ingredients sheet, which is what ``Qt`` is a share of. A store
+selling a pack twice that size has pack size 2 (``pack_sizes``). The
+command line leaves out ``--exclude`` items (olive oil, salt, ... by
+default), as ``shopping-list`` does.
+
+Pack prices are the latest receipts unless ``price_factors`` scales them
+per week, e.g. from ``SeasonalModel.ingredient_factors`` for plans that
+start in another season.
+
+Usage:
+    costs = MealCosts.build(data, history)
+    scheduler = PurchaseScheduler(costs, pack_sizes={'Canned Mackerel': {'Costco': 2}},
+                                  trip_costs={'Costco': 5, 'H-Mart': 5})
+    schedule = scheduler.solve([['A', 'B'], ['C'], ['A', 'E']])
+
+    python -m grocery.scheduler A,B C A,E --trip-cost 5
+    python -m grocery.scheduler A,B C A,E --start 2026-06-01   # seasonal prices
+"""
+
+import argparse
+import math
+
+# Perishability buckets (first matching list wins) and how many weeks a
+# purchase lasts in each
+HIGHLY_PERISHABLE = ['kale', 'parsley', 'dill', 'cucumber', 'berries', 'grapefruit', 'eggplant',
+                     'chicken', 'spinach', 'tomato', 'celery']
+MODERATELY_PERISHABLE = ['ground turkey', 'sweet potato', 'carrots', 'pomegranate', 'apple',
+                         'squash', 'lemon', 'lime', 'egg', 'yogurt', 'feta', 'cheddar']
+SHELF_STABLE = ['canned mackerel', 'pasta', 'tomato sauce', 'tomato paste', 'pearl barley',
+                'panko', 'peanut butter', 'meat stock', 'kimchi', 'frozen peas', 'riced cauliflower',
+                'pistachio', 'grapes', 'sourdough bread', 'lemon juice', 'parmesan', 'vegan cheddar',
+                'red pepper flakes', 'green beans']
+
+SHELF_LIFE_WEEKS = {
+    'highly perishable': 1,     # use within 3-5 days
+    'moderately perishable': 2,  # use within 7-10 days
+    'shelf stable': 8,          # can store 2+ weeks
+}
+# Ingredients not in the lists above go by their ingredients.json category
+FOOD_CATEGORIES = {
+    'vegetable': 'highly perishable',
+    'herb': 'highly perishable',
+    'protein': 'highly perishable',
+    'fruit': 'moderately perishable',
+    'dairy': 'moderately perishable',
+}
+DEFAULT_CATEGORY = 'shelf stable'   # oils, spices, grains, sauces, ...
+
+_EPSILON = 1e-9
+
+
+def perishability(ingredient, food_category=None):
+    """Category name of ``SHELF_LIFE_WEEKS`` for an ingredient.
+
+    ``food_category`` is its ingredients.json ``category``, used when none
+    of the lists match.
+    """
+    ing_lower = ingredient.lower()
+    # Shelf-stable entries are more specific ('tomato paste' vs 'tomato')
+    if any(p in ing_lower for p in SHELF_STABLE):
+        return 'shelf stable'
+    if any(p in ing_lower for p in HIGHLY_PERISHABLE):
+        return 'highly perishable'
+    if any(p in ing_lower for p in MODERATELY_PERISHABLE):
+        return 'moderately perishable'
+    return FOOD_CATEGORIES.get(food_category, DEFAULT_CATEGORY)
+
+
+class Purchase:
+    """One line of the schedule: buy ``packs`` of ``ingredient`` at ``store`` in ``week``."""
+
+    def __init__(self, ingredient, week, store, packs, pack_size, cost, covers, needed):
+        self.ingredient = ingredient
+        self.week = week
+        self.store = store
+        self.packs = packs
+        self.pack_size = pack_size
+        self.cost = cost
+        self.covers = covers      # (first week, last week) of demand this purchase feeds
+        self.needed = needed      # sheet packages actually used
+        self.waste = packs * pack_size - needed
+
+    def __repr__(self):
+        return (f"Purchase({self.ingredient!r}, week={self.week}, store={self.store!r}, "
+                f"packs={self.packs}, cost={self.cost:.2f})")
+
+
+class Schedule:
+    """Purchases of a solved plan with spend, waste and trip totals."""
+
+    def __init__(self, purchases, trip_costs=None):
+        self.purchases = sorted(purchases, key=lambda p: (p.week, p.store or '', p.ingredient))
+        trip_costs = trip_costs or {}
+        self.trips = sorted({(p.week, p.store) for p in self.purchases if p.store})
+        self.spend = sum(p.cost for p in self.purchases)
+        self.waste_cost = sum(p.cost * p.waste / (p.packs * p.pack_size) for p in self.purchases if p.packs)
+        self.trip_cost = sum(trip_costs.get(store, 0.0) for _, store in self.trips)
+        self.total = self.spend + self.trip_cost
+
+    def by_week(self):
+        """``{week: {store: [Purchase, ...]}}``."""
+        weeks = {}
+        for purchase in self.purchases:
+            weeks.setdefault(purchase.week, {}).setdefault(purchase.store, []).append(purchase)
+        return weeks
+
+
+class PurchaseScheduler:
+    """Plans purchases for a list of weekly meal plans from a ``MealCosts``."""
+
+    def __init__(self, meal_costs, shelf_life=None, pack_sizes=None, trip_costs=None,
+                 waste_penalty=0.0, price_factors=None, entries=None):
+        """``shelf_life`` maps ingredient -> weeks (default from ``perishability``),
+        ``pack_sizes`` ingredient -> {store: sheet packages per pack} (default 1),
+        ``waste_penalty`` is charged per dollar of spoiled food on top of its price,
+        ``price_factors[ingredient, store, week]`` multiplies the pack price in that
+        week (weeks past its end use the last one). Spellings of one ingredient
+        ('Egg', 'egg') are planned together under the first one, as in
+        ``consolidate``, by the aliases in ``entries`` (ingredients.json by
+        default), which also give each ingredient's food category."""
+        from grocery.units import UnitConverter
+        if entries is None:
+            from grocery.spend_cube import load_entries
+            entries = load_entries()
+        converter = UnitConverter(entries)
+        self.costs = meal_costs
+        self.shelf_life = shelf_life or {}
+        self.pack_sizes = pack_sizes or {}
+        self.trip_costs = trip_costs or {}
+        self.waste_penalty = waste_penalty
+        self.price_factors = price_factors
+        groups = {}
+        for name in meal_costs.ingredients:
+            lower = str(name).lower().strip()
+            groups.setdefault(converter.aliases.get(lower, lower), []).append(name)
+        self.spellings = {names[0]: names for names in groups.values()}
+        self._first = {name: names[0] for names in groups.values() for name in names}
+        self.food_categories = {names[0]: entries[key].get('category') for key, names in groups.items()
+                                if key in entries}
+
+    def weeks_for(self, ingredient):
+        weeks = self.shelf_life.get(ingredient)
+        return weeks if weeks else SHELF_LIFE_WEEKS[perishability(ingredient, self.food_categories.get(ingredient))]
+
+    def demand(self, weeks):
+        """``{ingredient: [sheet packages needed per week]}`` for a list of weekly plans.
+
+        Raises ValueError for meal codes that are not in ``meal_costs``.
+        """
+        costs = self.costs
+        unknown = sorted({str(code) for plan in weeks for code in plan} - set(map(str, costs.meals)))
+        if unknown:
+            raise ValueError(f"Unknown meals: {', '.join(unknown)}")
+        per_meal = {}
+        for meal, ingredient, fraction in zip(costs.row_meal, costs.row_ingredient, costs.fraction):
+            name = self._first[costs.ingredients[ingredient]]
+            per_meal.setdefault(costs.meals[meal], []).append((name, float(fraction)))
+        demand = {}
+        for t, plan in enumerate(weeks):
+            for code in plan:
+                for ingredient, fraction in per_meal.get(code, ()):
+                    demand.setdefault(ingredient, [0.0] * len(weeks))[t] += fraction
+        return demand
+
+    def _rows(self, ingredient):
+        """Row of ``costs.prices`` per store: the first spelling priced there, else None."""
+        costs = self.costs
+        rows = [costs.ingredients.index(name) for name in self.spellings.get(ingredient, [ingredient])]
+        return rows, [next((i for i in rows if not math.isnan(costs.prices[i, s])), None)
+                      for s in range(len(costs.stores))]
+
+    def offers(self, ingredient):
+        """``[(store, pack price, pack size)]``; the sheet price (store None) if no store has it."""
+        costs = self.costs
+        rows, priced = self._rows(ingredient)
+        sizes = self.pack_sizes.get(ingredient, {})
+        offers = [(store, float(costs.prices[i, s]), sizes.get(store, 1))
+                  for s, (store, i) in enumerate(zip(costs.stores, priced)) if i is not None]
+        if not offers:
+            sheet = [price for i in rows for price in costs.sheet_price[costs.row_ingredient == i]
+                     if not math.isnan(price)]
+            offers = [(None, float(sheet[0]) if sheet else 0.0, 1)]
+        return offers
+
+    def week_factors(self, ingredient):
+        """``{store: [price factor per week]}`` for an ingredient, or None."""
+        if self.price_factors is None:
+            return None
+        rows, priced = self._rows(ingredient)
+        return {store: self.price_factors[rows[0] if i is None else i, s].tolist()
+                for s, (store, i) in enumerate(zip(self.costs.stores, priced))}
+
+    def _best_offer(self, offers, needed, week, closed, factors=None):
+        best = None
+        for store, price, size in offers:
+            if (week, store) in closed:
+                continue
+            if factors and store in factors:
+                price *= factors[store][min(week, len(factors[store]) - 1)]
+            packs = max(1, math.ceil(needed / size - _EPSILON))
+            cost = packs * price
+            objective = cost + self.waste_penalty * price * (packs * size - needed) / size
+            if best is None or objective < best[0]:
+                best = (objective, store, packs, size, cost)
+        return best
+
+    def solve_ingredient(self, ingredient, demand, closed=frozenset()):
+        """Cheapest ``[Purchase]`` covering ``demand`` (sheet packages per week).
+
+        ``closed`` holds ``(week, store)`` pairs that may not be used.
+        """
+        n = len(demand)
+        life = self.weeks_for(ingredient)
+        offers = self.offers(ingredient)
+        factors = self.week_factors(ingredient)
+        best = [0.0] + [math.inf] * n
+        choice = [None] * (n + 1)
+        for j in range(n):
+            if demand[j] <= _EPSILON and best[j] < best[j + 1]:
+                best[j + 1], choice[j + 1] = best[j], None
+            needed = 0.0
+            for t in range(j, max(-1, j - life), -1):
+                needed += demand[t]
+                if demand[t] <= _EPSILON or best[t] == math.inf:
+                    continue  # buy on a week the ingredient is actually used
+                offer = self._best_offer(offers, needed, t, closed, factors)
+                if offer and best[t] + offer[0] < best[j + 1] - _EPSILON:
+                    best[j + 1] = best[t] + offer[0]
+                    choice[j + 1] = (t, needed) + offer[1:]
+        purchases = []
+        j = n
+        while j > 0:
+            if choice[j] is None:
+                if best[j] == math.inf:
+                    return None  # nothing may be bought when it's needed
+                j -= 1
+                continue
+            t, needed, store, packs, size, cost = choice[j]
+            purchases.append(Purchase(ingredient, t, store, packs, size, cost, (t, j - 1), needed))
+            j = t
+        return purchases[::-1]
+
+    def solve(self, weeks):
+        """``Schedule`` for ``weeks``, a list of meal-code lists (one per week)."""
+        demand = self.demand(weeks)
+        closed = set()
+        plans = {name: self.solve_ingredient(name, need, closed) for name, need in demand.items()}
+        schedule = Schedule([p for plan in plans.values() for p in plan], self.trip_costs)
+        if not self.trip_costs:
+            return schedule
+
+        improved = True
+        while improved:
+            improved = False
+            # Try dropping the store-weeks with the least spend first
+            spend = {}
+            for purchase in schedule.purchases:
+                if purchase.store:
+                    key = (purchase.week, purchase.store)
+                    spend[key] = spend.get(key, 0.0) + purchase.cost
+            for trip in sorted(spend, key=spend.get):
+                names = {p.ingredient for p in schedule.purchases if (p.week, p.store) == trip}
+                if not names:
+                    continue  # already emptied by an earlier drop in this pass
+                trial_closed = closed | {trip}
+                trial = dict(plans)
+                for name in names:
+                    trial[name] = self.solve_ingredient(name, demand[name], trial_closed)
+                    if trial[name] is None:
+                        break
+                else:
+                    candidate = Schedule([p for plan in trial.values() for p in plan], self.trip_costs)
+                    if candidate.total < schedule.total - _EPSILON:
+                        closed, plans, schedule = trial_closed, trial, candidate
+                        improved = True
+        return schedule
+
+
+def main(argv=None):
+    from grocery.batch import EXCLUDE_ITEMS
+    from grocery.fuzzy_match import FuzzyMatcher
+    from grocery.history import load_history
+    from grocery.loader import load, parse_date
+    from grocery.meal_costs import MealCosts
+    from grocery.seasonal import load_seasonal
+    from grocery.shopping_list import GROCERY_STORES
+
+    parser = argparse.ArgumentParser(description='Plan when and where to buy for several weeks of meals.')
+    parser.add_argument('weeks', nargs='+', help='comma-separated meal codes, one argument per week')
+    parser.add_argument('--trip-cost', type=float, default=0.0, help='cost per store visit')
+    parser.add_argument('--waste-penalty', type=float, default=0.0,
+                        help='extra cost per dollar of food that spoils')
+    parser.add_argument('--start', type=parse_date,
+                        help='date of week 1 (YYYY-MM-DD); prices follow each item\'s seasonal profile')
+    parser.add_argument('--exclude', nargs='*', default=list(EXCLUDE_ITEMS), help='ingredients already at home')
+    parser.add_argument('--workbook', default='MealCostCalculator.xlsx')
+    args = parser.parse_args(argv)
+
+    weeks = [[code.strip() for code in week.split(',') if code.strip()] for week in args.weeks]
+    data = load(args.workbook)
+    history = load_history(data, GROCERY_STORES)
+    matcher = FuzzyMatcher.from_json(history.purchase_db)
+    costs = MealCosts.build(data, history, matcher, exclude_items=[e.lower() for e in args.exclude])
+    price_factors = None
+    if args.start:
+        price_factors = load_seasonal(data, history).ingredient_factors(costs, matcher, args.start, len(weeks))
+    trip_costs = {store: args.trip_cost for store in GROCERY_STORES} if args.trip_cost else None
+    try:
+        schedule = PurchaseScheduler(costs, trip_costs=trip_costs, waste_penalty=args.waste_penalty,
+                                     price_factors=price_factors).solve(weeks)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("=" * 80)
+    print(f"PURCHASE SCHEDULE ({len(weeks)} weeks)")
+    print("=" * 80)
+    for week, stores in sorted(schedule.by_week().items()):
+        print(f"\nWeek {week + 1} [Meals {', '.join(weeks[week]) or '-'}]")
+        for store, purchases in sorted(stores.items(), key=lambda kv: kv[0] or ''):
+            print(f"  {store or 'Any store (sheet price)'}:")
+            for p in purchases:
+                last = f"-{p.covers[1] + 1}" if p.covers[1] != p.covers[0] else ""
+                print(f"    - {p.ingredient}: {p.packs} x {p.pack_size} pack = ${p.cost:.2f}"
+                      f" (weeks {p.covers[0] + 1}{last}, {p.waste:.2f} left over)")
+    print(f"\nSpend ${schedule.spend:.2f} (${schedule.waste_cost:.2f} spoils)"
+          f" + {len(schedule.trips)} trips ${schedule.trip_cost:.2f} = ${schedule.total:.2f}")
+
+
+if __name__ == '__main__':
+    main()
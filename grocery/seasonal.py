@@ -0,0 +1,258 @@
+"""Seasonal price profiles per (store, item), fitted in one pass over history.
+
+Prices are always taken from the most recent receipt, so planning meals for
+next spring uses whatever tomatoes cost in December. ``SeasonalModel`` fits a
+week-of-year price index for every item bought at every store at once:
+
+- receipt prices are grouped by (store, item, week of year) and each
+  week's median is divided by the item's overall median price;
+- the weekly indexes are smoothed around the year with a circular Gaussian
+  kernel weighted by how many purchases each week has, and shrunk towards
+  1 (no seasonality) where there are few purchases (``PRIOR_WEIGHT``);
+- ``factor(store, item_key, when)`` is then the index at ``when`` over the
+  index at the item's latest purchase, so the latest price times the factor
+  is the expected price at that date. Both are array lookups.
+
+Items with a single purchase get a flat profile (factor 1).
+
+The fitted model is kept in a ``MealCostCalculator.xlsx.seasonal`` sidecar
+and refitted only when a store's purchase history changes
+(``PurchaseHistory.versions``).
+
+Usage:
+    model = load_seasonal(data, history)
+    model.factor('Costco', 'vine tomato', date(2026, 6, 1))   # e.g. 0.85
+    model.forecast('Costco', 'vine tomato', date(2026, 6, 1))  # latest price x factor
+
+    StoreAssigner(history.purchase_db, latest=history.latest, seasonal=model, on=date(2026, 6, 1))
+    PurchaseScheduler(costs, price_factors=model.ingredient_factors(costs, matcher, start, len(weeks)))
+
+    python -m grocery.seasonal Costco "vine tomato" --on 2026-06-01
+    python -m grocery shopping-list --on 2026-06-01
+"""
+
+import argparse
+import os
+import pickle
+from datetime import date, timedelta
+
+import numpy as np
+
+from grocery.loader import NO_DATE, parse_date
+
+SEASONAL_SUFFIX = '.seasonal'
+SEASONAL_VERSION = 1
+
+WEEKS = 52
+BANDWIDTH_WEEKS = 3.0
+PRIOR_WEIGHT = 2.0    # purchases' worth of pull towards a flat profile
+
+
+def week_of_year(when):
+    """0..51 for a ``date``/``datetime`` (the last day or two fold into week 51)."""
+    return min((when.timetuple().tm_yday - 1) // 7, WEEKS - 1)
+
+
+def _weeks(seconds):
+    days = np.asarray(seconds, dtype='datetime64[s]').astype('datetime64[D]')
+    day_of_year = (days - days.astype('datetime64[Y]').astype('datetime64[D]')).astype(np.int64)
+    return np.minimum(day_of_year // 7, WEEKS - 1)
+
+
+def _kernel(bandwidth=BANDWIDTH_WEEKS):
+    """``(WEEKS, WEEKS)`` circular Gaussian weights."""
+    offset = np.abs(np.arange(WEEKS)[:, None] - np.arange(WEEKS)[None, :])
+    distance = np.minimum(offset, WEEKS - offset)
+    return np.exp(-0.5 * (distance / bandwidth) ** 2)
+
+
+def _segment_medians(values, starts, ends):
+    """Median of each ``values[start:end]`` slice of an array sorted within slices."""
+    lengths = ends - starts
+    return (values[starts + (lengths - 1) // 2] + values[starts + lengths // 2]) / 2
+
+
+class SeasonalModel:
+    """Week-of-year price index for every (store, item key)."""
+
+    def __init__(self, keys, index, latest_price, latest_week, purchases, context=None):
+        self.keys = list(keys)
+        self.index = index                  # (items, WEEKS) price / typical price
+        self.latest_price = latest_price    # most recent purchase price per item
+        self.latest_week = latest_week      # its week of year
+        self.purchases = purchases          # dated purchases per item
+        self.context = context
+        self._rows = {key: g for g, key in enumerate(self.keys)}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_rows']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._rows = {key: g for g, key in enumerate(self.keys)}
+
+    @classmethod
+    def fit(cls, columns, stores, bandwidth=BANDWIDTH_WEEKS, prior_weight=PRIOR_WEIGHT, context=None):
+        """Fit every item at ``stores`` in ``PurchaseColumns`` in one batched pass."""
+        rows = np.asarray([i for i in columns.valid_rows(stores) if columns.date[i] != NO_DATE], dtype=np.intp)
+        ids = {}
+        groups = np.array([ids.setdefault((columns.location_at(i), str(columns.item[i]).lower()), len(ids))
+                           for i in rows], dtype=np.int64)
+        n = len(ids)
+        index = np.ones((n, WEEKS))
+        if not n:
+            return cls([], index, np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), context)
+        seconds = np.asarray(columns.date, dtype=np.int64)[rows]
+        prices = np.asarray(columns.price, dtype=float)[rows]
+        weeks = _weeks(seconds)
+
+        # Typical price per item and each item's latest purchase (ties: row nearer the top)
+        order = np.lexsort((prices, groups))
+        starts = np.flatnonzero(np.r_[True, groups[order][1:] != groups[order][:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        level = _segment_medians(prices[order], starts, ends)
+        purchases = ends - starts
+        order = np.lexsort((-rows, seconds, groups))
+        last = np.flatnonzero(np.r_[groups[order][1:] != groups[order][:-1], True])
+        latest_price = prices[order][last]
+        latest_week = weeks[order][last]
+
+        # Median per (item, week), as a share of the item's typical price
+        order = np.lexsort((prices, weeks, groups))
+        g_sorted, w_sorted = groups[order], weeks[order]
+        starts = np.flatnonzero(np.r_[True, (g_sorted[1:] != g_sorted[:-1]) | (w_sorted[1:] != w_sorted[:-1])])
+        ends = np.r_[starts[1:], len(order)]
+        cell_group, cell_week = g_sorted[starts], w_sorted[starts]
+        ratio = np.zeros((n, WEEKS))
+        weight = np.zeros((n, WEEKS))
+        ratio[cell_group, cell_week] = _segment_medians(prices[order], starts, ends) / level[cell_group]
+        weight[cell_group, cell_week] = ends - starts
+
+        kernel = _kernel(bandwidth)
+        smoothed = (weight * ratio) @ kernel + prior_weight
+        smoothed /= weight @ kernel + prior_weight
+        index = np.where(purchases[:, None] > 1, smoothed, 1.0)
+        return cls(ids, index, latest_price, latest_week, purchases, context)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def row(self, store, item_key):
+        return self._rows.get((store, item_key))
+
+    def factor(self, store, item_key, when):
+        """Expected price at ``when`` relative to the latest price (1.0 if unknown)."""
+        g = self._rows.get((store, item_key))
+        if g is None or when is None:
+            return 1.0
+        return float(self.index[g, week_of_year(when)] / self.index[g, self.latest_week[g]])
+
+    def forecast(self, store, item_key, when):
+        """Latest price scaled to ``when``, or None for an item never bought at ``store``."""
+        g = self._rows.get((store, item_key))
+        if g is None:
+            return None
+        return float(self.latest_price[g]) * self.factor(store, item_key, when)
+
+    def monthly(self, store, item_key):
+        """Mean index per calendar month (12 values), or None."""
+        g = self._rows.get((store, item_key))
+        if g is None:
+            return None
+        month_of_week = np.array([(date(2025, 1, 1) + timedelta(days=7 * w + 3)).month - 1 for w in range(WEEKS)])
+        return (np.bincount(month_of_week, self.index[g], 12) / np.bincount(month_of_week, minlength=12)).tolist()
+
+    def ingredient_factors(self, meal_costs, matcher, start, weeks):
+        """``(ingredients, stores, weeks)`` price factors for ``PurchaseScheduler``.
+
+        Week ``t`` is priced at ``start + 7t`` days, for the item ``matcher``
+        matches each of ``meal_costs``' ingredients to at each store.
+        """
+        factors = np.ones((len(meal_costs.ingredients), len(meal_costs.stores), weeks))
+        week_index = np.array([week_of_year(start + timedelta(days=7 * t)) for t in range(weeks)], dtype=np.intp)
+        for i, name in enumerate(meal_costs.ingredients):
+            for s, store in enumerate(meal_costs.stores):
+                g = self._rows.get((store, matcher.best(name, store)))
+                if g is not None:
+                    factors[i, s] = self.index[g, week_index] / self.index[g, self.latest_week[g]]
+        return factors
+
+
+def seasonal_path(workbook_path):
+    return workbook_path + SEASONAL_SUFFIX
+
+
+def load_seasonal(data, history, use_cache=True):
+    """Model for ``history``'s stores, refitted only if their purchases changed."""
+    context = (tuple(history.stores), tuple(history.versions.get(store) for store in history.stores),
+               BANDWIDTH_WEEKS, PRIOR_WEIGHT)
+    path = seasonal_path(data.path)
+    if use_cache:
+        model = _read_seasonal(path)
+        if model is not None and model.context == context:
+            return model
+    model = SeasonalModel.fit(data.purchases, history.stores, context=context)
+    if use_cache:
+        _write_seasonal(path, model)
+    return model
+
+
+def _read_seasonal(path):
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(payload, dict) or payload.get('version') != SEASONAL_VERSION:
+        return None
+    return payload['model']
+
+
+def _write_seasonal(path, model):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': SEASONAL_VERSION, 'model': model}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def main(argv=None):
+    from grocery.history import load_history
+    from grocery.loader import DEFAULT_WORKBOOK, load
+    from grocery.shopping_list import GROCERY_STORES
+
+    parser = argparse.ArgumentParser(description='Seasonal price profile of one item at one store.')
+    parser.add_argument('store')
+    parser.add_argument('item', help='item key (lowercased receipt item name)')
+    parser.add_argument('--on', type=parse_date, help='also forecast the price on this date (YYYY-MM-DD)')
+    parser.add_argument('--workbook', default=DEFAULT_WORKBOOK)
+    args = parser.parse_args(argv)
+
+    data = load(args.workbook)
+    history = load_history(data, GROCERY_STORES)
+    model = load_seasonal(data, history)
+    item_key = args.item.lower()
+    g = model.row(args.store, item_key)
+    if g is None:
+        print(f"No dated purchases of '{args.item}' at {args.store}")
+        return
+    print("=" * 80)
+    print(f"SEASONAL PRICE: {item_key} at {args.store} ({model.purchases[g]} purchases, "
+          f"latest ${model.latest_price[g]:.2f} in week {model.latest_week[g] + 1})")
+    print("=" * 80)
+    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    for month, value in zip(months, model.monthly(args.store, item_key)):
+        price = model.latest_price[g] * value / model.index[g, model.latest_week[g]]
+        print(f"  {month}  {value:5.2f} x typical  ~${price:.2f}")
+    if args.on:
+        print(f"\n{args.on}: ${model.forecast(args.store, item_key, args.on):.2f} "
+              f"(x{model.factor(args.store, item_key, args.on):.2f} of the latest price)")
+    print(f"\n({len(model)} store items modelled)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""Local planning service that keeps the workbook, history and indexes warm.
+
+Every ``revised_no_walmart.py`` or ``grocery.batch`` run reloads the
+workbook and rebuilds ``purchase_db`` and the match index before it prices
+anything. ``python -m grocery.service`` does that once, answers JSON
+requests from memory, and polls the workbook for changes. After a change it
+reloads in a worker thread through the sidecar cache and the incremental
+history update. Requests keep being served from the old state until the new
+one is swapped in.
+
+Endpoints (``Access-Control-Allow-Origin`` is the dashboard's origin,
+``--allow-origin``, so only it can call them from a browser):
+
+    GET  /health        workbook, row counts and when the state was loaded
+    GET  /meals         meal codes and names
+    POST /plan          {"meals": ["A", "B"], "trip_cost": 5, "exclude": [...]}
+                        -> grocery.batch.price_plan result
+    POST /assign        {"ingredients": ["Kale", ...]} or {"meals": [...]}
+                        -> {ingredient: {"store", "price", "item"}}
+    POST /reload        reload now instead of waiting for the next poll
+
+Only the standard library is used (``asyncio.start_server`` and a minimal
+HTTP/1.1 parser with keep-alive), and it binds to localhost by default.
+
+Usage:
+    python -m grocery.service --port 8765 --allow-origin http://localhost:8000
+    curl -d '{"meals": ["A", "B"], "trip_cost": 5}' localhost:8765/plan
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+from grocery.batch import EXCLUDE_ITEMS, build_tables, price_plan
+from grocery.history import load_history
+from grocery.loader import DEFAULT_WORKBOOK, load
+from grocery.shopping_list import GROCERY_STORES
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Where the dashboard is served from (python3 -m http.server 8000)
+DEFAULT_ORIGIN = 'http://localhost:8000'
+POLL_SECONDS = 2.0
+MAX_BODY = 1 << 20
+
+_REASONS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def workbook_stamp(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class PlanningState:
+    """One loaded snapshot: workbook, history and every ingredient assigned.
+
+    Tables are built without excluded items, so each request can choose its
+    own ``exclude`` list by filtering rows.
+    """
+
+    def __init__(self, path, stores=GROCERY_STORES, previous=None):
+        start = time.perf_counter()
+        self.path = path
+        self.stores = list(stores)
+        self.stamp = workbook_stamp(path)
+        self.data = load(path)
+        self.history = load_history(self.data, self.stores)
+        self.tables = build_tables(self.data, exclude_items=(), stores=self.stores, history=self.history)
+        self.meal_names = {ing['code']: ing['meal'] for ing in self.tables['ingredients']}
+        self.loaded_at = datetime.now().replace(microsecond=0)
+        self.load_seconds = time.perf_counter() - start
+        self.generation = previous.generation + 1 if previous else 1
+
+    def rows(self, meals=None, exclude=EXCLUDE_ITEMS):
+        exclude = [e.lower() for e in exclude]
+        meals = set(meals) if meals is not None else None
+        return [ing for ing in self.tables['ingredients']
+                if (meals is None or ing['code'] in meals)
+                and not any(e in ing['ingredient'].lower() for e in exclude)]
+
+    def plan(self, meals, trip_cost=None, exclude=EXCLUDE_ITEMS):
+        unknown = sorted(set(meals) - set(self.meal_names))
+        if unknown:
+            raise HTTPError(400, f"Unknown meals: {', '.join(unknown)}")
+        trip_costs = {store: trip_cost for store in self.stores} if trip_cost is not None else None
+        tables = dict(self.tables, ingredients=self.rows(meals, exclude), trip_costs=trip_costs)
+        return price_plan('+'.join(meals), meals, tables)
+
+    def assign(self, ingredients=None, meals=None, exclude=EXCLUDE_ITEMS):
+        if ingredients is None:
+            ingredients = list(dict.fromkeys(ing['ingredient'] for ing in self.rows(meals, exclude)))
+        assignments = self.tables['assignments']
+        return {name: assignments.get(name, {'store': 'Unknown', 'price': 0, 'item': 'Not a recipe ingredient'})
+                for name in ingredients}
+
+    def health(self):
+        return {
+            'workbook': os.path.abspath(self.path),
+            'generation': self.generation,
+            'loaded_at': self.loaded_at.isoformat(),
+            'load_seconds': round(self.load_seconds, 3),
+            'purchase_rows': len(self.data.purchases),
+            'history_rows': self.history.row_count,
+            'ingredients': len(self.tables['prices']),
+            'meals': len(self.meal_names),
+            'stores': self.stores
+        }
+
+
+class PlanningService:
+    """Routes requests to the current ``PlanningState`` and reloads it on change."""
+
+    def __init__(self, path=DEFAULT_WORKBOOK, stores=GROCERY_STORES, poll_seconds=POLL_SECONDS,
+                 allow_origin=DEFAULT_ORIGIN):
+        self.path = path
+        self.stores = list(stores)
+        self.poll_seconds = poll_seconds
+        self.allow_origin = allow_origin
+        self.state = None
+        self._reload_lock = None
+
+    async def start(self):
+        self._reload_lock = asyncio.Lock()
+        await self.reload(force=True)
+
+    async def reload(self, force=False):
+        """Load a new state in a thread if the workbook changed; returns whether it did."""
+        async with self._reload_lock:
+            if not force and self.state and workbook_stamp(self.path) == self.state.stamp:
+                return False
+            self.state = await asyncio.to_thread(PlanningState, self.path, self.stores, self.state)
+            print(f"Loaded {self.path} (generation {self.state.generation}, "
+                  f"{self.state.load_seconds:.2f}s)", flush=True)
+            return True
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.reload()
+            except Exception as e:
+                # Half-saved workbook or similar: keep serving and retry next poll
+                print(f"Reload failed, keeping generation {self.state.generation}: {e}", flush=True)
+
+    async def handle(self, method, path, body):
+        """``(status, payload)`` for one request."""
+        state = self.state
+        if method == 'GET' and path == '/health':
+            return 200, state.health()
+        if method == 'GET' and path == '/meals':
+            return 200, state.meal_names
+        if method == 'POST' and path == '/reload':
+            return 200, {'reloaded': await self.reload(force=True), 'generation': self.state.generation}
+        if method == 'POST' and path in ('/plan', '/assign'):
+            request = _json_body(body)
+            exclude = _string_list(request, 'exclude', EXCLUDE_ITEMS)
+            if path == '/plan':
+                meals = _string_list(request, 'meals')
+                if not meals:
+                    raise HTTPError(400, "'meals' must be a non-empty list of meal codes")
+                return 200, state.plan(meals, _number(request, 'trip_cost'), exclude)
+            return 200, state.assign(_string_list(request, 'ingredients'), _string_list(request, 'meals'), exclude)
+        if path in ('/health', '/meals', '/reload', '/plan', '/assign'):
+            raise HTTPError(405, f"{method} not allowed on {path}")
+        raise HTTPError(404, f"No endpoint {path}")
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start = time.perf_counter()
+                if method == 'OPTIONS':
+                    status, payload = 204, None
+                else:
+                    try:
+                        status, payload = await self.handle(method, path, body)
+                    except HTTPError as e:
+                        status, payload = e.status, {'error': str(e)}
+                    except Exception as e:
+                        status, payload = 500, {'error': f'{type(e).__name__}: {e}'}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(_response(status, payload, self.allow_origin, keep_alive,
+                                       time.perf_counter() - start))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            writer.write(_response(e.status, {'error': str(e)}, self.allow_origin, False))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        await self.start()
+        server = await asyncio.start_server(self.serve_client, host, port)
+        watcher = asyncio.create_task(self.watch())
+        print(f"Serving on http://{host}:{port}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def _json_body(body):
+    if not body:
+        return {}
+    try:
+        request = json.loads(body)
+    except ValueError as e:
+        raise HTTPError(400, f"Invalid JSON: {e}")
+    if not isinstance(request, dict):
+        raise HTTPError(400, 'Expected a JSON object')
+    return request
+
+
+def _string_list(request, key, default=None):
+    """``request[key]``, which must be a list of strings if present."""
+    value = request.get(key, default)
+    if value is not default and (not isinstance(value, list) or not all(isinstance(v, str) for v in value)):
+        raise HTTPError(400, f"'{key}' must be a list of strings")
+    return value
+
+
+def _number(request, key):
+    """``request[key]``, which must be a finite number if present."""
+    value = request.get(key)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))
+                              or not math.isfinite(value)):
+        raise HTTPError(400, f"'{key}' must be a number")
+    return value
+
+
+async def _read_request(reader):
+    """``(method, path, headers, body)``, or None when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, 'Malformed request line')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = headers.get('content-length') or '0'
+    if not length.isdecimal():
+        raise HTTPError(400, f'Invalid Content-Length: {length}')
+    length = int(length)
+    if length > MAX_BODY:
+        raise HTTPError(413, 'Request body too large')
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target.split('?', 1)[0], headers, body
+
+
+def _response(status, payload, origin=DEFAULT_ORIGIN, keep_alive=True, seconds=None):
+    body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+    headers = [
+        f'HTTP/1.1 {status} {_REASONS.get(status, "")}',
+        'Content-Type: application/json',
+        f'Content-Length: {len(body)}',
+        f'Access-Control-Allow-Origin: {origin}',
+        'Access-Control-Allow-Methods: GET, POST, OPTIONS',
+        'Access-Control-Allow-Headers: Content-Type',
+        f'Connection: {"keep-alive" if keep_alive else "close"}',
+    ]
+    if seconds is not None:
+        headers.append(f'Server-Timing: app;dur={seconds * 1000:.2f}')
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve shopping-list and plan pricing from warm indexes.')
+    parser.add_argument('--workbook', default=DEFAULT_WORKBOOK)
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS, help='seconds between workbook change checks')
+    parser.add_argument('--allow-origin', default=DEFAULT_ORIGIN,
+                        help='origin the dashboard is served from (CORS); "*" allows any page')
+    args = parser.parse_args(argv)
+
+    service = PlanningService(args.workbook, poll_seconds=args.poll, allow_origin=args.allow_origin)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
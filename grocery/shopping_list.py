@@ -0,0 +1,258 @@
+"""Rule-based store assignment behind revised_no_walmart.py.
+
+Each ingredient goes through a fixed priority cascade: eggs -> Costco, the
+manual store lists, meat -> Costco then Safeway, produce -> H-Mart then
+Costco, and finally the cheapest store with a matching purchase. Which
+purchases match is decided by ``grocery.fuzzy_match``. The rules live here so
+the script, the batch planner and anything else can share them.
+
+Usage:
+    ingredients_needed = read_ingredients(data, exclude_items)
+    assigner = StoreAssigner(history.purchase_db, match_cache, latest=history.latest)
+    assignments = assigner.assign_all(ingredients_needed)
+    by_store, store_totals = group_by_store(ingredients_needed, assignments)
+
+    # Priced for a future trip from seasonal profiles
+    assigner = StoreAssigner(history.purchase_db, match_cache, latest=history.latest,
+                             seasonal=load_seasonal(data, history), on=date(2026, 6, 1))
+"""
+
+from collections import defaultdict
+
+from grocery.fuzzy_match import FuzzyMatcher
+from grocery.price_series import PriceSeries
+
+# Target stores (Walmart added per user request)
+GROCERY_STORES = ['Costco', 'Safeway', 'H-Mart', 'Walmart']
+
+# Categorize ingredients
+MEAT_ITEMS = ['chicken', 'ground turkey', 'turkey']
+PRODUCE_ITEMS = ['kale', 'cucumber', 'dill', 'eggplant', 'tomato', 'carrot', 'celery',
+                 'berries', 'apple', 'grapefruit', 'grape', 'lime', 'lemon', 'parsley',
+                 'sweet potato', 'squash', 'spinach', 'pomegranate']
+
+# Manual store assignments (user preferences)
+MANUAL_COSTCO_ITEMS = ['blueberries', 'berries', 'brami', 'pasta', 'roma tomato', 'tomato',
+                       'tomato sauce', 'tomato paste', 'green beans', 'peanut butter', 'avocado',
+                       'sweet potato']
+MANUAL_HMART_ITEMS = ['purple potato']
+MANUAL_SAFEWAY_ITEMS = ['frozen peas', 'peas and carrots']
+MANUAL_WALMART_ITEMS = ['lemon juice']
+
+# How far below the best match score an item can be and still win on price
+CHEAPEST_MARGIN = 0.1
+
+MANUAL_ASSIGNMENTS = [
+    ('Costco', MANUAL_COSTCO_ITEMS),
+    ('H-Mart', MANUAL_HMART_ITEMS),
+    ('Safeway', MANUAL_SAFEWAY_ITEMS),
+    ('Walmart', MANUAL_WALMART_ITEMS),
+]
+
+
+def read_ingredients(data, exclude_items=(), meals=None):
+    """Recipe rows from the ``ingredients`` sheet, minus items already at home.
+
+    ``meals`` optionally restricts the rows to those meal codes.
+    """
+    ingredients_needed = []
+    for row in data.rows('ingredients', min_row=2):
+        if row[0] and row[2]:
+            if meals is not None and row[0] not in meals:
+                continue
+            ingredient_name = row[2].lower() if row[2] else ''
+            skip = any(excl in ingredient_name for excl in exclude_items)
+            if not skip:
+                ingredients_needed.append({
+                    'code': row[0],
+                    'meal': row[1],
+                    'ingredient': row[2],
+                    'qty_needed': row[3],
+                    'unit': row[4],
+                    'total_qty': row[5],
+                    'cost_total': row[6]
+                })
+    return ingredients_needed
+
+
+def is_egg(ing_lower):
+    # Eggs always come from Costco (but eggplant doesn't)
+    return ing_lower == 'egg' or (ing_lower.startswith('egg') and 'plant' not in ing_lower)
+
+
+class StoreAssigner:
+    """Applies the priority cascade to ingredients against one ``purchase_db``.
+
+    Item names are matched with a ``FuzzyMatcher`` (built on the first cache
+    miss unless one is passed in); with ``match_cache`` given, remembered
+    matches are reused. Prices are from the most recent purchase by date,
+    ``latest`` (``PurchaseHistory.latest``) or else read from a
+    ``PriceSeries`` over ``purchase_db``. With a ``SeasonalModel`` and a date ``on``, prices
+    are the latest receipt scaled to that date; matching still compares
+    latest prices, so cached matches stay valid for any date.
+    """
+
+    def __init__(self, purchase_db, match_cache=None, stores=GROCERY_STORES,
+                 meat_items=MEAT_ITEMS, produce_items=PRODUCE_ITEMS,
+                 manual_assignments=MANUAL_ASSIGNMENTS, matcher=None, seasonal=None, on=None, latest=None):
+        self.purchase_db = purchase_db
+        self._latest = latest
+        self.match_cache = match_cache
+        self.stores = stores
+        self.meat_items = meat_items
+        self.produce_items = produce_items
+        self.manual_assignments = manual_assignments
+        self._matcher = matcher
+        self.seasonal = seasonal
+        self.on = on
+        self._matchers = {
+            'egg': self._match_best,
+            'manual': self._match_best,
+            'meat': self._match_best,
+            'produce': self._match_best,
+            'cheapest': self._match_cheapest,
+        }
+
+    @property
+    def context(self):
+        """The rules a cached match depends on (see ``MatchCache.bind``)."""
+        return {'meat': self.meat_items, 'produce': self.produce_items, 'manual': self.manual_assignments,
+                'cheapest_margin': CHEAPEST_MARGIN, 'matcher': self.matcher.context}
+
+    @property
+    def latest(self):
+        if self._latest is None:
+            self._latest = PriceSeries.from_purchase_db(self.purchase_db).latest_purchases(self.purchase_db)
+        return self._latest
+
+    @property
+    def matcher(self):
+        if self._matcher is None:
+            self._matcher = FuzzyMatcher.from_json(self.purchase_db)
+        return self._matcher
+
+    def _match_best(self, ing_lower, store):
+        return self.matcher.best(ing_lower, store)
+
+    def _match_cheapest(self, ing_lower, store):
+        # Cheapest of the items that match about as well as the best one
+        best_key = None
+        best_price = float('inf')
+        candidates = self.matcher.candidates(ing_lower, store)
+        for score, item_key in candidates:
+            if score < candidates[0][0] - CHEAPEST_MARGIN:
+                break
+            latest = self.latest[store].get(item_key)
+            if latest is not None and latest.price < best_price:
+                best_price = latest.price
+                best_key = item_key
+        return best_key
+
+    def match(self, rule, ing_lower, store):
+        """Item key at ``store`` for ``ing_lower`` under ``rule``, or None."""
+        if self.match_cache is None:
+            return self._matchers[rule](ing_lower, store)
+        return self.match_cache.lookup(rule, ing_lower, store,
+                                       lambda: self._matchers[rule](ing_lower, store))
+
+    def price(self, store, item_key):
+        """Latest price of ``item_key`` at ``store``, seasonally adjusted to ``on``."""
+        price = self.latest[store][item_key].price
+        if self.seasonal is None or self.on is None:
+            return price
+        return price * self.seasonal.factor(store, item_key, self.on)
+
+    def from_history(self, store, item_key):
+        return {
+            'store': store,
+            'price': self.price(store, item_key),
+            'item': self.latest[store][item_key].item
+        }
+
+    @staticmethod
+    def not_in_history(store):
+        return {
+            'store': store,
+            'price': 0,
+            'item': f'To be purchased at {store} (not in history)'
+        }
+
+    def forced_store(self, ing_name):
+        """Store the rules pin an ingredient to (eggs, manual lists), or None."""
+        ing_lower = ing_name.lower()
+        if is_egg(ing_lower):
+            return 'Costco'
+        return next((store for store, manual_items in self.manual_assignments
+                     if any(item in ing_lower for item in manual_items)), None)
+
+    def assign(self, ing_name):
+        """``{'store', 'price', 'item'}`` for one ingredient."""
+        ing_lower = ing_name.lower()
+
+        # Force Costco for eggs
+        if is_egg(ing_lower):
+            item_key = self.match('egg', ing_lower, 'Costco')
+            return self.from_history('Costco', item_key) if item_key else self.not_in_history('Costco')
+
+        # Check manual store assignments (Costco, H-Mart, Safeway, Walmart)
+        forced_store = self.forced_store(ing_name)
+        if forced_store:
+            # Item not in history is still assigned to the store with $0 price
+            item_key = self.match('manual', ing_lower, forced_store)
+            return self.from_history(forced_store, item_key) if item_key else self.not_in_history(forced_store)
+
+        # Check if it's meat -> prioritize Costco, then Safeway
+        if any(meat in ing_lower for meat in self.meat_items):
+            for store in ['Costco', 'Safeway']:
+                item_key = self.match('meat', ing_lower, store)
+                if item_key:
+                    return self.from_history(store, item_key)
+
+        # Check if it's produce -> prioritize H-Mart, then Costco
+        elif any(prod in ing_lower for prod in self.produce_items):
+            for store in ['H-Mart', 'Costco']:
+                item_key = self.match('produce', ing_lower, store)
+                if item_key:
+                    return self.from_history(store, item_key)
+
+        # For everything else, find best price among remaining stores
+        best = None
+        for store in self.stores:
+            item_key = self.match('cheapest', ing_lower, store)
+            if item_key:
+                candidate = self.from_history(store, item_key)
+                if best is None or candidate['price'] < best['price']:
+                    best = candidate
+        if best:
+            return best
+        return {
+            'store': 'Unknown',
+            'price': 0,
+            'item': 'Not found in history'
+        }
+
+    def assign_all(self, ingredients_needed):
+        """``{ingredient name: assignment}`` for every recipe row's ingredient."""
+        assignments = {}
+        for ing in ingredients_needed:
+            if ing['ingredient'] not in assignments:
+                assignments[ing['ingredient']] = self.assign(ing['ingredient'])
+        return assignments
+
+
+def group_by_store(ingredients_needed, assignments):
+    """Recipe rows grouped by assigned store, plus per-store totals."""
+    by_store = defaultdict(list)
+    store_totals = defaultdict(float)
+    for ing in ingredients_needed:
+        assignment = assignments.get(ing['ingredient'], {'store': 'Unknown', 'price': 0})
+        by_store[assignment['store']].append({
+            'ingredient': ing['ingredient'],
+            'qty': ing['qty_needed'],
+            'unit': ing['unit'],
+            'price': assignment['price'],
+            'meal': ing['code'],
+            'item': assignment.get('item', '')
+        })
+        store_totals[assignment['store']] += assignment['price']
+    return by_store, store_totals
@@ -0,0 +1,352 @@
+"""Pre-aggregated spend cube: store x month x ingredient category.
+
+Budget reports and the dashboard's ``totalsByStore`` walk every receipt line
+each time. ``SpendCube`` sums spend, receipt lines and grams into
+``(store, month, category)`` cells once, so a report reads a few hundred
+cells instead of thousands of rows. At the grocery stores
+(``GROCERY_LOCATIONS``), categories are the ``category`` of the
+ingredients.json entry an item is a product of (``FuzzyMatcher.classify``, by
+its head noun), or ``uncategorized``; every other location (paychecks,
+utilities, restaurants, Amazon) goes to ``non-grocery``. Grams are counted
+for grocery lines whose unit converts. Most of what stays uncategorized is
+not food (tires, diapers, memberships) or not in ingredients.json, so
+reports print ``coverage()``, the categorized share of grocery spend.
+Totals, the command line and the export cover the grocery stores unless
+asked for every location (``--all-locations``).
+
+The cube is kept in a ``MealCostCalculator.xlsx.cube`` sidecar and updated
+like ``PurchaseHistory``: receipts entered at the top of ItemizedPurchase or
+appended at the bottom are added to their cells, and anything else (or a
+change to ingredients.json categories) rebuilds it. New stores, months or
+categories grow the arrays.
+
+Usage:
+    cube = load_cube(data)
+    cube.totals('store')                       # {store: spend}
+    cube.table('month', 'category')            # (labels, labels, 2-D array)
+    cube.total(store='Costco', month='2025-11')
+
+    python -m grocery.spend_cube --by month category --export
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+from datetime import timedelta
+
+import numpy as np
+
+from grocery import instrument
+from grocery.fuzzy_match import MATCHER_VERSION, FuzzyMatcher, entry_aliases
+from grocery.loader import EPOCH, NO_DATE
+from grocery.units import GRAMS, INGREDIENTS_JSON, UnitConverter
+
+CUBE_SUFFIX = '.cube'
+CUBE_VERSION = 4
+
+AXES = ('store', 'month', 'category')
+MEASURES = ('spend', 'lines', 'grams')
+UNCATEGORIZED = 'uncategorized'
+NON_GROCERY = 'non-grocery'
+# Every grocery store on the ItemizedPurchase sheet (the sheet has the trailing space)
+GROCERY_LOCATIONS = ['Costco', 'Safeway', 'H-Mart', 'King Sooper\'s ', 'Trader Joe\'s',
+                     'Whole Foods', 'Sprouts', 'Walmart', 'Target']
+UNDATED = 'undated'
+
+
+def _month(seconds):
+    if seconds == NO_DATE:
+        return UNDATED
+    return (EPOCH + timedelta(seconds=seconds)).strftime('%Y-%m')
+
+
+def categories_fingerprint(entries, stores=GROCERY_LOCATIONS):
+    """Hash of what decides an item's category (names, aliases, categories, stores)."""
+    keys = {key: [entry.get('name'), entry.get('aliases'), entry.get('category')] for key, entry in entries.items()}
+    keys = {'entries': keys, 'stores': list(stores), 'matcher': MATCHER_VERSION}
+    return hashlib.sha256(json.dumps(keys, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SpendCube:
+    """``spend`` / ``lines`` / ``grams`` arrays indexed ``[store, month, category]``."""
+
+    def __init__(self, entries, stores=GROCERY_LOCATIONS):
+        self.stores = list(stores)
+        self.context = categories_fingerprint(entries, self.stores)
+        self.labels = {axis: [] for axis in AXES}
+        self.measures = {measure: np.zeros((0, 0, 0)) for measure in MEASURES}
+        self.row_count = 0
+        self.head = None
+        self.tail = None
+        self.rebuild_count = 0
+        self._attach(entries)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_converter'], state['_matcher'], state['_entries']
+        return state
+
+    def _attach(self, entries):
+        self._converter = UnitConverter(entries)
+        self._matcher = FuzzyMatcher(aliases=entry_aliases(entries))
+        self._entries = entries
+
+    def bind(self, entries, stores=GROCERY_LOCATIONS):
+        """Attach ingredients.json entries; False if they or the grocery stores changed."""
+        self._attach(entries)
+        return categories_fingerprint(entries, stores) == self.context
+
+    def ingredient_of(self, item):
+        """ingredients.json key of a grocery receipt item, or None."""
+        return self._matcher.classify(item)
+
+    def category_of(self, item):
+        return self._category(self.ingredient_of(item))
+
+    def _category(self, key):
+        return (self._entries.get(key, {}).get('category') if key else None) or UNCATEGORIZED
+
+    # Updates
+
+    def rebuild(self, columns):
+        self.labels = {axis: [] for axis in AXES}
+        self.measures = {measure: np.zeros((0, 0, 0)) for measure in MEASURES}
+        self.rebuild_count += 1
+        instrument.count('cube.rebuilds')
+        self._add(columns, 0, len(columns))
+        self._mark(columns)
+        return len(columns)
+
+    def update(self, columns):
+        """Add rows of ``columns`` not counted yet; returns how many rows were new."""
+        n, m = self.row_count, len(columns)
+        if not n or m < n:
+            return self.rebuild(columns)
+        if columns.row_key(0) == self.head and columns.row_key(n - 1) == self.tail:
+            start, stop = n, m
+        elif columns.row_key(m - n) == self.head and columns.row_key(m - 1) == self.tail:
+            start, stop = 0, m - n
+        else:
+            return self.rebuild(columns)
+        if stop > start:
+            self._add(columns, start, stop)
+            self._mark(columns)
+        return stop - start
+
+    def _mark(self, columns):
+        self.row_count = len(columns)
+        self.head = columns.row_key(0) if len(columns) else None
+        self.tail = columns.row_key(len(columns) - 1) if len(columns) else None
+
+    def _add(self, columns, start, stop):
+        locations = [location for location in columns.locations if isinstance(location, str) and location]
+        rows = columns.valid_rows(locations, start, stop)
+        if not rows:
+            return
+        cells = np.empty((len(rows), 3), dtype=np.intp)
+        grams = np.zeros(len(rows))
+        stores = set(self.stores)
+        keys = {}
+        ids = {axis: {label: k for k, label in enumerate(self.labels[axis])} for axis in AXES}
+
+        def index(axis, label):
+            k = ids[axis].get(label)
+            if k is None:
+                k = ids[axis][label] = len(self.labels[axis])
+                self.labels[axis].append(label)
+            return k
+
+        for r, i in enumerate(rows):
+            location = columns.location_at(i)
+            if location in stores:
+                item = columns.item[i]
+                if item not in keys:
+                    keys[item] = self.ingredient_of(item)
+                key = keys[item]
+                category = self._category(key)
+                # The entry's name resolves exactly, so its hints give grams per each / ml
+                name = self._entries[key].get('name') if key else None
+                grams[r] = self._converter.convert(columns.qty_at(i), columns.unit_at(i), GRAMS, name) or 0.0
+            else:
+                category = NON_GROCERY
+            cells[r] = (index('store', location),
+                        index('month', _month(columns.date[i])),
+                        index('category', category))
+        self._grow()
+        index = (cells[:, 0], cells[:, 1], cells[:, 2])
+        np.add.at(self.measures['spend'], index, np.array([columns.price[i] for i in rows]))
+        np.add.at(self.measures['lines'], index, 1)
+        np.add.at(self.measures['grams'], index, grams)
+        instrument.count('cube.rows_added', len(rows))
+
+    def _grow(self):
+        shape = tuple(len(self.labels[axis]) for axis in AXES)
+        for measure, values in self.measures.items():
+            if values.shape != shape:
+                grown = np.zeros(shape)
+                grown[:values.shape[0], :values.shape[1], :values.shape[2]] = values
+                self.measures[measure] = grown
+
+    # Reads
+
+    def _selector(self, store=None, month=None, category=None):
+        selector = []
+        for axis, value in zip(AXES, (store, month, category)):
+            if value is None:
+                selector.append(slice(None))
+            else:
+                values = [value] if isinstance(value, str) else list(value)
+                selector.append([self.labels[axis].index(v) for v in values if v in self.labels[axis]])
+        return np.ix_(*[np.arange(len(self.labels[axis]))[s] for axis, s in zip(AXES, selector)])
+
+    def total(self, measure='spend', store=None, month=None, category=None):
+        """Sum of ``measure`` over the cells matching the filters (names or lists)."""
+        return float(self.measures[measure][self._selector(store, month, category)].sum())
+
+    def totals(self, axis, measure='spend', **filters):
+        """``{label: sum}`` along one axis, largest first."""
+        selector = self._selector(**filters)
+        values = self.measures[measure][selector]
+        keep = AXES.index(axis)
+        labels = np.array(self.labels[axis], dtype=object)[selector[keep].ravel()]
+        sums = values.sum(axis=tuple(a for a in range(3) if a != keep))
+        return dict(sorted(zip(labels.tolist(), sums.tolist()), key=lambda item: -item[1]))
+
+    def coverage(self, measure='spend', store=None, month=None):
+        """Share of ``measure`` at ``store`` (default: the grocery stores) that has a category."""
+        store = self.stores if store is None else store
+        total = self.total(measure, store=store, month=month)
+        if not total:
+            return 0.0
+        return 1.0 - self.total(measure, store=store, month=month, category=UNCATEGORIZED) / total
+
+    def table(self, rows, columns, measure='spend'):
+        """``(row labels, column labels, 2-D sums)`` over the other axis."""
+        r, c = AXES.index(rows), AXES.index(columns)
+        other = 3 - r - c
+        values = self.measures[measure].sum(axis=other)
+        if r > c:
+            values = values.T
+        labels_r, labels_c = self.labels[rows], self.labels[columns]
+        order_r = sorted(range(len(labels_r)), key=labels_r.__getitem__)
+        order_c = sorted(range(len(labels_c)), key=labels_c.__getitem__)
+        return ([labels_r[i] for i in order_r], [labels_c[j] for j in order_c],
+                values[np.ix_(order_r, order_c)])
+
+    def cells(self):
+        """Non-empty cells as ``{store, month, category, spend, lines, grams}`` dicts."""
+        spend, lines, grams = (self.measures[measure] for measure in MEASURES)
+        return [{'store': self.labels['store'][s], 'month': self.labels['month'][m],
+                 'category': self.labels['category'][c], 'spend': round(float(spend[s, m, c]), 2),
+                 'lines': int(lines[s, m, c]), 'grams': float(grams[s, m, c])}
+                for s, m, c in zip(*np.nonzero(lines))]
+
+
+def cube_path(workbook_path):
+    return workbook_path + CUBE_SUFFIX
+
+
+def load_entries(path=INGREDIENTS_JSON):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('ingredients', {})
+
+
+def load_cube(data, entries=None, use_cache=True, stores=GROCERY_LOCATIONS):
+    """The persisted cube for ``data``, brought up to date with its purchases."""
+    entries = entries if entries is not None else load_entries()
+    path = cube_path(data.path)
+    cube = _read_cube(path) if use_cache else None
+    if cube is None or not cube.bind(entries, stores):
+        cube = SpendCube(entries, stores)
+    row_count = cube.row_count
+    applied = cube.update(data.purchases)
+    if use_cache and (applied or cube.row_count != row_count):
+        _write_cube(path, cube)
+    return cube
+
+
+def _read_cube(path):
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(payload, dict) or payload.get('version') != CUBE_VERSION:
+        return None
+    return payload['cube']
+
+
+def _write_cube(path, cube):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': CUBE_VERSION, 'cube': cube}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def export_cube(cube, prefix=None, formats=('json', 'npz')):
+    """Write the cube's cells, and totals over the grocery stores, with ``ResultWriter``.
+
+    The totals match the dashboard's ``totalsByStore``, which sums grocery
+    trips only; paychecks, mortgage and tax rows stay in the cells.
+    """
+    from grocery.export import RESULTS_DIR, ResultWriter
+
+    with ResultWriter(prefix or RESULTS_DIR / 'spend_cube', formats) as results:
+        results.add_table('cells', cube.cells(), ('store', 'month', 'category', 'spend', 'lines', 'grams'))
+        results.set('totalsByStore', cube.totals('store', store=cube.stores))
+        results.set('totalsByMonth', dict(sorted(cube.totals('month', store=cube.stores).items())))
+        results.set('totalsByCategory', cube.totals('category', store=cube.stores))
+        results.set('categorizedShare', cube.coverage())
+
+
+def main(argv=None):
+    from grocery.loader import DEFAULT_WORKBOOK, load
+
+    parser = argparse.ArgumentParser(description='Spend by store, month and ingredient category.')
+    parser.add_argument('--by', nargs='+', choices=AXES, default=['store'],
+                        help='one axis for totals, two for a table (default: store)')
+    parser.add_argument('--measure', choices=MEASURES, default='spend')
+    parser.add_argument('--store', action='append', help='only these stores (repeatable)')
+    parser.add_argument('--all-locations', action='store_true',
+                        help='every location on the sheet, not just the grocery stores')
+    parser.add_argument('--top', type=int, default=25, help='labels to list for a single axis')
+    parser.add_argument('--export', action='store_true', help='write dashboard/data/results/spend_cube.*')
+    parser.add_argument('--workbook', default=DEFAULT_WORKBOOK)
+    args = parser.parse_args(argv)
+
+    cube = load_cube(load(args.workbook))
+    money = args.measure == 'spend'
+    stores = args.store or (None if args.all_locations else cube.stores)
+
+    print("=" * 80)
+    print(f"{args.measure.upper()} BY {' x '.join(axis.upper() for axis in args.by)}")
+    print("=" * 80)
+    if len(args.by) == 1:
+        totals = list(cube.totals(args.by[0], args.measure, store=stores).items())
+        for label, value in totals[:args.top]:
+            print(f"  {label[:32]:<32} {'$' if money else ' '}{value:>12,.2f}")
+        if len(totals) > args.top:
+            print(f"  ... {len(totals) - args.top} more")
+    else:
+        rows, columns, values = cube.table(args.by[0], args.by[1], args.measure)
+        print(f"  {'':<16}" + ''.join(f"{str(c)[:10]:>11}" for c in columns))
+        for label, line in zip(rows, values):
+            if stores and args.by[0] == 'store' and label not in stores:
+                continue
+            print(f"  {str(label)[:16]:<16}" + ''.join(f"{v:>11,.0f}" for v in line))
+    print(f"\n  Total: {'$' if money else ''}{cube.total(args.measure, store=stores):,.2f} "
+          f"({len(cube.labels['store'])} stores x {len(cube.labels['month'])} months x "
+          f"{len(cube.labels['category'])} categories)")
+    print(f"  Categorized: {cube.coverage(args.measure, store=args.store):.0%} of grocery {args.measure}"
+          f" (the rest is non-food or not in ingredients.json)")
+    if args.export:
+        export_cube(cube)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""Consumption rates and run-out dates for staples, from purchase intervals.
+
+The scripts assume the staples in ``EXCLUDE_ITEMS`` (olive oil, salt, garlic,
+...) are always at home. ``ConsumptionModel`` estimates instead, from when
+each item was bought and how much, how fast it is used up and when it runs
+out. All tracked items are handled at once with NumPy over the receipt
+lines, so tracking every item on every receipt costs about the same as
+tracking a handful:
+
+- lines are collapsed to one purchase per item per day;
+- the usage rate is what was bought before the last purchase divided by the
+  days it lasted (``qty``/``unit`` in grams / ml / each), or, when the units
+  don't convert, the mean interval between purchases;
+- the run-out day is the last purchase plus how long it should last at that
+  rate, and an item is due if it runs out within ``horizon_days`` of
+  ``as_of`` (default: the newest receipt).
+
+``staples_to_buy`` turns that into the next shopping list's exclude list:
+a staple with a matched purchase history stays excluded only while it is
+predicted to last past the horizon; staples with fewer than two purchases
+keep the old assumption. Run-out is measured from ``as_of``, the newest
+receipt unless given, not from today, so a workbook a few weeks behind
+shows items as due that were due back then.
+
+Usage:
+    model = ConsumptionModel.from_columns(data.purchases, stores)       # every item
+    model.due(horizon_days=7)                                           # bool per item
+    food = food_model(data.purchases, stores, matcher)                   # items that are ingredients
+    include, exclude, model = staples_to_buy(data, history, matcher)
+
+    python -m grocery.staples --horizon 14
+    python -m grocery shopping-list --auto-exclude
+"""
+
+import argparse
+from datetime import timedelta
+
+import numpy as np
+
+from grocery.loader import EPOCH, NO_DATE
+from grocery.units import DIMENSIONS, UnitPriceTable
+
+DAY = 24 * 60 * 60
+DEFAULT_HORIZON_DAYS = 7
+MIN_PURCHASES = 2
+
+# Exclude-list words too generic to match a receipt on their own
+STAPLE_QUERIES = {'spices': 'spice', 'pepper': 'black pepper'}
+
+
+def day_label(day):
+    return (EPOCH + timedelta(days=int(day))).date() if np.isfinite(day) else None
+
+
+class ConsumptionModel:
+    """Per-group purchase counts, usage rates and run-out days (days since 1970).
+
+    ``groups[i]`` says which tracked item receipt line ``i`` belongs to (-1:
+    not tracked); ``labels`` names the groups.
+    """
+
+    def __init__(self, labels, groups, days, quantities, dims, as_of=None):
+        self.labels = list(labels)
+        n = len(self.labels)
+        groups = np.asarray(groups, dtype=np.int64)
+        days = np.asarray(days, dtype=np.int64)
+        quantities = np.asarray(quantities, dtype=float)
+        dims = np.asarray(dims, dtype=np.int64)
+        keep = (groups >= 0) & (days != NO_DATE // DAY)
+        groups, days, quantities, dims = groups[keep], days[keep], quantities[keep], dims[keep]
+        self.as_of = int(as_of if as_of is not None else (days.max() if len(days) else 0))
+
+        # One purchase per (group, day): quantities summed, unknown if any line is
+        order = np.lexsort((days, groups))
+        groups, days, quantities, dims = groups[order], days[order], quantities[order], dims[order]
+        starts = np.flatnonzero(np.r_[True, (groups[1:] != groups[:-1]) | (days[1:] != days[:-1])]) \
+            if len(groups) else np.zeros(0, dtype=np.int64)
+        visit_group = groups[starts]
+        visit_day = days[starts].astype(float)
+        visit_qty = np.add.reduceat(quantities, starts) if len(starts) else np.zeros(0)
+        dim_min = np.minimum.reduceat(dims, starts) if len(starts) else np.zeros(0, dtype=np.int64)
+        dim_max = np.maximum.reduceat(dims, starts) if len(starts) else np.zeros(0, dtype=np.int64)
+
+        self.purchases = np.bincount(visit_group, minlength=n)
+        first = np.r_[True, visit_group[1:] != visit_group[:-1]] if len(visit_group) else np.zeros(0, bool)
+        last = np.r_[visit_group[1:] != visit_group[:-1], True] if len(visit_group) else np.zeros(0, bool)
+        self.first_day = np.full(n, np.nan)
+        self.last_day = np.full(n, np.nan)
+        self.last_qty = np.full(n, np.nan)
+        self.first_day[visit_group[first]] = visit_day[first]
+        self.last_day[visit_group[last]] = visit_day[last]
+        self.last_qty[visit_group[last]] = visit_qty[last]
+
+        # Intervals between consecutive purchases of the same item
+        span = self.last_day - self.first_day
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.interval = np.where(self.purchases >= MIN_PURCHASES, span / (self.purchases - 1), np.nan)
+            gaps = np.diff(visit_day)
+            same = visit_group[1:] == visit_group[:-1]
+            sq = np.bincount(visit_group[1:][same], gaps[same] ** 2, minlength=n)
+            variance = sq / np.maximum(self.purchases - 1, 1) - self.interval ** 2
+            self.interval_std = np.sqrt(np.maximum(variance, 0))
+
+            # Quantity rate: everything but the last purchase was used up over the span
+            known = ~np.isnan(visit_qty) & (dim_min == dim_max) & (dim_min > 0)
+            used = np.bincount(visit_group[~last], visit_qty[~last] * known[~last], minlength=n)
+            unknown = np.bincount(visit_group, ~known, minlength=n)
+            dim_lo = np.full(n, np.iinfo(np.int64).max)
+            dim_hi = np.full(n, -1)
+            np.minimum.at(dim_lo, visit_group, dim_min)
+            np.maximum.at(dim_hi, visit_group, dim_max)
+            ok = (unknown == 0) & (dim_lo == dim_hi) & (self.purchases >= MIN_PURCHASES) & (span > 0)
+            self.rate = np.where(ok, used / span, np.nan)                 # base units per day
+            self.unit = np.array([DIMENSIONS[d] if 0 < d < len(DIMENSIONS) else None
+                                  for d in np.where(ok, dim_lo, 0)], dtype=object)
+            lasts = np.where(ok, self.last_qty / self.rate, self.interval)
+        self.lasts_days = np.where(np.isfinite(lasts) & (lasts > 0), lasts, np.nan)
+        self.runout_day = self.last_day + self.lasts_days
+
+    @classmethod
+    def from_columns(cls, columns, stores, group_of=None, labels=None, as_of=None):
+        """Model over ``PurchaseColumns`` rows at ``stores``.
+
+        ``group_of(store, item_key)`` returns a group index (or -1) with
+        ``labels`` naming the groups; by default every item key at every
+        store is its own group, labelled ``(store, item_key)``.
+        """
+        rows = np.asarray(columns.valid_rows(stores), dtype=np.intp)
+        locations = [columns.location_at(i) for i in rows]
+        keys = [str(columns.item[i]).lower() for i in rows]
+        if group_of is None:
+            ids = {}
+            groups = [ids.setdefault((store, key), len(ids)) for store, key in zip(locations, keys)]
+            labels = list(ids)
+        else:
+            groups = [group_of(store, key) for store, key in zip(locations, keys)]
+        table = UnitPriceTable(columns)
+        dates = np.asarray(columns.date, dtype=np.int64)[rows] if len(rows) else np.zeros(0, dtype=np.int64)
+        days = np.where(dates == NO_DATE, NO_DATE // DAY, dates // DAY)
+        as_of_day = None
+        if as_of is not None:
+            as_of_day = (as_of - EPOCH) // timedelta(days=1)
+        return cls(labels, groups, days, table.base_qty[rows] if len(rows) else [], table.dim[rows] if len(rows) else [],
+                   as_of_day)
+
+    def days_left(self, as_of=None):
+        """Days until each item runs out (negative: already out; NaN: unknown)."""
+        return self.runout_day - (self.as_of if as_of is None else as_of)
+
+    def due(self, horizon_days=DEFAULT_HORIZON_DAYS, as_of=None):
+        """True for items predicted to run out within ``horizon_days``."""
+        with np.errstate(invalid='ignore'):
+            return self.days_left(as_of) <= horizon_days
+
+    def known(self):
+        return ~np.isnan(self.runout_day)
+
+    def rows(self, horizon_days=DEFAULT_HORIZON_DAYS, active=False):
+        """One dict per group, soonest run-out first (unknown last).
+
+        ``active`` leaves out items that ran out more than one cycle ago
+        (no longer bought regularly) and items without a rate.
+        """
+        days_left = self.days_left()
+        due = self.due(horizon_days)
+        order = np.argsort(np.where(np.isnan(days_left), np.inf, days_left), kind='stable')
+        if active:
+            with np.errstate(invalid='ignore'):
+                order = order[days_left[order] >= -self.lasts_days[order]]
+        return [{'item': self.labels[g], 'purchases': int(self.purchases[g]),
+                 'last': day_label(self.last_day[g]), 'every_days': _round(self.interval[g]),
+                 'rate': _round(self.rate[g], 2), 'unit': self.unit[g],
+                 'lasts_days': _round(self.lasts_days[g]), 'runout': day_label(self.runout_day[g]),
+                 'days_left': _round(days_left[g]), 'due': bool(due[g])}
+                for g in order]
+
+
+def food_model(columns, stores, matcher, as_of=None):
+    """``ConsumptionModel`` of the receipt items ``matcher.classify`` maps to an ingredient.
+
+    Each ``(store, item_key)`` is its own group, as in ``from_columns``;
+    fees, tax and non-food lines are left out.
+    """
+    labels = []     # filled in as ``from_columns`` groups the rows
+    ids = {}
+    is_food = {}
+
+    def group_of(store, item_key):
+        if item_key not in is_food:
+            is_food[item_key] = matcher.classify(item_key) is not None
+        if not is_food[item_key]:
+            return -1
+        if (store, item_key) not in ids:
+            ids[store, item_key] = len(labels)
+            labels.append((store, item_key))
+        return ids[store, item_key]
+
+    return ConsumptionModel.from_columns(columns, stores, group_of, labels, as_of)
+
+
+def _round(value, digits=1):
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def staples_to_buy(data, history, matcher, staples=None, horizon_days=DEFAULT_HORIZON_DAYS, as_of=None):
+    """``(include, exclude, model)`` for the staples in ``staples``.
+
+    Each staple is tracked over the purchases of its best-matching item at
+    every store of ``history``. A staple goes in ``include`` when it is
+    predicted to run out within ``horizon_days``; the rest, including
+    staples without enough history, stay in ``exclude``.
+    """
+    if staples is None:
+        from grocery.cli import EXCLUDE_ITEMS
+        staples = EXCLUDE_ITEMS
+    staples = list(staples)
+    key_group = {}
+    for g, staple in enumerate(staples):
+        query = STAPLE_QUERIES.get(staple, staple)
+        for store in history.stores:
+            item_key = matcher.best(query, store)
+            if item_key:
+                key_group.setdefault((store, item_key), g)
+    model = ConsumptionModel.from_columns(data.purchases, history.stores,
+                                          lambda store, key: key_group.get((store, key), -1), staples, as_of)
+    due = model.due(horizon_days)
+    include = [staple for staple, flag in zip(staples, due) if flag]
+    exclude = [staple for staple, flag in zip(staples, due) if not flag]
+    return include, exclude, model
+
+
+def print_model(model, horizon_days, limit=None, active=False):
+    print(f"  {'Item':<40} {'Bought':>6} {'Every':>7} {'Lasts':>7} {'Runs out':>11} {'Left':>6}")
+    for row in model.rows(horizon_days, active)[:limit]:
+        label = row['item'] if isinstance(row['item'], str) else f"{row['item'][1]} ({row['item'][0]})"
+        every = f"{row['every_days']:.0f}d" if row['every_days'] is not None else '-'
+        lasts = f"{row['lasts_days']:.0f}d" if row['lasts_days'] is not None else '-'
+        left = f"{row['days_left']:.0f}d" if row['days_left'] is not None else '-'
+        flag = '  <- buy' if row['due'] else ''
+        print(f"  {label[:40]:<40} {row['purchases']:>6} {every:>7} {lasts:>7} {str(row['runout'] or '-'):>11} "
+              f"{left:>6}{flag}")
+
+
+def main(argv=None):
+    from grocery.cli import EXCLUDE_ITEMS, HISTORY_STORES, Session
+    from grocery.shopping_list import GROCERY_STORES
+
+    parser = argparse.ArgumentParser(description='Consumption rates, run-out dates and which staples to buy.')
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON_DAYS, help='days until the next trip after this one')
+    parser.add_argument('--all', type=int, metavar='N',
+                        help='also list the N receipt items running out first (those that are ingredients)')
+    parser.add_argument('--workbook')
+    args = parser.parse_args(argv)
+
+    session = Session(args.workbook) if args.workbook else Session()
+    history = session.history(GROCERY_STORES)
+    matcher = session.matcher(GROCERY_STORES)
+    include, exclude, model = staples_to_buy(session.data, history, matcher, EXCLUDE_ITEMS, args.horizon)
+    print("=" * 80)
+    print(f"STAPLES (as of {day_label(model.as_of)}, the newest receipt; next {args.horizon} days)")
+    print("=" * 80)
+    print_model(model, args.horizon)
+    print(f"\nBuy: {', '.join(include) or 'nothing'}")
+    print(f"Still at home: {', '.join(exclude) or 'nothing'}")
+
+    if args.all:
+        everything = food_model(session.data.purchases, HISTORY_STORES, matcher)
+        print(f"\n{'=' * 80}")
+        print(f"ALL FOOD ITEMS: {len(everything.labels)} tracked, {int(everything.known().sum())} with a rate, "
+              f"{int(everything.due(args.horizon).sum())} due")
+        print("=" * 80)
+        print_model(everything, args.horizon, args.all, active=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Unit normalization for comparing prices across stores.
+
+Receipt lines carry ``qty``/``unit`` (``oz``, ``lb``, ``fl oz``, ``cnt``, ...)
+and recipe rows carry ``qty_needed``/``unit`` (``cup``, ``bunch``, ``can``,
+...), but the scripts only ever compared raw package prices, so a Costco bulk
+pack and a Safeway single looked the same. Everything here converts to one of
+three base units - grams, millilitres or each - and uses the
+``typicalQuantity``/``gramsPerTypical`` pairs in
+``dashboard/data/ingredients.json`` as per-ingredient hints for the
+conversions that need them (density, grams per item, grams per bunch/can/...).
+
+Usage:
+    converter = UnitConverter.from_json()
+    converter.convert(2, 'cup', 'g', 'Feta')      # -> grams
+    table = UnitPriceTable(data.purchases)        # price per base unit, per row
+"""
+
+import json
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+GRAMS = 'g'
+MILLILITRES = 'ml'
+EACH = 'each'
+DIMENSIONS = [None, GRAMS, MILLILITRES, EACH]
+
+INGREDIENTS_JSON = Path(__file__).resolve().parents[1] / 'dashboard' / 'data' / 'ingredients.json'
+
+# unit -> (base unit, factor)
+UNITS = {
+    'g': (GRAMS, 1.0),
+    'gram': (GRAMS, 1.0),
+    'kg': (GRAMS, 1000.0),
+    'oz': (GRAMS, 28.349523125),
+    'lb': (GRAMS, 453.59237),
+    'lbs': (GRAMS, 453.59237),
+    'ml': (MILLILITRES, 1.0),
+    'l': (MILLILITRES, 1000.0),
+    'liter': (MILLILITRES, 1000.0),
+    'litre': (MILLILITRES, 1000.0),
+    'fl oz': (MILLILITRES, 29.5735295625),
+    'cup': (MILLILITRES, 236.5882365),
+    'tbsp': (MILLILITRES, 14.78676478125),
+    'tbsn': (MILLILITRES, 14.78676478125),
+    'tbs': (MILLILITRES, 14.78676478125),
+    'tsp': (MILLILITRES, 4.92892159375),
+    'pint': (MILLILITRES, 473.176473),
+    'quart': (MILLILITRES, 946.352946),
+    'gal': (MILLILITRES, 3785.411784),
+    'cnt': (EACH, 1.0),
+    'count': (EACH, 1.0),
+    'ct': (EACH, 1.0),
+    'each': (EACH, 1.0),
+    'ea': (EACH, 1.0),
+    'pc': (EACH, 1.0),
+    'dozen': (EACH, 12.0),
+}
+
+# Words in typicalQuantity that describe one whole item ("1 medium", "1 large egg")
+EACH_WORDS = {'medium', 'large', 'small', 'clove', 'fillet', 'head', 'piece', 'whole'}
+
+_QUANTITY = re.compile(r'^\s*(\d+(?:\.\d+)?(?:/\d+)?)\s+([a-zA-Z][a-zA-Z ]*?)(?:\s*\(|$|\s+\d)')
+
+
+# Plurals that are not the singular plus 's'
+IRREGULAR_PLURALS = {'leaves': 'leaf', 'loaves': 'loaf', 'halves': 'half'}
+_ES_PLURAL = ('ches', 'shes', 'sses', 'xes')    # bunches, dishes, glasses, boxes
+
+
+def normalize_unit(unit):
+    """Canonical spelling of a unit string ('Gal' -> 'gal', 'cups' -> 'cup', 'bunches' -> 'bunch')."""
+    if unit is None:
+        return None
+    unit = ' '.join(str(unit).lower().replace('.', '').split())
+    if unit in UNITS or not unit.endswith('s'):
+        return unit
+    if unit in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[unit]
+    if unit.endswith(_ES_PLURAL):
+        return unit[:-2]
+    return unit[:-1] if unit[:-1] in UNITS or len(unit) > 3 else unit
+
+
+@lru_cache(maxsize=None)
+def base_unit(unit):
+    """``(base unit, factor)`` for a standard unit, ``(None, nan)`` otherwise."""
+    return UNITS.get(normalize_unit(unit), (None, math.nan))
+
+
+def _parse_number(text):
+    if '/' in text:
+        num, den = text.split('/')
+        return float(num) / float(den)
+    return float(text)
+
+
+class UnitHints:
+    """Per-ingredient conversion facts derived from ingredients.json."""
+
+    def __init__(self, density=None, grams_each=None, grams_per=None):
+        self.density = density          # grams per millilitre
+        self.grams_each = grams_each    # grams per whole item
+        self.grams_per = grams_per or {}  # grams per named unit ('bunch', 'can', ...)
+
+    @classmethod
+    def from_entry(cls, entry):
+        """Hints from an ingredients.json entry's typicalQuantity/gramsPerTypical."""
+        hints = cls()
+        grams = entry.get('gramsPerTypical')
+        match = _QUANTITY.match(entry.get('typicalQuantity') or '')
+        if not grams or not match:
+            return hints
+        qty = _parse_number(match.group(1))
+        text = match.group(2).lower()
+        unit = 'fl oz' if text.startswith('fl oz') else normalize_unit(text.split()[0])
+        dim, factor = UNITS.get(unit, (None, math.nan))
+        if dim == MILLILITRES:
+            hints.density = grams / (qty * factor)
+        elif dim == EACH or unit in EACH_WORDS:
+            hints.grams_each = grams / qty
+        elif dim is None:
+            hints.grams_per[unit] = grams / qty
+        return hints
+
+
+class UnitConverter:
+    """Converts quantities to grams / millilitres / each using ingredient hints."""
+
+    def __init__(self, entries=None):
+        self.hints = {}
+        self.aliases = {}
+        for key, entry in (entries or {}).items():
+            self.hints[key] = UnitHints.from_entry(entry)
+            names = [key.replace('_', ' '), entry.get('name', '')] + entry.get('aliases', [])
+            for name in names:
+                if name:
+                    self.aliases.setdefault(name.lower(), key)
+        # Longest alias first so 'sweet potato' wins over 'potato'
+        self._alias_order = sorted(self.aliases, key=len, reverse=True)
+        self._resolved = {}
+
+    @classmethod
+    def from_json(cls, path=INGREDIENTS_JSON):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f).get('ingredients', {}))
+
+    def resolve(self, ingredient):
+        """Canonical ingredients.json key for an ingredient name, or None."""
+        if ingredient is None:
+            return None
+        name = str(ingredient).lower().strip()
+        if name not in self._resolved:
+            key = self.aliases.get(name)
+            if key is None:
+                key = next((self.aliases[a] for a in self._alias_order if a in name), None)
+            self._resolved[name] = key
+        return self._resolved[name]
+
+    def hints_for(self, ingredient):
+        key = self.resolve(ingredient)
+        return self.hints.get(key) if key else None
+
+    def to_base(self, qty, unit, ingredient=None):
+        """``(amount, base unit)`` or ``(None, None)`` if the unit is unknown."""
+        if not isinstance(qty, (int, float)) or isinstance(qty, bool):
+            return None, None
+        unit = normalize_unit(unit)
+        dim, factor = UNITS.get(unit, (None, math.nan))
+        if dim is not None:
+            return qty * factor, dim
+        hints = self.hints_for(ingredient)
+        if hints is not None and unit in hints.grams_per:
+            return qty * hints.grams_per[unit], GRAMS
+        return None, None
+
+    def convert(self, qty, unit, target, ingredient=None):
+        """``qty unit`` expressed in ``target`` base unit, None if not convertible."""
+        amount, dim = self.to_base(qty, unit, ingredient)
+        if dim is None or dim == target:
+            return amount
+        hints = self.hints_for(ingredient)
+        if hints is None:
+            return None
+        grams = amount
+        if dim == MILLILITRES:
+            grams = amount * hints.density if hints.density else None
+        elif dim == EACH:
+            grams = amount * hints.grams_each if hints.grams_each else None
+        if grams is None or target == GRAMS:
+            return grams
+        if target == MILLILITRES:
+            return grams / hints.density if hints.density else None
+        if target == EACH:
+            return grams / hints.grams_each if hints.grams_each else None
+        return None
+
+
+class UnitPriceTable:
+    """Price per base unit for every row of a ``PurchaseColumns``, computed once.
+
+    Units are dictionary-encoded by the loader, so the unit table is resolved
+    once per distinct unit and broadcast to all rows with NumPy. ``dim`` holds
+    an index into ``DIMENSIONS`` (0 when the unit is unknown) and
+    ``per_base`` is NaN wherever qty or unit is missing.
+    """
+
+    def __init__(self, columns):
+        import numpy as np
+
+        dims = np.array([DIMENSIONS.index(base_unit(u)[0]) for u in columns.units] or [0], dtype=np.int8)
+        factors = np.array([base_unit(u)[1] for u in columns.units] or [math.nan])
+        codes = np.asarray(columns.unit_code, dtype=np.intp)
+        price = np.asarray(columns.price, dtype=float)
+        self.dim = dims[codes]
+        self.base_qty = np.asarray(columns.qty, dtype=float) * factors[codes]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_base = price / self.base_qty
+        self.per_base = np.where(np.isfinite(per_base) & (self.base_qty > 0), per_base, np.nan)
+
+    def __len__(self):
+        return len(self.per_base)
+
+    def at(self, i):
+        """``(base unit, price per base unit)`` for row ``i``."""
+        return DIMENSIONS[self.dim[i]], float(self.per_base[i])
+
+
+def unit_price(purchase):
+    """``(base unit, price per base unit)`` for a single ``Purchase`` (``(None, nan)`` if unknown)."""
+    dim, factor = base_unit(purchase.unit)
+    qty = purchase.qty
+    if dim is None or not isinstance(qty, (int, float)) or qty <= 0:
+        return None, math.nan
+    return dim, purchase.price / (qty * factor)
@@ -1,17 +1,19 @@
-import openpyxl
-import json
+import sys
+from pathlib import Path
 
-wb = openpyxl.load_workbook('MealCostCalculator.xlsx')
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from grocery.loader import load
+
+data = load('MealCostCalculator.xlsx')
 
 print("=" * 80)
-print("SHEET NAMES:", wb.sheetnames)
+print("SHEET NAMES:", data.sheetnames)
 print("=" * 80)
 
 # Read ingredients sheet
 print("\n=== INGREDIENTS SHEET ===")
-if 'ingredients' in wb.sheetnames:
-    ws = wb['ingredients']
-    rows = list(ws.iter_rows(values_only=True))
+if 'ingredients' in data.sheetnames:
+    rows = data.rows('ingredients')
     headers = rows[0] if rows else []
     print(f"Headers: {headers}")
     print(f"\nTotal rows: {len(rows)}")
@@ -23,9 +25,8 @@ else:
 # Read totalMealCost sheet
 print("\n" + "=" * 80)
 print("=== TOTAL MEAL COST SHEET ===")
-if 'totalMealCost' in wb.sheetnames:
-    ws = wb['totalMealCost']
-    rows = list(ws.iter_rows(values_only=True))
+if 'totalMealCost' in data.sheetnames:
+    rows = data.rows('totalMealCost')
     for i, row in enumerate(rows):
         print(f"Row {i}: {row}")
 else:
@@ -34,18 +35,13 @@ else:
 # Read itemized sheet - just get the unique locations and items
 print("\n" + "=" * 80)
 print("=== ITEMIZED PURCHASE SUMMARY ===")
-if 'ItemizedPurchase' in wb.sheetnames:
-    ws = wb['ItemizedPurchase']
-    rows = list(ws.iter_rows(values_only=True))
-    headers = rows[0] if rows else []
-    print(f"Headers: {headers}")
-    print(f"\nTotal rows: {len(rows)}")
+if 'ItemizedPurchase' in data.sheetnames:
+    purchases = data.purchases
+    print(f"Headers: {purchases.headers}")
+    print(f"\nTotal rows: {len(purchases) + 1}")
 
-    # Get unique locations
-    locations = set()
-    for row in rows[1:]:
-        if row[2]:  # Location column
-            locations.add(row[2])
+    # Get unique locations (already dictionary-encoded by the loader)
+    locations = set(loc for loc in purchases.locations if loc)
     print(f"\nUnique locations: {sorted(locations)}")
 else:
     print("Sheet 'ItemizedPurchase' not found")
@@ -1,15 +1,23 @@
-import openpyxl
+import sys
 from collections import defaultdict
+from pathlib import Path
 
-wb = openpyxl.load_workbook('MealCostCalculator.xlsx')
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from grocery.export import RESULTS_DIR, ResultWriter
+from grocery.history import load_history
+from grocery.loader import load
+from grocery.meal_costs import MealCosts
+from grocery.shopping_list import GROCERY_STORES
+from grocery.spend_cube import export_cube, load_cube
+
+data = load('MealCostCalculator.xlsx')
 
 # Get complete ingredients list
 print("=" * 80)
 print("COMPLETE INGREDIENTS LIST")
 print("=" * 80)
-ws_ing = wb['ingredients']
 ingredients_data = []
-for row in ws_ing.iter_rows(min_row=2, values_only=True):
+for row in data.rows('ingredients', min_row=2):
     if row[0]:  # If there's a code
         ingredients_data.append({
             'code': row[0],
@@ -40,6 +48,29 @@ for code in sorted(meals.keys()):
     for ing in meal['ingredients']:
         print(f"  - {ing['ingredient']}: {ing['qty_needed']} {ing['unit']} (from {ing['total_qty']} {ing['unit']} @ ${ing['cost_total']})")
 
+# Meal costs repriced from purchase history (cheapest store per ingredient)
+print("\n" + "=" * 80)
+print("MEAL COSTS AT CURRENT PRICES")
+print("=" * 80)
+meal_costs = MealCosts.build(data, load_history(data, GROCERY_STORES))
+for code, cost in sorted(meal_costs.meal_costs().items()):
+    per_serving = meal_costs.cost_per_serving(code)
+    serving_text = f", ${per_serving:.2f}/serving" if per_serving is not None else ""
+    print(f"  {code}. {meal_costs.meal_names[code]}: ${cost:.2f}{serving_text}")
+without_walmart = meal_costs.what_if(exclude_stores=['Walmart'])
+print(f"\nAll meals: ${meal_costs.plan_cost(meal_costs.meals):.2f} "
+      f"(${without_walmart['total']:.2f} without Walmart)")
+
+with ResultWriter(RESULTS_DIR / 'meal_costs') as results:
+    results.add_table('mealCosts', [
+        {'code': code, 'name': meal_costs.meal_names[code], 'cost': cost,
+         'costPerServing': meal_costs.cost_per_serving(code),
+         'costWithoutWalmart': without_walmart['meals'][code]}
+        for code, cost in sorted(meal_costs.meal_costs().items())])
+    results.add_table('ingredientCosts', [
+        {'ingredient': name, 'store': meal_costs.store_of(name), 'cost': cost}
+        for name, cost in meal_costs.ingredient_costs().items()])
+
 # Now analyze itemized purchases for grocery stores only
 print("\n" + "=" * 80)
 print("GROCERY STORE PURCHASE HISTORY")
@@ -48,34 +79,22 @@ print("=" * 80)
 grocery_stores = ['Costco', 'Safeway', 'H-Mart', 'King Sooper\'s ', 'Trader Joe\'s',
                   'Whole Foods', 'Sprouts', 'Walmart', 'Target']
 
-ws_item = wb['ItemizedPurchase']
-purchases = defaultdict(list)
-
-for row in ws_item.iter_rows(min_row=2, values_only=True):
-    date = row[0]
-    location = row[2]
-    item_name = row[7]
-    qty = row[8]
-    unit = row[9]
-    price = row[10]
-
-    if location in grocery_stores and item_name and price:
-        # Try to parse price if it's a formula
-        if isinstance(price, str):
-            # Skip formulas
-            continue
-        if isinstance(price, (int, float)) and price > 0:
-            purchases[location].append({
-                'date': date,
-                'item': item_name,
-                'qty': qty,
-                'unit': unit,
-                'price': price
-            })
+# Counts come from the spend cube; records are only read until every store
+# has its 10 most recent
+cube = load_cube(data)
+purchase_counts = {store: int(lines) for store, lines in cube.totals('store', 'lines', store=grocery_stores).items()}
+export_cube(cube)
+wanted = {store: min(10, count) for store, count in purchase_counts.items()}
+recent_purchases = defaultdict(list)
+for purchase in data.purchases.iter_records(grocery_stores):
+    if len(recent_purchases[purchase.location]) < wanted[purchase.location]:
+        recent_purchases[purchase.location].append(purchase)
+        if all(len(recent_purchases[store]) == n for store, n in wanted.items()):
+            break
 
 for store in grocery_stores:
-    if store in purchases:
-        print(f"\n{store}: {len(purchases[store])} items")
+    if store in purchase_counts:
+        print(f"\n{store}: {purchase_counts[store]} items")
         # Show recent items (last 10)
-        for item in purchases[store][:10]:
-            print(f"  {item['date']}: {item['item']} - ${item['price']}")
+        for item in recent_purchases[store]:
+            print(f"  {item.date}: {item.item} - ${item.price}")
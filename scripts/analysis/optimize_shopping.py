@@ -1,16 +1,29 @@
-import openpyxl
+import sys
 from collections import defaultdict
-from datetime import datetime
+from pathlib import Path
 
-wb = openpyxl.load_workbook('MealCostCalculator.xlsx')
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from grocery.export import RESULTS_DIR, ResultWriter, shopping_item
+from grocery.fuzzy_match import FuzzyMatcher
+from grocery.history import load_history
+from grocery.loader import load
+from grocery.match_cache import load_match_cache, save_match_cache
+from grocery.optimizer import StoreOptimizer
+from grocery.price_matrix import PriceMatrix
+from grocery.price_series import latest_purchase
+from grocery.scheduler import HIGHLY_PERISHABLE, MODERATELY_PERISHABLE, SHELF_STABLE
+from grocery.units import UnitConverter
+
+data = load('MealCostCalculator.xlsx')
 
 # Items user already has
 exclude_items = ['olive oil', 'salt', 'pepper', 'spices', 'garlic', 'ginger']
 
 # Get all ingredients needed
-ws_ing = wb['ingredients']
 ingredients_needed = []
-for row in ws_ing.iter_rows(min_row=2, values_only=True):
+for row in data.rows('ingredients', min_row=2):
     if row[0] and row[2]:  # If there's a code and ingredient name
         ingredient_name = row[2].lower() if row[2] else ''
         # Skip if user already has this item
@@ -34,139 +47,182 @@ for item in ingredients_needed:
 
 # Analyze purchases from grocery stores
 grocery_stores = ['Costco', 'Safeway', 'H-Mart', 'Walmart']
-ws_item = wb['ItemizedPurchase']
-
-# Build purchase history database
-purchase_db = defaultdict(lambda: defaultdict(list))
-
-for row in ws_item.iter_rows(min_row=2, values_only=True):
-    date = row[0]
-    location = row[2]
-    item_name = row[7]
-    qty = row[8]
-    unit = row[9]
-    price = row[10]
-
-    if location in grocery_stores and item_name and price:
-        if isinstance(price, str):
-            continue
-        if isinstance(price, (int, float)) and price > 0:
-            # Normalize item name for matching
-            item_lower = str(item_name).lower()
-            purchase_db[location][item_lower].append({
-                'date': date,
-                'item': item_name,
-                'qty': qty,
-                'unit': unit,
-                'price': price
-            })
 
-print("\n" + "=" * 80)
-print("PRICE COMPARISON BY INGREDIENT")
-print("=" * 80)
+# Purchase history database (persisted, only new receipt rows are applied)
+history = load_history(data, grocery_stores)
+purchase_db = history.purchase_db
 
-# For each ingredient, find where it was purchased and at what price
-ingredient_store_map = {}
+# Scored matching against receipt names and ingredients.json aliases;
+# remembered matches from earlier runs skip it entirely
+matcher = FuzzyMatcher.from_json(purchase_db)
+match_cache = load_match_cache(data.path, 'optimize', matcher.context,
+                               [ing['ingredient'] for ing in ingredients_needed], history.versions)
 
-for ing in ingredients_needed:
-    ing_name_lower = ing['ingredient'].lower()
-    ing_name_parts = ing_name_lower.split()
 
-    print(f"\n{ing['ingredient']}:")
-    found_prices = {}
+def matched_items(ing_name, store):
+    # Matching item keys, best match first
+    ing_name_lower = ing_name.lower()
+    return match_cache.lookup('fuzzy', ing_name_lower, store, lambda: matcher.keys(ing_name_lower, store))
 
-    for store in grocery_stores:
-        for item_key, purchases in purchase_db[store].items():
-            # Try to match ingredient name to purchase history
-            # Check if any major word from ingredient appears in purchase item
-            match_score = sum(1 for part in ing_name_parts if part in item_key)
 
-            if match_score > 0 or ing_name_lower in item_key:
-                # Found a potential match
-                if purchases:
-                    latest = purchases[0]  # Most recent purchase
-                    if store not in found_prices:
-                        found_prices[store] = latest
-                    print(f"  {store}: ${latest['price']} ({latest['item']})")
-
-    if found_prices:
-        # Find cheapest store
-        cheapest_store = min(found_prices.keys(), key=lambda s: found_prices[s]['price'])
-        ingredient_store_map[ing['ingredient']] = {
-            'store': cheapest_store,
-            'price': found_prices[cheapest_store]['price'],
-            'all_prices': found_prices
-        }
-        print(f"  → BEST: {cheapest_store} at ${found_prices[cheapest_store]['price']}")
-    else:
-        print(f"  → No historical data found")
-        ingredient_store_map[ing['ingredient']] = {
-            'store': 'Unknown',
-            'price': 0,
-            'all_prices': {}
-        }
-
-# Create shopping lists by store
+# Ingredients x stores price matrix (latest/min/median/per-unit) in one pass,
+# with recipe quantities priced per gram / ml / each
+ingredient_names = list(dict.fromkeys(ing['ingredient'] for ing in ingredients_needed))
+needs = defaultdict(list)
+for ing in ingredients_needed:
+    needs[ing['ingredient']].append((ing['qty_needed'], ing['unit']))
+matrix = PriceMatrix.build(ingredient_names, grocery_stores, purchase_db, matched_items,
+                           converter=UnitConverter.from_json(), needs=needs)
+
+# Compare stores on the cost of the amount the recipes need where units
+# allow it, otherwise on package price per recipe row
+rows_per_ingredient = [len(needs[name]) for name in matrix.ingredients]
+costs = matrix.recipe_costs(rows_per_ingredient)
+cheapest = matrix.cheapest_store(costs)
+
 print("\n" + "=" * 80)
-print("SHOPPING LIST BY STORE")
+print("PRICE COMPARISON BY INGREDIENT")
 print("=" * 80)
 
-shopping_by_store = defaultdict(list)
-total_by_store = defaultdict(float)
+# For each ingredient, find where it was purchased and at what price.
+# Results also go to dashboard/data/results/optimize.* as they are found.
+with ResultWriter(RESULTS_DIR / 'optimize') as results:
+    ingredient_store_map = {}
+    results_seen = set()
 
-for ing in ingredients_needed:
-    store_info = ingredient_store_map.get(ing['ingredient'], {'store': 'Unknown', 'price': 0})
-    store = store_info['store']
-    price = store_info['price']
-
-    shopping_by_store[store].append({
-        'ingredient': ing['ingredient'],
-        'qty': ing['qty_needed'],
-        'unit': ing['unit'],
-        'price': price,
-        'meals': ing['code']
-    })
-    total_by_store[store] += price
-
-for store in sorted(shopping_by_store.keys(), key=lambda s: total_by_store[s], reverse=True):
-    items = shopping_by_store[store]
-    total = total_by_store[store]
-    print(f"\n{store} (${total:.2f} total, {len(items)} items):")
-    for item in items:
-        print(f"  - {item['ingredient']}: {item['qty']} {item['unit']} (${item['price']:.2f}) [Meal {item['meals']}]")
+    for ing in ingredients_needed:
+        print(f"\n{ing['ingredient']}:")
+        found_prices = {}
 
-print("\n" + "=" * 80)
-print(f"GRAND TOTAL: ${sum(total_by_store.values()):.2f}")
-print("=" * 80)
+        for store in grocery_stores:
+            for item_key in matched_items(ing['ingredient'], store):
+                # Found a potential match
+                purchases = purchase_db[store][item_key]
+                if purchases:
+                    latest = latest_purchase(purchases)
+                    if store not in found_prices:
+                        found_prices[store] = latest
+                    print(f"  {store}: ${latest.price} ({latest.item})")
+
+        i = matrix.row(ing['ingredient'])
+        best = cheapest[i]
+        if best >= 0:
+            cheapest_store = grocery_stores[best]
+            ingredient_store_map[ing['ingredient']] = {
+                'store': cheapest_store,
+                'price': found_prices[cheapest_store].price,
+                'all_prices': found_prices
+            }
+            print(f"  → BEST: {cheapest_store} at ${found_prices[cheapest_store].price}"
+                  f" (${costs[i, best]:.2f} for what the recipes need)")
+        else:
+            cheapest_store = None
+            print(f"  → No historical data found")
+            ingredient_store_map[ing['ingredient']] = {
+                'store': 'Unknown',
+                'price': 0,
+                'all_prices': {}
+            }
+        if ing['ingredient'] not in results_seen:
+            results_seen.add(ing['ingredient'])
+            results.add_prices(ing['ingredient'], {store: p.price for store, p in found_prices.items()}, cheapest_store)
+
+    save_match_cache(data.path, 'optimize', match_cache)
+
+    # Create shopping lists by store
+    print("\n" + "=" * 80)
+    print("SHOPPING LIST BY STORE")
+    print("=" * 80)
+
+    meal_names = {ing['code']: ing['meal'] for ing in ingredients_needed}
+    shopping_by_store = defaultdict(list)
+    total_by_store = defaultdict(float)
+
+    for ing in ingredients_needed:
+        store_info = ingredient_store_map.get(ing['ingredient'], {'store': 'Unknown', 'price': 0})
+        store = store_info['store']
+        price = store_info['price']
+
+        shopping_by_store[store].append({
+            'ingredient': ing['ingredient'],
+            'qty': ing['qty_needed'],
+            'unit': ing['unit'],
+            'price': price,
+            'meals': ing['code']
+        })
+        total_by_store[store] += price
+
+    for store in sorted(shopping_by_store.keys(), key=lambda s: total_by_store[s], reverse=True):
+        items = shopping_by_store[store]
+        total = total_by_store[store]
+        print(f"\n{store} (${total:.2f} total, {len(items)} items):")
+        for item in items:
+            print(f"  - {item['ingredient']}: {item['qty']} {item['unit']} (${item['price']:.2f}) [Meal {item['meals']}]")
+        results.add_store(store, [shopping_item(item['ingredient'], item['qty'], item['unit'], item['price'],
+                                                item['meals'], meal_names.get(item['meals'])) for item in items], total)
+
+    print("\n" + "=" * 80)
+    print(f"GRAND TOTAL: ${sum(total_by_store.values()):.2f}")
+    print("=" * 80)
+
+    print("\nStore coverage (share of ingredients with price history):")
+    for store, share in zip(matrix.stores, matrix.coverage()):
+        print(f"  {store}: {share:.0%}")
+    print(f"Savings vs. priciest store carrying each item (recipe cost): ${matrix.savings(prices=costs).sum():.2f}")
+
+    # Cheapest-per-ingredient ignores that every extra store is another trip.
+    # Rough cost of one store visit (gas + time); adjust per store as needed.
+    trip_costs = {store: 5.00 for store in grocery_stores}
+
+    print("\n" + "=" * 80)
+    print("PRICE PER UNIT (normalized to g / ml / each)")
+    print("=" * 80)
+    for i, name in enumerate(matrix.ingredients):
+        cells = [f"{store} ${matrix.unit_price[i, j]:.4f}/{matrix.unit_dim[i, j]}"
+                 for j, store in enumerate(matrix.stores) if matrix.unit_dim[i, j]]
+        if cells:
+            print(f"  {name}: " + ", ".join(cells))
+
+    priced = ~np.isnan(costs)
+    store_prices = {name: {store: costs[i, j] for j, store in enumerate(matrix.stores) if priced[i, j]}
+                    for i, name in enumerate(matrix.ingredients)}
+
+    plan = StoreOptimizer(trip_costs, grocery_stores).solve(store_prices)
+
+    print("\n" + "=" * 80)
+    print("OPTIMAL STORE SET (including trip costs)")
+    print("=" * 80)
+    for store, names in plan.by_store().items():
+        print(f"\n{store} (${sum(plan.item_costs[n] for n in names):.2f} + ${trip_costs[store]:.2f} trip, {len(names)} ingredients):")
+        for name in names:
+            print(f"  - {name}: ${plan.item_costs[name]:.2f}")
+    if plan.missing:
+        print(f"\nNo price history: {', '.join(plan.missing)}")
+    print(f"\nItems ${plan.item_cost:.2f} + trips ${plan.visit_cost:.2f} = ${plan.total:.2f}")
+
+    results.add_table('optimalPlan', [{'ingredient': name, 'store': store, 'cost': plan.item_costs[name]}
+                                      for store, names in plan.by_store().items() for name in names])
+    results.set('optimalTotal', {'items': plan.item_cost, 'trips': plan.visit_cost, 'total': plan.total})
 
 # Group ingredients by perishability
 print("\n" + "=" * 80)
 print("INGREDIENT FRESHNESS CATEGORIES")
 print("=" * 80)
 
-highly_perishable = ['kale', 'parsley', 'dill', 'cucumber', 'berries', 'grapefruit', 'eggplant',
-                      'chicken', 'spinach', 'tomato', 'celery']
-moderately_perishable = ['ground turkey', 'sweet potato', 'carrots', 'pomegranate', 'apple',
-                         'squash', 'lemon', 'lime', 'egg', 'yogurt', 'feta', 'cheddar']
-shelf_stable = ['canned mackerel', 'pasta', 'tomato sauce', 'tomato paste', 'pearl barley',
-                'panko', 'peanut butter', 'meat stock', 'kimchi', 'frozen peas', 'riced cauliflower',
-                'pistachio', 'grapes', 'sourdough bread', 'lemon juice', 'parmesan', 'vegan cheddar',
-                'red pepper flakes', 'green beans']
-
 print("\nHighly Perishable (use within 3-5 days):")
 for ing in ingredients_needed:
     ing_lower = ing['ingredient'].lower()
-    if any(p in ing_lower for p in highly_perishable):
+    if any(p in ing_lower for p in HIGHLY_PERISHABLE):
         print(f"  - {ing['ingredient']} (Meal {ing['code']})")
 
 print("\nModerately Perishable (use within 7-10 days):")
 for ing in ingredients_needed:
     ing_lower = ing['ingredient'].lower()
-    if any(p in ing_lower for p in moderately_perishable) and not any(p in ing_lower for p in highly_perishable):
+    if any(p in ing_lower for p in MODERATELY_PERISHABLE) and not any(p in ing_lower for p in HIGHLY_PERISHABLE):
         print(f"  - {ing['ingredient']} (Meal {ing['code']})")
 
 print("\nShelf Stable (can store 2+ weeks):")
 for ing in ingredients_needed:
     ing_lower = ing['ingredient'].lower()
-    if any(p in ing_lower for p in shelf_stable):
+    if any(p in ing_lower for p in SHELF_STABLE):
         print(f"  - {ing['ingredient']} (Meal {ing['code']})")
@@ -1,6 +1,6 @@
 import openpyxl
 
-wb = openpyxl.load_workbook('MealCostCalculator.xlsx')
+wb = openpyxl.load_workbook('MealCostCalculator.xlsx', read_only=True)
 print('Sheets:', wb.sheetnames)
 
 for sheet_name in wb.sheetnames:
@@ -0,0 +1,151 @@
+"""Time the shopping pipeline on synthetic workbooks of increasing size.
+
+For each size a workbook is generated once (and reused on later runs from
+``--data-dir``), then each phase is timed on its own:
+
+- ``parse``:  openpyxl parse into ``MealData`` (no sidecar)
+- ``load``:   ``load()`` from a warm ``.cache`` sidecar
+- ``history``: ``PurchaseHistory`` rebuild -> ``purchase_db``
+- ``index``:  ``FuzzyMatcher`` token / trigram index over all stores
+- ``match``:  ``StoreAssigner.assign_all`` with an empty match cache
+- ``assign``: ``assign_all`` + ``group_by_store`` with every match cached
+
+Peak memory is the tracemalloc high-water mark of each phase (Python
+allocations only, and tracing slows the timings down; ``--no-trace`` turns it
+off) plus the process' peak RSS after the phase.
+
+Usage:
+    python3 scripts/benchmarks/benchmark.py                      # 10k, 100k, 1M rows
+    python3 scripts/benchmarks/benchmark.py --sizes 10000 100000 --json bench.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from grocery.fuzzy_match import FuzzyMatcher
+from grocery.history import PurchaseHistory
+from grocery.instrument import peak_rss_mb
+from grocery.loader import load, parse_workbook
+from grocery.match_cache import MatchCache
+from grocery.shopping_list import GROCERY_STORES, StoreAssigner, group_by_store, read_ingredients
+from synthetic_workbook import write_workbook
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'grocery-benchmarks')
+
+
+class PhaseTimer:
+    """Collects wall time and peak memory for named phases."""
+
+    def __init__(self, trace=True):
+        self.trace = trace
+        self.results = []
+
+    def run(self, name, fn):
+        if self.trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        peak = None
+        if self.trace:
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        self.results.append({'phase': name, 'seconds': elapsed, 'peak_mb': peak, 'rss_mb': peak_rss_mb()})
+        return value
+
+
+def workbook_for(rows, data_dir, seed):
+    path = os.path.join(data_dir, f'synthetic_{rows}_{seed}.xlsx')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        start = time.perf_counter()
+        write_workbook(path + '.tmp', rows, seed)
+        os.replace(path + '.tmp', path)
+        print(f"  generated {path} in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def bench_size(rows, data_dir, seed=0, trace=True):
+    path = workbook_for(rows, data_dir, seed)
+    timer = PhaseTimer(trace)
+
+    timer.run('parse', lambda: parse_workbook(path))
+    load(path)  # writes the sidecar so the next load is warm
+    data = timer.run('load', lambda: load(path))
+
+    def build_history():
+        history = PurchaseHistory(GROCERY_STORES)
+        history.rebuild(data.purchases)
+        return history
+
+    history = timer.run('history', build_history)
+    matcher = timer.run('index', lambda: FuzzyMatcher.from_json(history.purchase_db).build())
+
+    ingredients = read_ingredients(data)
+    names = [ing['ingredient'] for ing in ingredients]
+
+    assigner = StoreAssigner(history.purchase_db, MatchCache(max_entries=1 << 20), matcher=matcher,
+                             latest=history.latest)
+    assigner.match_cache.bind(assigner.context, names, history.versions)
+    timer.run('match', lambda: assigner.assign_all(ingredients))
+
+    def assign_cached():
+        assignments = assigner.assign_all(ingredients)
+        return group_by_store(ingredients, assignments)
+
+    timer.run('assign', assign_cached)
+
+    store_items = list(history.purchase_db.values())
+    return {
+        'rows': rows,
+        'purchases': sum(len(lines) for items in store_items for lines in items.values()),
+        'items': sum(len(items) for items in store_items),
+        'ingredients': len(set(names)),
+        'phases': timer.results
+    }
+
+
+def print_report(report):
+    print(f"\n{report['rows']:,} rows ({report['purchases']:,} at grocery stores, {report['items']:,} items, "
+          f"{report['ingredients']} ingredients)")
+    print(f"  {'phase':<10}{'seconds':>10}{'peak MB':>10}{'RSS MB':>10}")
+    for phase in report['phases']:
+        peak = f"{phase['peak_mb']:.1f}" if phase['peak_mb'] is not None else '-'
+        rss = f"{phase['rss_mb']:.1f}" if phase['rss_mb'] is not None else '-'
+        print(f"  {phase['phase']:<10}{phase['seconds']:>10.3f}{peak:>10}{rss:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the shopping pipeline on synthetic workbooks.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='purchase row counts')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='where generated workbooks are kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-trace', action='store_true', help='skip tracemalloc (faster, RSS only)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("GROCERY PIPELINE BENCHMARK")
+    print("=" * 80)
+    reports = []
+    for rows in args.sizes:
+        report = bench_size(rows, args.data_dir, args.seed, trace=not args.no_trace)
+        print_report(report)
+        reports.append(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Generate synthetic MealCostCalculator-style workbooks for benchmarking.
+
+The workbooks have the same ``ItemizedPurchase`` / ``ingredients`` /
+``totalMealCost`` sheets and column layout as ``MealCostCalculator.xlsx``.
+Ingredient and item names are built from the names and aliases in
+``dashboard/data/ingredients.json`` so the shopping-list rules find matches
+at realistic rates; the rest of the receipt lines are non-grocery noise.
+Output is deterministic for a given row count and seed.
+
+Usage:
+    python3 scripts/benchmarks/synthetic_workbook.py 100000 -o /tmp/synthetic_100k.xlsx
+"""
+
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from grocery.shopping_list import GROCERY_STORES
+from grocery.units import INGREDIENTS_JSON
+
+PURCHASE_HEADER = ('Date', 'Time', 'Location', 'Online', 'InStore', 'OrderTransID_ReceiptID',
+                   'ItemID', 'Item', 'Qty', 'Qty_units', 'PriceRaw')
+INGREDIENTS_HEADER = ('Code', 'Meal Name', 'Ingredient', 'Qt', 'Unit', 'Total', 'CostTot', 'CostQt')
+MEALS_HEADER = ('Code', 'Meal Name', 'Total Meal Cost', 'Servings', 'Cost/Serving')
+
+OTHER_STORES = ['Amazon', 'Target', 'Trader Joes', 'Whole Foods', 'CVS', 'Home Depot']
+BRANDS = ['KS', 'KIRKLAND', 'SIGNATURE', 'O ORGANICS', 'GREAT VALUE', 'HMART', 'ORGANIC', 'FRESH']
+SIZES = [(1, 'lb'), (2, 'lb'), (3, 'lb'), (16, 'oz'), (32, 'oz'), (12, 'cnt'), (1, 'cnt'),
+         (1, 'gal'), (64, 'fl oz'), (None, None)]
+NOISE_WORDS = ['charger', 'towels', 'detergent', 'batteries', 'socks', 'shampoo', 'lug nuts',
+               'notebook', 'vitamins', 'light bulb', 'sales tax', 'bag fee', 'gift card']
+RECIPE_UNITS = ['cup', 'lb', 'oz', 'cnt', 'tbsp', 'can', 'bunch']
+
+# Share of receipt lines at the grocery stores the scripts look at
+GROCERY_SHARE = 0.6
+
+
+def ingredient_vocabulary(path=INGREDIENTS_JSON):
+    """``[(display name, [aliases])]`` from ingredients.json."""
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f).get('ingredients', {})
+    return [(entry.get('name') or key.replace('_', ' ').title(),
+             entry.get('aliases') or [key.replace('_', ' ')])
+            for key, entry in entries.items()]
+
+
+def item_catalog(rng, vocabulary, size):
+    """``size`` distinct-ish grocery item names mentioning an ingredient alias."""
+    catalog = []
+    for i in range(size):
+        name, aliases = vocabulary[i % len(vocabulary)]
+        alias = rng.choice(aliases or [name])
+        words = [rng.choice(BRANDS), alias.upper()]
+        if i >= len(vocabulary):
+            words.append(f'#{i // len(vocabulary)}')
+        catalog.append(' '.join(words))
+    return catalog
+
+
+def purchase_rows(rng, n_rows, vocabulary, start=datetime(2025, 12, 31)):
+    """ItemizedPurchase rows, newest first like the real sheet."""
+    catalog = item_catalog(rng, vocabulary, max(len(vocabulary), n_rows // 20))
+    date = start
+    receipt = 0
+    for i in range(n_rows):
+        if i % 25 == 0:
+            date -= timedelta(days=rng.randint(0, 2))
+            receipt += 1
+        if rng.random() < GROCERY_SHARE:
+            location = rng.choice(GROCERY_STORES)
+            item = rng.choice(catalog)
+            qty, unit = rng.choice(SIZES)
+            price = round(rng.uniform(0.5, 40.0), 2)
+        else:
+            location = rng.choice(OTHER_STORES)
+            item = rng.choice(NOISE_WORDS).upper()
+            qty, unit = None, None
+            price = round(rng.uniform(-5.0, 120.0), 2)  # returns/credits are negative
+        yield (date, time(12, 0), location, 0, 1, f'R{receipt:08d}', None, item, qty, unit, price)
+
+
+def meal_rows(rng, vocabulary, n_meals=26, per_meal=(8, 15)):
+    """``(ingredients rows, totalMealCost rows)`` for ``n_meals`` meals."""
+    ingredients, meals = [], []
+    for m in range(n_meals):
+        code = chr(ord('A') + m) if m < 26 else f'M{m}'
+        meal_name = f'Synthetic Meal {code}'
+        for name, _ in rng.sample(vocabulary, min(len(vocabulary), rng.randint(*per_meal))):
+            row_number = len(ingredients) + 2
+            ingredients.append((code, meal_name, name, round(rng.uniform(0.25, 3), 2),
+                                rng.choice(RECIPE_UNITS), rng.randint(1, 12),
+                                round(rng.uniform(1, 25), 2),
+                                f'=IFERROR(D{row_number}/F{row_number}*G{row_number},0)'))
+        row_number = len(meals) + 2
+        meals.append((code, meal_name, f'=SUMIF(ingredients!A:A,A{row_number},ingredients!H:H)',
+                      rng.randint(2, 8), f'=C{row_number}/D{row_number}'))
+    return ingredients, meals
+
+
+def write_workbook(path, n_rows, seed=0, n_meals=26):
+    """Write a synthetic workbook with ``n_rows`` purchase rows to ``path``."""
+    import openpyxl
+
+    rng = random.Random(seed)
+    vocabulary = ingredient_vocabulary()
+    wb = openpyxl.Workbook(write_only=True)
+
+    ws = wb.create_sheet('ItemizedPurchase')
+    ws.append(PURCHASE_HEADER)
+    for row in purchase_rows(rng, n_rows, vocabulary):
+        ws.append(row)
+
+    ingredients, meals = meal_rows(rng, vocabulary, n_meals)
+    ws = wb.create_sheet('ingredients')
+    ws.append(INGREDIENTS_HEADER)
+    for row in ingredients:
+        ws.append(row)
+    ws = wb.create_sheet('totalMealCost')
+    ws.append(MEALS_HEADER)
+    for row in meals:
+        ws.append(row)
+
+    wb.save(path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic MealCostCalculator workbook.')
+    parser.add_argument('rows', type=int, help='number of ItemizedPurchase rows')
+    parser.add_argument('-o', '--output', help='output path (default: synthetic_<rows>.xlsx)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--meals', type=int, default=26)
+    args = parser.parse_args(argv)
+    output = args.output or f'synthetic_{args.rows}.xlsx'
+    write_workbook(output, args.rows, args.seed, args.meals)
+    print(f"Wrote {args.rows:,} purchase rows to {output}")
+
+
+if __name__ == '__main__':
+    main()